@@ -1,15 +1,24 @@
-import requests
-import pandas as pd
-import time
+import argparse
+import ast
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import listing_db
 
 # Replace with your Adzuna API credentials
 APP_ID = os.getenv("APP_ID")
 APP_KEY = os.getenv("APP_KEY")
 
-# Define base URL template and parameters
+# Define base URL template and parameters. Point ADZUNA_BASE_URL at
+# `python mock_adzuna.py` to run the pipeline without credentials.
 RESULTS_PER_PAGE = 100
-BASE_URL = "http://api.adzuna.com/v1/api/jobs/in/search/{}"
+BASE_URL = os.getenv("ADZUNA_BASE_URL", "http://api.adzuna.com/v1/api/jobs/in/search/{}")
 PARAMS = {
     "app_id": APP_ID,
     "app_key": APP_KEY,
@@ -18,75 +27,197 @@ PARAMS = {
     "max_days_old": 1  # Only fetch jobs from the last 24 hours
 }
 
-def fetch_jobs():
-    """Fetch job listings from Adzuna API and return as a DataFrame."""
-    all_jobs = []
-    page = 1
-
-    while True:
-        url = BASE_URL.format(page)
-        print(f"Fetching page {page}...")
-
+# Pages are fetched CONCURRENCY at a time over one pooled session. Failed
+# requests (connection errors, 429 and 5xx) are retried up to MAX_RETRIES times
+# with exponential backoff starting at BACKOFF_SECONDS, then the page is skipped.
+CONCURRENCY = int(os.getenv("ADZUNA_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.getenv("ADZUNA_MAX_RETRIES", "5"))
+BACKOFF_SECONDS = float(os.getenv("ADZUNA_BACKOFF_SECONDS", "1"))
+REQUEST_TIMEOUT = float(os.getenv("ADZUNA_TIMEOUT_SECONDS", "10"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+_stats_lock = threading.Lock()
+
+# Listings are upserted by id into the SQLite store the app loads from, and
+# listings posted more than MAX_AGE_DAYS ago are expired after each run (0 keeps them).
+JOB_LISTINGS_DB = os.getenv("JOB_LISTINGS_DB", listing_db.DEFAULT_DB)
+# A new database is seeded with this CSV first, so the app keeps its listings.
+JOB_LISTINGS_CSV = os.getenv("JOB_LISTINGS_CSV", "job_listing_data.csv")
+MAX_AGE_DAYS = float(os.getenv("LISTING_MAX_AGE_DAYS", "30"))
+
+
+class PageFetchError(Exception):
+    pass
+
+
+def make_session(concurrency=CONCURRENCY):
+    """A session whose connection pool holds one keep-alive connection per worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_page(session, page, base_url=BASE_URL, params=PARAMS, max_retries=MAX_RETRIES,
+               backoff=BACKOFF_SECONDS, stats=None):
+    """JSON body of one results page, retrying temporary failures with exponential backoff."""
+    url = base_url.format(page)
+    for attempt in range(max_retries + 1):
         try:
-            response = requests.get(url, params=PARAMS, timeout=10)
-
-            # Retry logic for temporary failures
-            if response.status_code != 200:
-                print(f"Error {response.status_code}: {response.text}")
-                if response.status_code in [500, 502, 503, 504]:
-                    print("Retrying after 5 seconds...")
-                    time.sleep(5)
-                    continue
-                break
-
-            data = response.json()
-            job_listings = data.get("results", [])
-
-            if not job_listings:
-                break
-
-            all_jobs.extend(job_listings)
-
-            # Stop if we have fetched all available pages
-            total_count = data.get("count", 0)
-            if page * RESULTS_PER_PAGE >= total_count:
-                break
-
-            page += 1
-
+            response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                try:
+                    return response.json()
+                except ValueError as e:
+                    raise PageFetchError(f"page {page}: invalid JSON: {e}")
+            if response.status_code not in RETRY_STATUSES:
+                raise PageFetchError(f"page {page}: HTTP {response.status_code}: {response.text[:200]}")
+            error = f"HTTP {response.status_code}"
+            retry_after = response.headers.get("Retry-After")
         except requests.exceptions.RequestException as e:
-            print(f"Request error: {e}")
+            error, retry_after = str(e), None
+        if attempt == max_retries:
             break
-        except Exception as e:
-            print(f"Unexpected error: {e}")
-            break
-
-    return pd.DataFrame(all_jobs)
-
-def clean_and_save_data(df):
-    """Cleans and saves job data to CSV."""
-    if df.empty:
-        print("No jobs fetched. Exiting.")
-        return
-
-    # Selecting relevant columns
-    columns = ['id', 'title', 'redirect_url', 'company', 'location', 'description', 
-               'category', 'salary_max', 'contract_type', 'salary_min', 'contract_time']
-    df = df.loc[:, columns]
-
-    # Extract "display_name" from nested dictionaries
-#     df["location"] = df["location"].apply(lambda x: x.get("display_name", "Unknown") if isinstance(x, dict) else "Unknown")
-#     df["category"] = df["category"].apply(lambda x: x.get("label", "Unknown") if isinstance(x, dict) else "Unknown")
-    df["location"] = [(ast.literal_eval(company).get("display_name", "Unknown") if isinstance(company, str) else company.get("display_name", "Unknown")) for company in df["location"]]
-    df["category"] = [(ast.literal_eval(company).get("label", "Unknown") if isinstance(company, str) else company.get("display_name", "Unknown")) for company in df["category"]]
-
-    # Save raw data
-    df.to_csv('raw_data_from_adzuna.csv', mode='a', header=False, index=False)
-    
-    # Save cleaned data
-    df.to_csv('job_listing_data.csv', mode='a', header=False, index=False)
-    print(f"✅ {len(df)} job listings appended to CSV.")
-
-# Run the script
-df_adzuna = fetch_jobs()
-clean_and_save_data(df_adzuna)
+        delay = backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        if stats is not None:
+            with _stats_lock:
+                stats["retries"] += 1
+        print(f"Page {page}: {error}, retrying in {delay:.1f}s ({attempt + 1}/{max_retries})...")
+        time.sleep(delay)
+    raise PageFetchError(f"page {page}: giving up after {max_retries} retries ({error})")
+
+
+def _display_name(value, key="display_name"):
+    # Adzuna nests these as {"display_name": ...} / {"label": ...}; older raw
+    # dumps hold the same dicts as their Python repr.
+    if isinstance(value, str) and value.startswith("{"):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+    if isinstance(value, dict):
+        return value.get(key) or value.get("display_name") or "Unknown"
+    return value
+
+
+def clean_job(job):
+    """One Adzuna result reduced to the listing columns (plus its posting time)."""
+    row = {column: job.get(column, "") for column in listing_db.COLUMNS}
+    row["created"] = job.get("created")
+    row["company"] = _display_name(row["company"])
+    row["location"] = _display_name(row["location"])
+    row["category"] = _display_name(row["category"], "label")
+    row["id"] = str(row["id"])
+    return row
+
+
+def ingest(base_url=BASE_URL, params=PARAMS, db_path=JOB_LISTINGS_DB, concurrency=CONCURRENCY,
+           max_pages=0, max_retries=MAX_RETRIES, backoff=BACKOFF_SECONDS, max_age_days=MAX_AGE_DAYS,
+           seed_csv=JOB_LISTINGS_CSV):
+    """Fetch every page concurrently, upserting each page's listings into the listing database.
+
+    Page 1 is fetched first to learn the result count; the remaining pages are
+    kept `concurrency` requests in flight and written in completion order.
+    Old listings are only expired when every page was fetched, so a failed run
+    never deletes listings without replacing them. Returns a stats dict
+    including pages/sec and rows/sec.
+    """
+    stats = {"pages": 0, "failed_pages": 0, "retries": 0, "rows_fetched": 0, "inserted": 0, "updated": 0,
+             "duplicates": 0, "expired": 0}
+    seen = set()
+    session = make_session(concurrency)
+    conn = listing_db.connect(db_path, seed_csv=seed_csv)
+    start = time.time()
+
+    def handle(page, data):
+        jobs = data.get("results", [])
+        stats["pages"] += 1
+        stats["rows_fetched"] += len(jobs)
+        rows = []
+        for job in jobs:
+            row = clean_job(job)
+            if row["id"] in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(row["id"])
+            rows.append(row)
+        inserted, updated = listing_db.upsert(conn, rows)
+        stats["inserted"] += inserted
+        stats["updated"] += updated
+        print(f"Page {page}: {len(jobs)} listings, {inserted} new.")
+        return len(jobs)
+
+    try:
+        try:
+            first = fetch_page(session, 1, base_url, params, max_retries, backoff, stats)
+        except PageFetchError as e:
+            print(f"Error: {e}")
+            stats["failed_pages"] += 1
+            first = None
+        if first is not None and handle(1, first):
+            per_page = int(params.get("results_per_page") or RESULTS_PER_PAGE)
+            last_page = -(-int(first.get("count", 0)) // per_page)
+            if max_pages:
+                last_page = min(last_page, max_pages)
+            pages = iter(range(2, last_page + 1))
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="adzuna") as pool:
+                in_flight = {}
+                exhausted = False
+                while True:
+                    # Keep at most `concurrency` pages in flight; stop submitting after an empty page.
+                    while not exhausted and len(in_flight) < concurrency:
+                        page = next(pages, None)
+                        if page is None:
+                            exhausted = True
+                            break
+                        future = pool.submit(fetch_page, session, page, base_url, params, max_retries, backoff,
+                                             stats)
+                        in_flight[future] = page
+                    if not in_flight:
+                        break
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        page = in_flight.pop(future)
+                        try:
+                            if not handle(page, future.result()):
+                                exhausted = True
+                        except PageFetchError as e:
+                            print(f"Error: {e}")
+                            stats["failed_pages"] += 1
+        if max_age_days and stats["failed_pages"] == 0 and stats["pages"]:
+            stats["expired"] = listing_db.expire(conn, max_age_days)
+        elif max_age_days:
+            print("Skipping expiry: the fetch did not complete.")
+    finally:
+        listing_db.checkpoint(conn)
+        conn.close()
+        session.close()
+
+    elapsed = time.time() - start
+    stats["seconds"] = round(elapsed, 2)
+    stats["pages_per_sec"] = round(stats["pages"] / elapsed, 2) if elapsed else 0.0
+    stats["rows_per_sec"] = round(stats["rows_fetched"] / elapsed, 1) if elapsed else 0.0
+    print(f"✅ {stats['inserted']} new and {stats['updated']} updated job listings saved to {db_path}, "
+          f"{stats['expired']} expired ({stats['pages']} pages, {stats['duplicates']} duplicates, "
+          f"{stats['failed_pages']} failed pages, "
+          f"{stats['pages_per_sec']} pages/sec, {stats['rows_per_sec']} rows/sec).")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Save new Adzuna job listings to the listing database.")
+    parser.add_argument("--base-url", default=BASE_URL, help="page URL template with {} for the page number")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--max-pages", type=int, default=0, help="stop after this many pages (0: all)")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--db", default=JOB_LISTINGS_DB)
+    parser.add_argument("--seed-csv", default=JOB_LISTINGS_CSV,
+                        help="listings imported first when the database does not exist yet")
+    parser.add_argument("--max-age-days", type=float, default=MAX_AGE_DAYS,
+                        help="expire listings posted longer ago than this (0: keep all)")
+    args = parser.parse_args()
+
+    ingest(base_url=args.base_url, db_path=args.db, concurrency=args.concurrency, max_pages=args.max_pages,
+           max_retries=args.max_retries, max_age_days=args.max_age_days, seed_csv=args.seed_csv)
@@ -1,43 +1,97 @@
 import os
-import pickle
-import time
 import json
-import csv
 import logging
 import requests
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session
+from flask import Flask, request, jsonify, render_template, redirect, url_for, session, g, has_request_context
 from flask_cors import CORS
-import stanza
 from bs4 import BeautifulSoup
-from sentence_transformers import SentenceTransformer, util
-import torch
-import threading
-from supabase import create_client, Client
+import embedding_store
+from job_snapshot import JobSnapshot, JobMatches, SnapshotReloader
+import listing_db
+from job_store import JobStore
+import vector_index
+import lexical_search
+import hybrid_search
+from query_cache import LRUCache, normalize_query
+from batch_encoder import BatchingEncoder
+import intent_router
+import job_filters
+from concurrent.futures import ThreadPoolExecutor
+from components import ComponentRegistry
+from auth_client import SupabaseAuth, AuthUnavailable
+import conversation_store
+from user_data import UserDataStore
+from recommendations import RecommendationStore
+import metrics
+from metrics import span
+import log_pipeline
+import encoder_backend
 
 # --- Supabase Configuration ---
 SUPABASE_URL = os.getenv("SUPABASE_URL")  # Replace with your Supabase URL
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")                   # Replace with your Supabase API key
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Auth calls share one pooled keep-alive session with explicit timeouts. After
+# SUPABASE_BREAKER_FAILURES consecutive failures they fail fast for
+# SUPABASE_BREAKER_RESET_SECONDS. Access-token checks are cached for
+# SUPABASE_TOKEN_CACHE_TTL seconds.
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "3"))
+SUPABASE_READ_TIMEOUT = float(os.getenv("SUPABASE_READ_TIMEOUT", "10"))
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+SUPABASE_BREAKER_FAILURES = int(os.getenv("SUPABASE_BREAKER_FAILURES", "5"))
+SUPABASE_BREAKER_RESET_SECONDS = float(os.getenv("SUPABASE_BREAKER_RESET_SECONDS", "30"))
+SUPABASE_TOKEN_CACHE_TTL = float(os.getenv("SUPABASE_TOKEN_CACHE_TTL", "60"))
+
+supabase_auth = SupabaseAuth(SUPABASE_URL, SUPABASE_KEY, connect_timeout=SUPABASE_CONNECT_TIMEOUT,
+                             read_timeout=SUPABASE_READ_TIMEOUT, pool_size=SUPABASE_POOL_SIZE,
+                             failure_threshold=SUPABASE_BREAKER_FAILURES,
+                             reset_timeout=SUPABASE_BREAKER_RESET_SECONDS,
+                             token_cache_ttl=SUPABASE_TOKEN_CACHE_TTL)
+
+
+# Upcoming events/mentorship sessions, read once at startup.
+SESSION_FILE = "session_details.json"
 
+# Past searches are recorded per logged-in user from /chat, kept in memory and
+# written behind to one JSON file per user under USER_DATA_DIR every
+# USER_DATA_FLUSH_SECONDS. Each user keeps the last PAST_SEARCHES_MAX searches.
+# USER_DATA_FSYNC=0 skips the per-file fsync (faster flushes on slow disks; an
+# OS crash may then lose the latest writes).
+USER_DATA_DIR = os.getenv("USER_DATA_DIR", "user_data")
+USER_DATA_FLUSH_SECONDS = float(os.getenv("USER_DATA_FLUSH_SECONDS", "2"))
+USER_DATA_FSYNC = os.getenv("USER_DATA_FSYNC", "1") == "1"
+PAST_SEARCHES_MAX = int(os.getenv("PAST_SEARCHES_MAX", "50"))
 
-SESSION_FILE = "session_details.json"
+user_data = UserDataStore(USER_DATA_DIR, flush_interval=USER_DATA_FLUSH_SECONDS, max_searches=PAST_SEARCHES_MAX,
+                          fsync=USER_DATA_FSYNC)
 
-def load_session():
-    if not os.path.exists(SESSION_FILE):
-        with open(SESSION_FILE, "w") as f:
-            json.dump({}, f)
-    with open(SESSION_FILE, "r") as f:
-        return json.load(f)
+# "Jobs for you" recommendations precomputed from past searches by the nightly
+# `python bulk_match.py` run, read by /profile and /chat.
+RECOMMENDATIONS_DB = os.getenv("RECOMMENDATIONS_DB", "recommendations.db")
+RECOMMENDATIONS_DB_TIMEOUT = float(os.getenv("RECOMMENDATIONS_DB_TIMEOUT", "2"))
 
-def save_session(data):
-    with open(SESSION_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+recommendations = RecommendationStore(RECOMMENDATIONS_DB, timeout=RECOMMENDATIONS_DB_TIMEOUT)
 
 
 # --- Logging & Flask App Setup ---
-logging.basicConfig(filename="chatbot.log", level=logging.INFO,
-                    format="%(asctime)s - %(levelname)s - %(message)s")
+# Log records go through a bounded queue to a background writer (see
+# log_pipeline.py) as JSON lines in LOG_FILE ("-" for stderr, "{pid}" for one
+# file per worker). The file rotates at LOG_MAX_BYTES, or every LOG_ROTATE_WHEN
+# ("midnight", "h", ...) if set, keeping LOG_BACKUP_COUNT old files. Stanza
+# token/entity dumps are logged for LOG_NLP_SAMPLE_RATE of messages; raw chat
+# messages are only logged at LOG_LEVEL=DEBUG.
+LOG_FILE = os.getenv("LOG_FILE", "chatbot.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN") or None
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_NLP_SAMPLE_RATE = float(os.getenv("LOG_NLP_SAMPLE_RATE", "0.01"))
+
+log_handler = log_pipeline.configure(LOG_FILE, level=LOG_LEVEL, max_bytes=LOG_MAX_BYTES,
+                                     backup_count=LOG_BACKUP_COUNT, when=LOG_ROTATE_WHEN,
+                                     queue_size=LOG_QUEUE_SIZE)
+sample_nlp_log = log_pipeline.Sampler(LOG_NLP_SAMPLE_RATE)
 app = Flask(__name__)
 app.secret_key = "your_secret_key"  # For session management
 CORS(app)
@@ -47,34 +101,148 @@ CORS(app)
 # app.run(host="0.0.0.0", port=8080)
 
 # --- NLP and Semantic Model Initialization ---
-nlp = stanza.Pipeline('en', processors='tokenize,pos,ner', verbose=False)
-semantic_model = SentenceTransformer('all-MiniLM-L6-v2')
-
-# In-memory stores for chatbot conversation histories and ambiguous selections
-session_store = {}
-ambiguous_store = {}
-
-# Global flag for semantic embeddings readiness.
-embeddings_ready = False
+# Heavy components load according to STARTUP_MODE (see components.py): in a
+# background warm-up by default, so /login and the static pages are served at once.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "warmup")
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# CPU encoder settings (see encoder_backend.py): ENCODER_BACKEND "fp32" or "int8"
+# (dynamically quantized), ENCODER_THREADS intra-op threads per worker (0: cores
+# divided by WEB_CONCURRENCY workers), and EMBEDDING_DESCRIPTION_CHARS to cut
+# long descriptions when indexing (0: no cut). Check a setting's accuracy with
+# `python encoder_backend.py` before switching.
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "fp32")
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", "0"))
+EMBEDDING_DESCRIPTION_CHARS = int(os.getenv("EMBEDDING_DESCRIPTION_CHARS", "0"))
+
+# Memory-mapped embedding cache; float16 halves its size at a small accuracy cost.
+EMBEDDING_CACHE_FILE = os.getenv("EMBEDDING_CACHE_FILE", "job_embeddings.bin")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Vector index backend: "exact", "ivf" (approximate, persisted next to the cache),
+# or "auto" (IVF from vector_index.AUTO_IVF_MIN_ROWS listings up). Use
+# `python vector_index.py` to see the recall/latency of IVF_NLIST/IVF_NPROBE settings.
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "auto")
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", str(vector_index.DEFAULT_NPROBE)))
+
+# "hybrid" (default) takes the HYBRID_CANDIDATES best BM25 matches from the
+# inverted index and re-ranks them semantically, fusing both scores with weight
+# HYBRID_ALPHA on the cosine similarity; "semantic" scores every listing by
+# embedding only. Compare the two with `python hybrid_search.py`.
+SEARCH_STRATEGY = os.getenv("SEARCH_STRATEGY", "hybrid")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", str(hybrid_search.DEFAULT_CANDIDATES)))
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", str(hybrid_search.DEFAULT_ALPHA)))
+
+# Query embeddings are cached by normalized text; search results additionally by
+# threshold, k and snapshot version, so a reload never serves stale results.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "4096"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
+
+# Concurrent query encodes are coalesced into one forward pass: a batch closes
+# after ENCODER_BATCH_WINDOW_MS or once ENCODER_MAX_BATCH_SIZE queries are queued.
+ENCODER_BATCH_WINDOW_MS = float(os.getenv("ENCODER_BATCH_WINDOW_MS", "5"))
+ENCODER_MAX_BATCH_SIZE = int(os.getenv("ENCODER_MAX_BATCH_SIZE", "32"))
+
+# Stanza only runs for intents that use its entities (job searches and detail
+# lookups). Set NLP_ANALYZE_ALL=1 to also analyze the other messages, off the
+# response path, purely for logging.
+NLP_ANALYZE_ALL = os.getenv("NLP_ANALYZE_ALL", "0") == "1"
+
+# While embeddings are still building, searches wait up to EMBEDDINGS_WAIT_SECONDS
+# for them and otherwise fall back to BM25 keyword search ("lexical" mode).
+EMBEDDINGS_WAIT_SECONDS = float(os.getenv("EMBEDDINGS_WAIT_SECONDS", "0"))
+# If the embedding build fails, the next search after EMBEDDINGS_RETRY_SECONDS
+# starts it again in the background.
+EMBEDDINGS_RETRY_SECONDS = float(os.getenv("EMBEDDINGS_RETRY_SECONDS", "60"))
+
+# Job listings are loaded from the SQLite store written by Data_Extraction.py
+# (JOB_LISTINGS_DB), or from JOB_LISTINGS_CSV if there is no database yet. They
+# are hot-reloaded when either file changes (checked every
+# JOB_RELOAD_POLL_SECONDS), every JOB_RELOAD_INTERVAL_SECONDS, or via /admin/reload.
+JOB_LISTINGS_DB = os.getenv("JOB_LISTINGS_DB", listing_db.DEFAULT_DB)
+JOB_LISTINGS_CSV = os.getenv("JOB_LISTINGS_CSV", "job_listing_data.csv")
+JOB_RELOAD_POLL_SECONDS = float(os.getenv("JOB_RELOAD_POLL_SECONDS", "30"))
+JOB_RELOAD_INTERVAL_SECONDS = float(os.getenv("JOB_RELOAD_INTERVAL_SECONDS", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Chat history (the last CONVERSATION_MAX_HISTORY messages) and pending "enter
+# the number" selections, per session. Sessions idle for CONVERSATION_TTL_SECONDS
+# expire and the least recently used beyond CONVERSATION_MAX_SESSIONS are evicted.
+# CONVERSATION_BACKEND "memory" keeps them per process; "sqlite" shares them
+# between workers through CONVERSATION_DB (gunicorn.conf.py defaults to it); a
+# write waits at most CONVERSATION_DB_TIMEOUT seconds for another worker's lock.
+CONVERSATION_BACKEND = os.getenv("CONVERSATION_BACKEND", "memory")
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "conversations.db")
+CONVERSATION_MAX_HISTORY = int(os.getenv("CONVERSATION_MAX_HISTORY", "50"))
+CONVERSATION_TTL_SECONDS = float(os.getenv("CONVERSATION_TTL_SECONDS", "3600"))
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+CONVERSATION_DB_TIMEOUT = float(os.getenv("CONVERSATION_DB_TIMEOUT", "2"))
+
+conversations = conversation_store.create_store(CONVERSATION_BACKEND, CONVERSATION_DB,
+                                                max_sessions=CONVERSATION_MAX_SESSIONS,
+                                                ttl=CONVERSATION_TTL_SECONDS,
+                                                max_history=CONVERSATION_MAX_HISTORY,
+                                                timeout=CONVERSATION_DB_TIMEOUT)
+
+nlp_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlp-log")
+query_encoder = BatchingEncoder(lambda: semantic_model_component.get(), window_ms=ENCODER_BATCH_WINDOW_MS,
+                                max_batch_size=ENCODER_MAX_BATCH_SIZE)
+query_embedding_cache = LRUCache(QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+search_result_cache = LRUCache(RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+# Prometheus metrics are served on /metrics. With METRICS_PROFILING=1, an admin
+# request (X-Admin-Token) carrying "X-Profile: 1" is run under the sampling
+# profiler (one sample every PROFILE_INTERVAL_MS), and /chat returns its
+# per-stage timings and collapsed stacks under "profile".
+METRICS_PROFILING = os.getenv("METRICS_PROFILING", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+CHAT_REQUESTS = metrics.REGISTRY.counter("chat_requests_total", "Chat messages by routed intent.", ("intent",))
+CHAT_ERRORS = metrics.REGISTRY.counter("chat_errors_total", "Chat requests that failed with an exception.")
+SEARCHES = metrics.REGISTRY.counter("searches_total", "Job searches by mode and result-cache outcome.",
+                                    ("mode", "result_cache"))
+QUERY_EMBEDDING_LOOKUPS = metrics.REGISTRY.counter("query_embedding_lookups_total",
+                                                   "Query embedding cache lookups.", ("result",))
+SEARCH_RESULTS = metrics.REGISTRY.histogram("search_results", "Matching listings returned per search.",
+                                            ("mode",), buckets=(0, 1, 2, 3, 5, 10))
+def conversation_counts():
+    stats = conversations.stats()
+    return {("all",): stats["sessions"], ("pending",): stats["pending"]}
+
+metrics.REGISTRY.gauge("conversation_sessions", "Chat sessions held by the conversation store: all, and "
+                       "those with an open 'enter the number' selection.", conversation_counts, ("state",))
+metrics.REGISTRY.gauge("cache_entries", "Entries held by each in-process cache.",
+                       lambda: {("query_embeddings",): len(query_embedding_cache),
+                                ("search_results",): len(search_result_cache)}, ("cache",))
+metrics.REGISTRY.gauge("log_records_dropped", "Log records dropped because the log queue was full.",
+                       lambda: log_handler.dropped)
+metrics.REGISTRY.gauge("job_listings", "Listings in the current job snapshot.",
+                       lambda: len(job_reloader.current) if job_reloader.current is not None else 0)
+metrics.REGISTRY.gauge("job_snapshot_version", "Version of the current job snapshot.",
+                       lambda: job_reloader.current.version if job_reloader.current is not None else 0)
+metrics.REGISTRY.gauge("component_ready", "1 once a lazily loaded component is ready.",
+                       lambda: {(name,): int(component["state"] == "ready")
+                                for name, component in components.status().items()}, ("component",))
 
 # -------------------- Data Loading & Semantic Embedding --------------------
 
-def load_job_listings_from_csv():
-    listings = []
+def load_job_listing_store():
     try:
-        with open("job_listing_data.csv", newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                listings.append(row)
-        logging.info("Loaded %d job listings from CSV.", len(listings))
+        return listing_db.load_listings(JOB_LISTINGS_DB, JOB_LISTINGS_CSV)
     except Exception as e:
-        logging.error("Error reading CSV: %s", e)
-    return listings
+        logging.error("Error loading job listings: %s", e)
+    return JobStore([], {}, 0)
 
 def load_session_details():
     try:
-        with open("session_details.json", "r", encoding="utf-8") as f:
+        with open(SESSION_FILE, "r", encoding="utf-8") as f:
             data = json.load(f)
+        # Past searches used to share this file; they now live in USER_DATA_DIR.
+        data.pop("past_searches", None)
         logging.info("Loaded session details from JSON.")
         return data
     except Exception as e:
@@ -95,26 +263,25 @@ def fetch_job_listings_scrape():
                 listings.append({"title": title, "company": company})
             logging.info("Scraped %d job listings from %s", len(listings), url)
             if listings:
-                return listings
+                return JobStore.from_rows(listings)
         else:
             logging.warning("Scraping failed with status code: %s", response.status_code)
     except Exception as e:
         logging.error("Exception during scraping: %s", e)
-    return load_job_listings_from_csv()
+    return load_job_listing_store()
 
 def fetch_job_listings_api():
     try:
         response = requests.get("https://api.example.com/jobs", timeout=5)
         if response.status_code == 200:
             logging.info("Fetched job listings from external API.")
-            return response.json()
+            return JobStore.from_rows(response.json())
         else:
             logging.warning("API call unsuccessful. Status code: %s", response.status_code)
     except Exception as e:
         logging.error("Exception during API call: %s", e)
-    return load_job_listings_from_csv()
+    return load_job_listing_store()
 
-job_listings_static = load_job_listings_from_csv()
 session_details = load_session_details()
 
 # def build_job_embeddings():
@@ -150,147 +317,261 @@ session_details = load_session_details()
 #     except Exception as e:
 #         logging.error("Error caching embeddings: %s", e)
 #     embeddings_ready = True
-def build_job_embeddings():
-    global embeddings_ready
-    cache_file = "job_embeddings.pkl"
-    if os.path.exists(cache_file):
-        try:
-            with open(cache_file, "rb") as f:
-                cached_embeddings = pickle.load(f)
-            if len(cached_embeddings) == len(job_listings_static):
-                for i, job in enumerate(job_listings_static):
-                    job['embedding'] = cached_embeddings[i]
-                logging.info("Loaded cached job embeddings.")
-                embeddings_ready = True
-                return
-            else:
-                logging.info("Cache length mismatch. Recomputing embeddings.")
-        except Exception as e:
-            logging.error("Error loading cached embeddings: %s", e)
-    embeddings = []
-    for job in job_listings_static:
-        text = ""
-        for field in ["title", "company", "description", "category"]:
-            if field in job and job[field]:
-                text += job[field] + " "
-        embedding = semantic_model.encode(text, convert_to_tensor=True, show_progress_bar=False)
-        job['embedding'] = embedding
-        embeddings.append(embedding)
-    try:
-        with open(cache_file, "wb") as f:
-            pickle.dump(embeddings, f)
-        logging.info("Computed and cached job embeddings.")
-    except Exception as e:
-        logging.error("Error caching embeddings: %s", e)
-    embeddings_ready = True
-    
-# Run embedding computation in a background thread.
-threading.Thread(target=build_job_embeddings, daemon=True).start()
-
-def wait_for_embeddings(timeout=10):
-    start_time = time.time()
-    while not embeddings_ready and time.time() - start_time < timeout:
-        time.sleep(0.1)
-    if not embeddings_ready:
-        logging.warning("Embeddings not ready after waiting for %s seconds.", timeout)
+def build_job_embeddings(store):
+    # Returns the embedding cache: a contiguous (num_jobs x dim) matrix of
+    # L2-normalized embeddings, memory-mapped from disk. Row i belongs to
+    # store row i, so a dot product is a cosine similarity.
+    return embedding_store.load_or_build(
+        semantic_model_component.get(), encoder_backend.model_id(EMBEDDING_MODEL_NAME, ENCODER_BACKEND), store,
+        EMBEDDING_CACHE_FILE, dtype=EMBEDDING_CACHE_DTYPE, batch_size=EMBEDDING_BATCH_SIZE,
+        description_chars=EMBEDDING_DESCRIPTION_CHARS)
+
+def build_job_snapshot(version, previous=None):
+    store = load_job_listing_store()
+    if previous is not None and len(store) == 0 and len(previous):
+        raise ValueError("reload yielded no listings")
+    cache = build_job_embeddings(store)
+    index = vector_index.load_or_build_index(cache, EMBEDDING_CACHE_FILE, kind=VECTOR_INDEX,
+                                             nlist=IVF_NLIST, nprobe=IVF_NPROBE)
+    # The inverted index is built here, off the request path; when the CSV only
+    # gained rows, just those are indexed on top of the previous snapshot's index.
+    lexical = lexical_search.build_or_extend(store, previous.store if previous else None,
+                                             previous.built_lexical_index() if previous else None)
+    snapshot = JobSnapshot(version, store, cache.vectors, index, lexical, id_keys=cache.keys)
+    snapshot.filter_index()
+    return snapshot
+
+job_reloader = SnapshotReloader(build_job_snapshot, watch_paths=[JOB_LISTINGS_DB, JOB_LISTINGS_CSV],
+                                poll_interval=JOB_RELOAD_POLL_SECONDS,
+                                reload_interval=JOB_RELOAD_INTERVAL_SECONDS)
+job_reloader.add_listener(lambda snapshot: search_result_cache.clear())
+
+def initial_job_snapshot():
+    job_listings_component.get()
+    snapshot = job_reloader.current
+    if snapshot is None or snapshot.index is None:
+        snapshot = job_reloader.reload("startup")
+    # The watcher runs even after a failed build, so a later reload can still
+    # bring the embeddings.
+    job_reloader.start()
+    if snapshot is None or snapshot.index is None:
+        raise RuntimeError("initial job embedding build failed")
+
+def load_job_listings():
+    # Listings are served right away; embeddings follow once the job_embeddings
+    # component (loaded according to STARTUP_MODE) finishes the first build.
+    job_reloader.publish(JobSnapshot(0, load_job_listing_store()))
+
+def load_semantic_model():
+    return encoder_backend.load_model(EMBEDDING_MODEL_NAME, ENCODER_BACKEND, ENCODER_THREADS)
+
+def load_nlp():
+    import stanza
+    return stanza.Pipeline('en', processors='tokenize,pos,ner', verbose=False)
+
+# Warm-up loads in this order. Stanza and the model come before the embedding
+# build, which can take minutes, so messages that need them don't load them on
+# the request path meanwhile.
+components = ComponentRegistry()
+job_listings_component = components.register("job_listings", load_job_listings)
+semantic_model_component = components.register("semantic_model", load_semantic_model)
+nlp_component = components.register("nlp", load_nlp)
+job_embeddings_component = components.register("job_embeddings", initial_job_snapshot)
+
+def current_job_snapshot():
+    job_listings_component.get()
+    if STARTUP_MODE == "lazy" or job_embeddings_component.failed:
+        # Builds on first use in lazy mode and retries a failed build; searches
+        # stay lexical until it is done.
+        job_embeddings_component.start_loading(retry_after=EMBEDDINGS_RETRY_SECONDS)
+    # Restarts the reload watcher in workers forked from a preloaded master.
+    if job_embeddings_component.ready or job_embeddings_component.failed:
+        job_reloader.start()
+    return job_reloader.current
 
 # -------------------- Chatbot Core Functionality --------------------
 
-def detect_bias(message):
-    biased_terms = ["only man", "not for women", "typical male", "stereotype"]
-    for term in biased_terms:
-        if term in message.lower():
-            return True
-    return False
-
-def search_jobs(query, similarity_threshold=0.3):
-    wait_for_embeddings()
-    query_embedding = semantic_model.encode(query, convert_to_tensor=True, show_progress_bar=False)
-    scored_jobs = []
-    for job in job_listings_static:
-        score = util.cos_sim(query_embedding, job['embedding'])
-        scored_jobs.append((score.item(), job))
-    scored_jobs.sort(key=lambda x: x[0], reverse=True)
-    matches = [job for score, job in scored_jobs if score >= similarity_threshold]
-    logging.info("Semantic search found %d matching jobs for query: %s", len(matches), query)
-    return matches
-
-def get_detail_from_job(job, detail_type):
+def analyze_message(message):
+    doc = nlp_component.get()(message)
+    tokens = []
+    entities = []
+    for sentence in doc.sentences:
+        tokens.extend([word.text for word in sentence.words])
+        entities.extend([(ent.text, ent.type) for ent in sentence.ents])
+    if sample_nlp_log():
+        logging.info("Processed message. Tokens: %s | Entities: %s", tokens, entities,
+                     extra={"sampled": LOG_NLP_SAMPLE_RATE})
+    return tokens, entities
+
+def encode_query(query):
+    key = normalize_query(query)
+    query_embedding = query_embedding_cache.get(key)
+    if query_embedding is None:
+        QUERY_EMBEDDING_LOOKUPS.inc("miss")
+        with span("encode"):
+            query_embedding = query_encoder.encode(key)
+        query_embedding.setflags(write=False)
+        query_embedding_cache.put(key, query_embedding)
+    else:
+        QUERY_EMBEDDING_LOOKUPS.inc("hit")
+    return query_embedding
+
+def filtered_rows(snapshot, filters):
+    # Rows that satisfy every filter, or None if unfiltered. Company filters come
+    # only from NER, which often tags skills or titles as organisations, so they
+    # are dropped rather than turning a search into no results.
+    rows = snapshot.filter_index().rows(filters)
+    if rows is not None and len(rows) == 0 and "company" in filters:
+        logging.info("No listings match filters %s; retrying without the company filter.", filters)
+        rows = snapshot.filter_index().rows({k: v for k, v in filters.items() if k != "company"})
+    return rows
+
+def record_search_mode(mode):
+    # Reported back to the client by /chat, so degraded answers are visible.
+    if has_request_context():
+        g.search_mode = mode
+
+def search_jobs(query, similarity_threshold=0.3, top_k=3, snapshot=None, filters=None):
+    snapshot = snapshot or current_job_snapshot()
+    if snapshot.index is None and job_embeddings_component.wait(EMBEDDINGS_WAIT_SECONDS):
+        # Pinned before the startup build finished; that build is the first with embeddings.
+        snapshot = job_reloader.current
+    mode = SEARCH_STRATEGY if snapshot.index is not None else "lexical"
+    record_search_mode(mode)
+    key = (normalize_query(query), similarity_threshold, top_k, snapshot.version,
+           job_filters.filter_key(filters), mode)
+    rows = search_result_cache.get(key)
+    SEARCHES.inc(mode, "miss" if rows is None else "hit")
+    if rows is None:
+        # Filters are applied first, so only qualifying listings are scored.
+        with span("filter"):
+            candidates = filtered_rows(snapshot, filters)
+        query_embedding = encode_query(query) if mode != "lexical" else None
+        with span("score"):
+            if mode == "hybrid":
+                rows, _ = hybrid_search.hybrid_search(snapshot, query, query_embedding, top_k, similarity_threshold,
+                                                      rows=candidates, candidates=HYBRID_CANDIDATES,
+                                                      alpha=HYBRID_ALPHA)
+            elif mode == "semantic":
+                rows, _ = snapshot.index.search(query_embedding, top_k, similarity_threshold, rows=candidates)
+            else:
+                rows, _ = snapshot.lexical_index().search(query, top_k, rows=candidates)
+        rows = tuple(int(i) for i in rows)
+        search_result_cache.put(key, rows)
+    SEARCH_RESULTS.observe(len(rows), mode)
+    logging.debug("%s search found %d matching jobs for query: %s (filters: %s)",
+                  mode.capitalize(), len(rows), query, filters)
+    return JobMatches(rows, snapshot, mode)
+
+def get_detail_from_job(store, row, detail_type):
     if detail_type == "link":
-        return f"Here is the job link: {job.get('redirect_url', 'No link available')}."
+        return f"Here is the job link: {store.get(row, 'redirect_url', 'No link available')}."
     elif detail_type == "salary":
-        salary_min = job.get("salary_min", "N/A")
-        salary_max = job.get("salary_max", "N/A")
-        contract_type = job.get("contract_type", "N/A")
+        salary_min = store.get(row, "salary_min", "N/A")
+        salary_max = store.get(row, "salary_max", "N/A")
+        contract_type = store.get(row, "contract_type", "N/A")
         return f"The salary range is {salary_min} - {salary_max} ({contract_type})."
     elif detail_type == "skills":
-        return f"Job description/skills: {job.get('description', 'No description available')}."
+        return f"Job description/skills: {store.get(row, 'description', 'No description available')}."
     elif detail_type == "experience":
         return "Experience details are not available for this job."
     elif detail_type == "contract time":
-        return f"The contract time is {job.get('contract_time', 'N/A')}."
+        return f"The contract time is {store.get(row, 'contract_time', 'N/A')}."
     else:
         return "I'm sorry, I didn't understand what detail you need."
 
-def get_job_detail(query, detail_type, session_id):
-    matches = search_jobs(query)
+def get_job_detail(query, detail_type, session_id, snapshot=None, filters=None):
+    matches = search_jobs(query, snapshot=snapshot, filters=filters)
+    store = matches.snapshot.store
     if not matches:
         return "Sorry, I couldn't find that job."
     if len(matches) == 1:
-        job = matches[0]
-        return get_detail_from_job(job, detail_type)
+        return get_detail_from_job(store, matches[0], detail_type)
     else:
-        ambiguous_store[session_id] = {"matches": matches, "detail_type": detail_type}
+        # Stored as listing id keys, so the follow-up resolves on any worker and after a reload.
+        keys = matches.snapshot.id_keys()
+        with span("pending_write"):
+            conversations.set_pending(session_id, [keys[row] for row in matches], detail_type)
         response = "I found multiple jobs that match. Please specify by entering the number:\n"
-        for i, candidate in enumerate(matches[:3]):
-            response += f"{i+1}. {candidate.get('title', 'No Title')} at {candidate.get('company', 'Unknown Company')}\n"
+        for i, row in enumerate(matches[:3]):
+            response += f"{i+1}. {store.get(row, 'title', 'No Title')} at {store.get(row, 'company', 'Unknown Company')}\n"
         return response
 
+def recommended_jobs(email, limit=None):
+    # The user's precomputed recommendations that are still listed, best first.
+    entry = recommendations.get(email) if email else None
+    if not entry:
+        return []
+    snapshot = current_job_snapshot()
+    store = snapshot.store
+    jobs = []
+    for row, score in zip(snapshot.rows_for_keys(entry["keys"]), entry["scores"]):
+        if row is not None:
+            jobs.append({"title": store.get(row, "title", "No Title"),
+                         "company": store.get(row, "company", "Unknown Company"),
+                         "location": store.get(row, "location", ""),
+                         "redirect_url": store.get(row, "redirect_url", ""), "score": score})
+    return jobs[:limit]
+
+def session_email():
+    user = session.get("user") if has_request_context() else None
+    return user.get("email") if isinstance(user, dict) else None
+
 def process_message(message, history, session_id):
-    if message.strip().isdigit() and session_id in ambiguous_store:
+    with span("route_intent"):
+        intent = intent_router.route_intent(message, has_pending_selection=conversations.has_pending(session_id))
+    CHAT_REQUESTS.inc(intent.name)
+    if intent.name == "selection":
         index = int(message.strip()) - 1
-        data = ambiguous_store.pop(session_id)
-        matches = data["matches"]
-        detail_type = data["detail_type"]
-        if index < 0 or index >= len(matches):
+        with span("pending_pop"):
+            data = conversations.pop_pending(session_id)
+        if data is None:
+            # Claimed by a concurrent request, or expired in between.
+            return "Sorry, that selection has expired. Please ask again."
+        keys = data["keys"]
+        if index < 0 or index >= len(keys):
             return "Invalid selection. Please try again."
-        selected_job = matches[index]
-        return get_detail_from_job(selected_job, detail_type)
-    
-    doc = nlp(message)
-    tokens = []
-    entities = []
-    for sentence in doc.sentences:
-        tokens.extend([word.text for word in sentence.words])
-        entities.extend([(ent.text, ent.type) for ent in sentence.ents])
-    logging.info("Processed message. Tokens: %s | Entities: %s", tokens, entities)
-    
-    if detect_bias(message):
+        snapshot = current_job_snapshot()
+        row = snapshot.rows_for_keys([keys[index]])[0]
+        if row is None:
+            return "Sorry, that job is no longer available."
+        return get_detail_from_job(snapshot.store, row, data["detail_type"])
+
+    if not intent_router.needs_nlp(intent):
+        if NLP_ANALYZE_ALL:
+            nlp_background.submit(analyze_message, message)
+    else:
+        # Pin one snapshot for the whole message so a concurrent reload can't mix listings.
+        snapshot = current_job_snapshot()
+        with span("nlp"):
+            tokens, entities = analyze_message(message)
+        with span("extract_filters"):
+            filters = job_filters.extract_filters(message, entities, snapshot.filter_index())
+
+    if intent.name == "bias":
         return "I detected a potentially biased query. Let’s keep our conversation positive and inclusive."
-    
-    message_lower = message.lower()
-    if any(keyword in message_lower for keyword in ["link", "salary", "skill", "experience", "contract time"]):
-        if "link" in message_lower:
-            return get_job_detail(message, "link", session_id)
-        elif "salary" in message_lower:
-            return get_job_detail(message, "salary", session_id)
-        elif "skill" in message_lower:
-            return get_job_detail(message, "skills", session_id)
-        elif "experience" in message_lower:
-            return get_job_detail(message, "experience", session_id)
-        elif "contract time" in message_lower:
-            return get_job_detail(message, "contract time", session_id)
-    
-    if "job" in message_lower or "career" in message_lower:
-        matches = search_jobs(message)
+    elif intent.name == "detail":
+        return get_job_detail(message, intent.detail_type, session_id, snapshot, filters)
+    elif intent.name == "job_search":
+        matches = search_jobs(message, snapshot=snapshot, filters=filters)
         if matches:
+            store = matches.snapshot.store
             response = "Here are some job listings that match your query:\n"
-            for job in matches[:3]:
-                response += f"- {job.get('title', 'No Title')} at {job.get('company', 'Unknown Company')}\n"
+            for row in matches[:3]:
+                response += f"- {store.get(row, 'title', 'No Title')} at {store.get(row, 'company', 'Unknown Company')}\n"
             return response
         else:
             return "Sorry, no job listings match your query right now."
-    elif "session" in message_lower or "event" in message_lower:
+    elif intent.name == "recommendations":
+        jobs = recommended_jobs(session_email(), limit=3)
+        if jobs:
+            response = "Here are some jobs picked for you from your recent searches:\n"
+            for job in jobs:
+                response += f"- {job['title']} at {job['company']}\n"
+            return response
+        else:
+            return "I don't have recommendations for you yet. Search for a few jobs and check back tomorrow."
+    elif intent.name == "sessions":
         if session_details:
             response = "Upcoming sessions:\n"
             for key, detail in session_details.items():
@@ -298,15 +579,59 @@ def process_message(message, history, session_id):
             return response
         else:
             return "Sorry, session details are not available."
-    elif "help" in message_lower:
+    elif intent.name == "help":
         return ("I can help with job listings, session details, mentorship opportunities, "
                 "and career advice. What would you like to know?")
-    elif "faq" in message_lower:
+    elif intent.name == "faq":
         return ("FAQs:\n- How do I apply for a job?\n- How do I register for a session?\n"
                 "- Who can join the mentorship program?")
     else:
         return "I'm sorry, I didn't understand that. Could you please clarify?"
 
+# -------------------- Health --------------------
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    # In lazy mode components load on first use, so the app can take traffic right away.
+    ready = components.all_ready() or STARTUP_MODE == "lazy"
+    return jsonify({"ready": ready, "startup_mode": STARTUP_MODE,
+                    "components": components.status()}), 200 if ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return metrics.REGISTRY.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+# -------------------- Admin --------------------
+def is_admin_request():
+    return bool(ADMIN_TOKEN) and request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+
+def profiling_requested():
+    return METRICS_PROFILING and request.headers.get('X-Profile') == "1" and is_admin_request()
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    snapshot = current_job_snapshot()
+    job_reloader.request_reload()
+    return jsonify({"status": "reload scheduled", "version": snapshot.version, "listings": len(snapshot)}), 202
+
+@app.route('/admin/cache-stats', methods=['GET'])
+def admin_cache_stats():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"query_embeddings": query_embedding_cache.stats(),
+                    "search_results": search_result_cache.stats(),
+                    "query_encoder": query_encoder.stats(),
+                    "supabase_auth": supabase_auth.stats(),
+                    "conversations": conversations.stats(),
+                    "user_data": user_data.stats(),
+                    "recommendations": recommendations.stats(),
+                    "log_queue": log_handler.stats()})
+
 # -------------------- Authentication with Supabase --------------------
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
@@ -317,25 +642,26 @@ def signup():
 
         try:
             # Sign up user
-            response = supabase.auth.sign_up({
-                "email": email,
-                "password": password
-            })
+            response = supabase_auth.sign_up(email, password)
+        except AuthUnavailable as e:
+            logging.error("Error during signup: %s", e)
+            return render_template('signup.html', error="Signup is temporarily unavailable. Please try again shortly.")
 
-            logging.info("Supabase signup response: %s", response)
+        logging.info("Supabase signup response status: %s", response.status)
 
-            # Check if there's an error
-            if response.user is None:
-                return render_template('signup.html', error="Signup failed. Please check your details.")
+        # Check if there's an error
+        if response.status != 200:
+            return render_template('signup.html', error="Signup failed. Please check your details.")
 
-            # Store user session
-            session["user"] = response.user.id  # Store user ID in session
+        # With email confirmation enabled, Supabase returns the user but no session yet.
+        if not response.data.get("access_token"):
+            return render_template('login.html', error="Please confirm your email, then log in.")
 
-            # Redirect to main chatbot UI after signup
-            return redirect(url_for('index'))
-        except Exception as e:
-            logging.error("Error during signup: %s", e)
-            return render_template('signup.html', error="Signup failed. Please try again.")
+        # Store user session
+        session["user"] = session_user(email, response.data)
+
+        # Redirect to main chatbot UI after signup
+        return redirect(url_for('index'))
 
     return render_template('signup.html')
 
@@ -381,23 +707,51 @@ def login():
         return "Missing email or password", 400
 
     # Login request to Supabase
-    response = requests.post(
-        f"{SUPABASE_URL}/auth/v1/token?grant_type=password",
-        json={"email": email, "password": password},
-        headers={"apikey": SUPABASE_KEY, "Content-Type": "application/json"},
-    )
-
-    data = response.json()
-    if response.status_code == 400 and "Email not confirmed" in str(data):
+    try:
+        response = supabase_auth.sign_in(email, password)
+    except AuthUnavailable as e:
+        logging.error("Error during login: %s", e)
+        return "Login is temporarily unavailable. Please try again shortly.", 503
+
+    data = response.data
+    if response.status == 400 and "Email not confirmed" in str(data):
         return "Email not confirmed. Please check your inbox.", 403
-    elif response.status_code != 200:
+    elif response.status != 200:
         return "Invalid login credentials", 401
 
-    session['user'] = {"email": email, "access_token": data.get("access_token")}
+    session['user'] = session_user(email, data)
     return redirect(url_for('index'))
 
+def session_user(email, auth_data):
+    return {"email": email, "access_token": auth_data.get("access_token"),
+            "refresh_token": auth_data.get("refresh_token")}
+
+def current_user():
+    # The session's user, after checking its access token with Supabase (cached
+    # briefly). An expired token is exchanged for a new one with the refresh
+    # token; only a session that cannot be refreshed ends. If Supabase is
+    # unreachable, the session is trusted rather than logging everyone out.
+    user = session.get("user")
+    if not isinstance(user, dict):
+        return None
+    token = user.get("access_token")
+    if token:
+        try:
+            if supabase_auth.get_user(token) is None:
+                refreshed = supabase_auth.refresh(user["refresh_token"]) if user.get("refresh_token") else None
+                if refreshed is None or refreshed.status != 200 or not refreshed.data.get("access_token"):
+                    session.clear()
+                    return None
+                user = session["user"] = session_user(user["email"], refreshed.data)
+        except AuthUnavailable as e:
+            logging.warning("Could not validate session token: %s", e)
+    return user
+
 @app.route('/logout')
 def logout():
+    user = session.get("user")
+    if isinstance(user, dict) and user.get("access_token"):
+        supabase_auth.forget_token(user["access_token"])
     session.clear()
     return redirect(url_for('login'))
 
@@ -422,37 +776,25 @@ def faq():
 # Fix: Profile Page
 @app.route('/profile', methods=['GET'])
 def profile():
-    if 'user' not in session:
+    user = current_user()
+    if user is None:
         return redirect(url_for('login'))
 
-    user_email = session['user']['email']
-    
-    try:
-        with open("session_details.json", "r") as file:
-            session_data = json.load(file)
-    except FileNotFoundError:
-        session_data = {"past_searches": []}
+    user_email = user['email']
 
     return jsonify({
         "email": user_email,
-        "past_searches": session_data.get("past_searches", [])
+        "past_searches": user_data.past_searches(user_email),
+        "recommended_jobs": recommended_jobs(user_email)
     })
 
-# Fix: Create 'session_details.json' if missing
-def ensure_session_file():
-    try:
-        with open("session_details.json", "r") as file:
-            json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        with open("session_details.json", "w") as file:
-            json.dump({"past_searches": []}, file)
 # -------------------- Main Chatbot Routes --------------------
 
 @app.route('/')
 # def index():
 #     return redirect(url_for('welcome'))
 def index():
-    user = session.get("user")
+    user = current_user()
     if user:
         # Render chatbot UI if logged in
         return render_template('index.html', user=user)
@@ -462,27 +804,52 @@ def index():
 
 @app.route('/chat', methods=['POST'])
 def chat():
+    if not profiling_requested():
+        with span("chat"):
+            return handle_chat()
+    with metrics.collect_spans() as spans, metrics.SamplingProfiler(PROFILE_INTERVAL_MS / 1000.0) as profiler:
+        with span("chat"):
+            response = app.make_response(handle_chat())
+    if isinstance(response.get_json(silent=True), dict):
+        body = response.get_json()
+        body["profile"] = {"stages": [[stage, round(seconds * 1000, 3)] for stage, seconds in spans],
+                           "samples": profiler.samples, "stacks": profiler.collapsed(50)}
+        response.set_data(json.dumps(body))
+    return response
+
+def handle_chat():
     try:
         data = request.get_json()
         user_message = data.get('message', ' ')
         session_id = data.get('session_id', 'default')
-        logging.info("Received message from session %s: %s", session_id, user_message)
+        logging.debug("Received message from session %s: %s", session_id, user_message)
         
-        history = session_store.get(session_id, [])
-        history.append({"sender": "user", "message": user_message, "timestamp": datetime.now().isoformat()})
+        user_entry = {"sender": "user", "message": user_message, "timestamp": datetime.now().isoformat()}
+        with span("history_read"):
+            history = conversations.history(session_id) + [user_entry]
         
-        bot_response = process_message(user_message, history, session_id)
-        history.append({"sender": "bot", "message": bot_response, "timestamp": datetime.now().isoformat()})
-        session_store[session_id] = history
+        with span("process_message"):
+            bot_response = process_message(user_message, history, session_id)
+        bot_entry = {"sender": "bot", "message": bot_response, "timestamp": datetime.now().isoformat()}
+        with span("history_write"):
+            total = conversations.append(session_id, user_entry, bot_entry)
         
-        logging.info("Updated session %s history. Total messages: %d", session_id, len(history))
-        return jsonify({"response": bot_response})
+        user = session.get("user")
+        if g.get("search_mode") and isinstance(user, dict) and user.get("email"):
+            with span("record_search"):
+                user_data.record_search(user["email"], user_message, timestamp=user_entry["timestamp"],
+                                        search_mode=g.search_mode)
+        
+        logging.debug("Updated session %s history. Total messages: %d", session_id, total)
+        return jsonify({"response": bot_response, "search_mode": g.get("search_mode")})
     except Exception as e:
+        CHAT_ERRORS.inc()
         logging.error("Error in /chat endpoint: %s", e)
         return jsonify({"response": "An error occurred. Please try again later."}), 500
 
+components.start(STARTUP_MODE)
+
 if __name__ == '__main__':
-    ensure_session_file()    
     app.run(debug=True)
 
 # to run this locally run - python app.py and access the app on "http://127.0.0.1:5000/"
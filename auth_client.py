@@ -0,0 +1,149 @@
+"""Supabase Auth over its REST API, through one shared, pooled HTTP session.
+
+* Keep-alive connections are reused across requests (pool of `pool_size`).
+* Every call has explicit connect/read timeouts. Under gevent's monkey-patching
+  the sockets are cooperative, so a slow call only parks its own greenlet.
+* A circuit breaker stops calling Supabase after `failure_threshold`
+  consecutive failures (timeouts, connection errors, 5xx). Calls fail fast with
+  AuthUnavailable until `reset_timeout` has passed, then one trial call decides
+  whether to close it again.
+* Successful token validations are cached for `token_cache_ttl` seconds, so
+  pages that check the session on every request do not call Supabase each time.
+  An expired access token is replaced through `refresh` with the session's
+  refresh token.
+
+Point SUPABASE_URL at `python mock_supabase.py` to run without a Supabase project.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from query_cache import LRUCache
+
+AuthResponse = namedtuple("AuthResponse", ["status", "data"])
+
+
+class AuthUnavailable(Exception):
+    """Supabase could not be reached, or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Whether a call may go ahead; in half-open state only one trial call is let through."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logging.warning("Supabase auth circuit opened after %d failures.", self._failures)
+                self._opened_at = time.monotonic()
+
+
+class SupabaseAuth:
+    def __init__(self, url, key, connect_timeout=3.0, read_timeout=10.0, pool_size=10,
+                 failure_threshold=5, reset_timeout=30.0, token_cache_ttl=60.0, token_cache_size=1024):
+        self.url = (url or "").rstrip("/")
+        self.key = key
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.token_cache = LRUCache(token_cache_size, ttl=token_cache_ttl)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, method, path, access_token=None, **kwargs):
+        if not self.url:
+            raise AuthUnavailable("SUPABASE_URL is not set")
+        if not self.breaker.allow():
+            raise AuthUnavailable("Supabase auth circuit is open")
+        headers = {"apikey": self.key or "", "Content-Type": "application/json"}
+        if access_token:
+            headers["Authorization"] = "Bearer %s" % access_token
+        try:
+            response = self.session.request(method, self.url + path, headers=headers, timeout=self.timeout,
+                                            **kwargs)
+        except requests.exceptions.RequestException as e:
+            self.breaker.record_failure()
+            raise AuthUnavailable(str(e))
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise AuthUnavailable("Supabase auth returned HTTP %d" % response.status_code)
+        self.breaker.record_success()
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        return AuthResponse(response.status_code, data)
+
+    def sign_up(self, email, password):
+        return self._request("POST", "/auth/v1/signup", json={"email": email, "password": password})
+
+    def sign_in(self, email, password):
+        return self._request("POST", "/auth/v1/token", params={"grant_type": "password"},
+                             json={"email": email, "password": password})
+
+    def refresh(self, refresh_token):
+        """Exchange a refresh token for a new session (access and refresh token)."""
+        return self._request("POST", "/auth/v1/token", params={"grant_type": "refresh_token"},
+                             json={"refresh_token": refresh_token})
+
+    def get_user(self, access_token):
+        """The user an access token belongs to, or None if Supabase rejects the token."""
+        key = hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+        user = self.token_cache.get(key)
+        if user is not None:
+            return user
+        response = self._request("GET", "/auth/v1/user", access_token=access_token)
+        if response.status != 200:
+            return None
+        self.token_cache.put(key, response.data)
+        return response.data
+
+    def forget_token(self, access_token):
+        """Drop a cached validation, e.g. on logout."""
+        self.token_cache.delete(hashlib.sha256(access_token.encode("utf-8")).hexdigest())
+
+    def stats(self):
+        return {"circuit": self.breaker.state, "token_cache": self.token_cache.stats()}
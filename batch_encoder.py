@@ -0,0 +1,105 @@
+"""Request-coalescing front end for SentenceTransformer.encode.
+
+Concurrent callers each submit one text; a dispatcher collects everything that
+arrives within `window_ms` (or until `max_batch_size` texts are queued), runs a
+single batched forward pass, and hands each caller its own vector.
+
+Works under threaded workers and under gevent: when gevent has monkey-patched
+threading, the dispatcher is a greenlet and the forward pass runs in gevent's
+native thread pool, so other greenlets keep accepting requests meanwhile.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def _gevent_patched():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("threading")
+
+
+class BatchingEncoder:
+    """`get_model` returns the SentenceTransformer; it is only called from the dispatcher,
+    so the model can load lazily."""
+
+    def __init__(self, get_model, window_ms=5.0, max_batch_size=32):
+        self.get_model = get_model
+        self.window = max(window_ms, 0) / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.batches = 0
+        self.items = 0
+        self._start_lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def encode(self, text, timeout=None):
+        """Normalized float32 embedding of `text`, computed in a shared batch."""
+        future = Future()
+        self._ensure_started().put((text, future))
+        return future.result(timeout=timeout)
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _ensure_started(self):
+        # Started lazily and restarted after a fork: threads do not survive into
+        # gunicorn workers forked from a preloaded master.
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._dispatch, args=(self._queue,),
+                                     name="batch-encoder", daemon=True).start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def _collect(self, pending):
+        batch = [pending.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _encode_batch(self, texts):
+        return self.get_model().encode(texts, batch_size=self.max_batch_size, convert_to_numpy=True,
+                                       normalize_embeddings=True, show_progress_bar=False)
+
+    def _run_forward(self, texts):
+        if _gevent_patched():
+            import gevent
+            return gevent.get_hub().threadpool.apply(self._encode_batch, (texts,))
+        return self._encode_batch(texts)
+
+    def _dispatch(self, pending):
+        while True:
+            batch = self._collect(pending)
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self._run_forward(texts)
+            except Exception as e:
+                logging.error("Batched encode of %d queries failed: %s", len(texts), e)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(np.array(vector, dtype=np.float32))
@@ -0,0 +1,11 @@
+"""Offline benchmarks and load tests for the chat pipeline.
+
+Run from the repository root:
+
+    python -m benchmarks.corpus --rows 10000 100000 1000000   # synthetic corpora (+ embedding caches)
+    python -m benchmarks.micro --rows 10000 100000            # load, index build, search, parsing
+    python -m benchmarks.load --rows 10000 --concurrency 8    # HTTP load against the Flask app
+    python -m benchmarks.compare old.json new.json             # flag regressions between two runs
+
+Every run writes a JSON result file to benchmarks/results/ (or --output).
+"""
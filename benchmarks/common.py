@@ -0,0 +1,135 @@
+"""Timing helpers and the JSON result format shared by the benchmark scripts.
+
+A result file looks like:
+
+    {"suite": "micro", "created": "...", "environment": {...}, "params": {...},
+     "results": [{"name": "search.hybrid", "params": {"rows": 100000}, "metrics": {"p50_ms": 1.9, ...}},
+                 {"name": "app.analyze_message", "params": {...}, "skipped": "Stanza resources not available"}]}
+
+Metrics are plain numbers. Names ending in one of HIGHER_IS_BETTER are better
+when larger (throughput); all others (latencies, seconds, MB) when smaller.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+DATA_DIR = os.path.join(BENCHMARKS_DIR, "data")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+HIGHER_IS_BETTER = ("per_sec", "recall", "overlap", "match_rate")
+
+# Settings that change what is being measured; recorded with every run.
+RELEVANT_ENV = ("EMBEDDING_CACHE_DTYPE", "VECTOR_INDEX", "IVF_NLIST", "IVF_NPROBE", "SEARCH_STRATEGY",
+                "HYBRID_CANDIDATES", "HYBRID_ALPHA", "OMP_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def higher_is_better(metric):
+    return metric.endswith(HIGHER_IS_BETTER)
+
+
+def latency_stats(samples_ms):
+    """p50/p95/p99/mean/max of a list of latencies in milliseconds."""
+    if not len(samples_ms):
+        return {}
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3),
+            "mean_ms": round(float(samples.mean()), 3), "max_ms": round(float(samples.max()), 3)}
+
+
+def time_each(fn, inputs, warmup=2):
+    """Milliseconds taken by `fn(x)` for each input, after `warmup` untimed calls."""
+    for x in list(inputs)[:warmup]:
+        fn(x)
+    samples = []
+    for x in inputs:
+        start = time.perf_counter()
+        fn(x)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def timed(fn, *args, **kwargs):
+    """(result, seconds) of one call."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return round(peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "git_commit": git_commit(),
+            "env": {name: os.environ[name] for name in RELEVANT_ENV if name in os.environ}}
+
+
+class Results:
+    def __init__(self, suite, params=None):
+        self.suite = suite
+        self.params = params or {}
+        self.entries = []
+
+    def add(self, name, params=None, **metrics):
+        entry = {"name": name, "params": params or {}, "metrics": metrics}
+        self.entries.append(entry)
+        print("%-28s %-28s %s" % (name, _format_params(entry["params"]),
+                                  "  ".join("%s=%s" % item for item in metrics.items())), flush=True)
+        return entry
+
+    def skip(self, name, reason, params=None):
+        reason = reason.strip().splitlines()[0] if reason.strip() else "skipped"
+        self.entries.append({"name": name, "params": params or {}, "skipped": reason})
+        print("%-28s %-28s skipped: %s" % (name, _format_params(params or {}), reason), flush=True)
+
+    def write(self, path=None):
+        if path is None:
+            os.makedirs(RESULTS_DIR, exist_ok=True)
+            path = os.path.join(RESULTS_DIR, "%s-%s.json" % (self.suite, time.strftime("%Y%m%d-%H%M%S")))
+        data = {"suite": self.suite, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "environment": environment(), "params": self.params, "results": self.entries}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print("Wrote %s" % path)
+        return path
+
+
+def _format_params(params):
+    return ",".join("%s=%s" % item for item in sorted(params.items()))
+
+
+def result_key(entry):
+    """Identifies the same measurement across runs, e.g. "search.hybrid[rows=100000]"."""
+    return "%s[%s]" % (entry["name"], _format_params(entry.get("params", {})))
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,59 @@
+"""Compare two benchmark result files and flag regressions.
+
+Measurements are matched by name and parameters. A metric regresses when it
+got worse by more than --threshold percent: larger for latencies, seconds and
+MB, smaller for throughput (see common.HIGHER_IS_BETTER). Exits with status 1
+if anything regressed, so it can gate CI.
+
+    python -m benchmarks.compare benchmarks/results/micro-old.json benchmarks/results/micro-new.json
+"""
+import argparse
+import sys
+
+from benchmarks.common import higher_is_better, load_results, result_key
+
+
+def compare(baseline, current, threshold=10.0, metrics=None):
+    """Rows of (key, metric, old, new, change %, status) for metrics present in both runs."""
+    old_entries = {result_key(entry): entry for entry in baseline["results"] if "metrics" in entry}
+    rows = []
+    for entry in current["results"]:
+        old = old_entries.get(result_key(entry))
+        if old is None or "metrics" not in entry:
+            continue
+        for metric, new_value in entry["metrics"].items():
+            old_value = old["metrics"].get(metric)
+            if metrics and metric not in metrics:
+                continue
+            if not isinstance(new_value, (int, float)) or not isinstance(old_value, (int, float)):
+                continue
+            if old_value == 0:
+                change = 0.0 if new_value == 0 else float("inf")
+            else:
+                change = (new_value - old_value) / abs(old_value) * 100
+            worse = -change if higher_is_better(metric) else change
+            status = "REGRESSED" if worse > threshold else "improved" if worse < -threshold else ""
+            rows.append((result_key(entry), metric, old_value, new_value, change, status))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change treated as significant")
+    parser.add_argument("--metrics", nargs="+", help="only these metrics (e.g. p50_ms p95_ms requests_per_sec)")
+    parser.add_argument("--all", action="store_true", help="also list unchanged metrics")
+    args = parser.parse_args()
+
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    print("baseline %s (%s)  vs  current %s (%s)" % (baseline["environment"].get("git_commit"), baseline["created"],
+                                                    current["environment"].get("git_commit"), current["created"]))
+    rows = compare(baseline, current, args.threshold, args.metrics)
+    for key, metric, old, new, change, status in rows:
+        if status or args.all:
+            print("%-60s %-18s %12s -> %-12s %+8.1f%%  %s" % (key, metric, old, new, change, status))
+    regressions = sum(1 for row in rows if row[5] == "REGRESSED")
+    print("%d metrics compared, %d regressed, %d improved (threshold %.0f%%)."
+          % (len(rows), regressions, sum(1 for row in rows if row[5] == "improved"), args.threshold))
+    sys.exit(1 if regressions else 0)
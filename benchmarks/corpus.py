@@ -0,0 +1,157 @@
+"""Synthetic job corpora scaled up from job_listing_data.csv.
+
+Row i of a corpus is a copy of a source listing (the first rows are the
+source listings themselves) with a new id. Some rows also get a seniority
+prefix on the title, a company variant, another location from the source,
+or a scaled salary. Descriptions are kept as they are, so text length,
+vocabulary and filter selectivity stay realistic as the row count grows.
+
+Next to each corpus CSV the source row of every synthetic row is saved. It
+is used to write a ready-made embedding cache: the source listing's vector
+plus a little noise. The app and the benchmarks can then search a 1M-row
+corpus without encoding it first. The source vectors come from the sentence
+transformer (`--embeddings model`, encoded once and cached) or are random
+(`--embeddings random`, when the model is not available).
+
+    python -m benchmarks.corpus --rows 10000 100000 1000000
+"""
+import argparse
+import csv
+import logging
+import os
+import time
+
+import numpy as np
+
+import embedding_store
+from job_store import load_csv
+from listing_db import COLUMNS
+
+from benchmarks.common import DATA_DIR, REPO_DIR
+
+DEFAULT_SOURCE = os.path.join(REPO_DIR, "job_listing_data.csv")
+DEFAULT_MODEL = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+DEFAULT_SIZES = (10000, 100000, 1000000)
+RANDOM_DIM = 384            # all-MiniLM-L6-v2's dimension
+NOISE_SCALE = 0.02          # per dimension; keeps a copy at cosine ~0.9 to its source
+SENIORITY = ("Senior", "Junior", "Lead", "Associate", "Principal")
+
+
+def label(rows):
+    if rows % 1000000 == 0:
+        return "%dm" % (rows // 1000000)
+    if rows % 1000 == 0:
+        return "%dk" % (rows // 1000)
+    return str(rows)
+
+
+def corpus_paths(rows, data_dir=DATA_DIR, embeddings="model"):
+    base = os.path.join(data_dir, "jobs_%s" % label(rows))
+    return {"csv": base + ".csv", "source": base + ".source.npy", "cache": "%s.%s.emb.bin" % (base, embeddings)}
+
+
+def load_model(model_name=DEFAULT_MODEL):
+    """(SentenceTransformer, None), or (None, reason) if it cannot be loaded here.
+
+    Only a locally cached model is used (HF_HUB_OFFLINE=0 allows downloading it).
+    """
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    try:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name), None
+    except Exception as e:
+        return None, "%s: %s" % (type(e).__name__, e)
+
+
+def write_corpus(base, rows, csv_path, seed=0):
+    """Write `rows` synthetic listings to `csv_path`; returns each row's source row."""
+    rng = np.random.default_rng(seed)
+    source = np.concatenate([np.arange(min(rows, len(base))),
+                             rng.integers(0, len(base), size=max(rows - len(base), 0))]).astype(np.int64)
+    locations = sorted({base.get(row, "location", "") for row in range(len(base))} - {""})
+    company_variants = max(1, rows // 10000)
+    tmp_path = csv_path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for i, src in enumerate(source.tolist()):
+            job = {field: base.get(src, field, "") for field in COLUMNS}
+            job["id"] = "bench-%d" % i
+            job["redirect_url"] = "%s#bench-%d" % (job["redirect_url"], i)
+            if i >= len(base):
+                draw = rng.random(4)
+                if draw[0] < 0.3:
+                    job["title"] = "%s %s" % (SENIORITY[i % len(SENIORITY)], job["title"])
+                if draw[1] < 0.5 and job["company"] and company_variants > 1:
+                    job["company"] = "%s %d" % (job["company"], i % company_variants)
+                if draw[2] < 0.3 and locations:
+                    job["location"] = locations[i % len(locations)]
+                for field in ("salary_min", "salary_max"):
+                    if job[field] not in (None, ""):
+                        job[field] = round(float(job[field]) * (0.8 + 0.45 * draw[3]))
+            writer.writerow(["" if job[field] is None else job[field] for field in COLUMNS])
+    os.replace(tmp_path, csv_path)
+    return source
+
+
+def source_vectors(base, embeddings, model_name=DEFAULT_MODEL, data_dir=DATA_DIR, seed=0):
+    """Vectors of the source listings: encoded by the model (cached on disk) or random."""
+    if embeddings == "random":
+        return np.random.default_rng(seed).normal(size=(len(base), RANDOM_DIM)).astype(np.float32)
+    model, error = load_model(model_name)
+    if model is None:
+        raise RuntimeError("cannot load %s (%s); use --embeddings random" % (model_name, error))
+    cache = embedding_store.load_or_build(model, model_name, base, os.path.join(data_dir, "source.emb.bin"))
+    return np.asarray(cache.vectors, dtype=np.float32)
+
+
+def write_corpus_cache(cache_path, csv_path, source, vectors, model_name=DEFAULT_MODEL, seed=0,
+                       chunk_rows=65536):
+    """Embedding cache for the corpus: each row's source vector plus noise."""
+    jobs = load_csv(csv_path)
+    rng = np.random.default_rng(seed + 1)
+
+    def blocks():
+        for lo in range(0, len(source), chunk_rows):
+            block = vectors[source[lo:lo + chunk_rows]]
+            yield block + rng.normal(scale=NOISE_SCALE, size=block.shape).astype(np.float32)
+    return embedding_store.write_cache(cache_path, model_name, jobs, blocks(), vectors.shape[1])
+
+
+def ensure_corpus(rows, source_csv=DEFAULT_SOURCE, embeddings="model", model_name=DEFAULT_MODEL,
+                  data_dir=DATA_DIR, force=False, seed=0):
+    """Paths of the corpus (and, unless embeddings is "none", its cache), generating what is missing."""
+    os.makedirs(data_dir, exist_ok=True)
+    paths = corpus_paths(rows, data_dir, embeddings)
+    base = None
+    if force or not (os.path.exists(paths["csv"]) and os.path.exists(paths["source"])):
+        base = load_csv(source_csv)
+        start = time.time()
+        source = write_corpus(base, rows, paths["csv"], seed)
+        np.save(paths["source"], source)
+        logging.info("Wrote %d synthetic listings to %s in %.1fs.", rows, paths["csv"], time.time() - start)
+    if embeddings != "none" and (force or not os.path.exists(paths["cache"])):
+        base = base if base is not None else load_csv(source_csv)
+        start = time.time()
+        write_corpus_cache(paths["cache"], paths["csv"], np.load(paths["source"]),
+                           source_vectors(base, embeddings, model_name, data_dir, seed), model_name, seed)
+        logging.info("Wrote embedding cache %s in %.1fs.", paths["cache"], time.time() - start)
+    if embeddings == "none":
+        paths.pop("cache")
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic job corpora for the benchmarks.")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--source", default=DEFAULT_SOURCE)
+    parser.add_argument("--embeddings", choices=("model", "random", "none"), default="model",
+                        help="also write an embedding cache from model or random source vectors")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--force", action="store_true", help="regenerate existing files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    for rows in args.rows:
+        print(ensure_corpus(rows, args.source, args.embeddings, args.model, args.data_dir, args.force))
@@ -0,0 +1,239 @@
+"""Concurrent HTTP load test of the Flask app, with Supabase stubbed locally.
+
+Starts mock_supabase.py in-process and the app in a subprocess, either Flask's
+threaded server or gunicorn. The app serves a synthetic corpus with a
+ready-made embedding cache (see benchmarks/corpus.py), so startup does not
+encode anything. The script signs up and logs in --users users. Then
+--concurrency client threads replay a chat mix until --requests requests have
+completed: a job search, a detail lookup and its numeric follow-up, "help",
+and GET /profile.
+
+Reported per request kind and overall: p50/p95/p99 latency, throughput,
+errors. Also reported: the server's peak RSS (summed over its worker
+processes) and the time until /readyz turned ready.
+
+    python -m benchmarks.load --rows 10000 --concurrency 8 --requests 2000
+    python -m benchmarks.load --server gunicorn --workers 4
+"""
+import argparse
+import itertools
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+import mock_supabase
+from job_store import load_csv
+
+from benchmarks import corpus
+from benchmarks.common import REPO_DIR, Results, latency_stats
+from benchmarks.micro import chat_queries
+
+DETAIL_TEMPLATES = ("salary for %s", "link for %s", "contract time for %s job")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_command(server, port, workers):
+    if server == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "-c", os.path.join(REPO_DIR, "gunicorn.conf.py"),
+                "-w", str(workers), "-b", "127.0.0.1:%d" % port, "--timeout", "300", "app:app"]
+    return [sys.executable, "-c", "import app; app.app.run(host='127.0.0.1', port=%d, threaded=True)" % port]
+
+
+def process_tree_rss_kb(pid):
+    """Summed VmRSS of `pid` and its descendants from /proc, or None off Linux."""
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open("/proc/%d/status" % current) as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+            with open("/proc/%d/task/%d/children" % (current, current)) as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            if current == pid:
+                return None
+    return total
+
+
+class RSSSampler(threading.Thread):
+    def __init__(self, pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss = process_tree_rss_kb(self.pid)
+            if rss is not None:
+                self.peak_kb = max(self.peak_kb or 0, rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return round(self.peak_kb / 1024.0, 1) if self.peak_kb else None
+
+
+def wait_ready(base_url, process, timeout):
+    start = time.time()
+    while time.time() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError("server exited with status %s" % process.returncode)
+        try:
+            if requests.get(base_url + "/readyz", timeout=5).status_code == 200:
+                return time.time() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("server not ready after %ds" % timeout)
+
+
+def login(base_url, email, password="benchmark-password"):
+    client = requests.Session()
+    client.post(base_url + "/signup", data={"email": email, "password": password, "name": "Benchmark"}, timeout=30)
+    response = client.post(base_url + "/login", data={"email": email, "password": password}, timeout=30,
+                           allow_redirects=False)
+    if response.status_code != 302:
+        raise RuntimeError("login failed for %s: %s %s" % (email, response.status_code, response.text[:200]))
+    return client
+
+
+def request_script(queries):
+    """Endless (kind, message) sequence: a chat session's worth of requests per query."""
+    for i, query in enumerate(itertools.cycle(queries)):
+        yield "chat_search", query
+        yield "chat_detail", DETAIL_TEMPLATES[i % len(DETAIL_TEMPLATES)] % query
+        yield "chat_selection", "1"
+        yield "chat_help", "help"
+        yield "profile", None
+
+
+def run_clients(base_url, clients, queries, total, warmup):
+    counter = itertools.count()
+    samples = []    # (kind, ms, ok)
+    lock = threading.Lock()
+
+    def worker(n, client):
+        session_id = "benchmark-%d" % n
+        script = request_script(queries[n % len(queries):] + queries[:n % len(queries)])
+        while True:
+            i = next(counter)
+            if i >= total + warmup:
+                return
+            kind, message = next(script)
+            start = time.perf_counter()
+            try:
+                if kind == "profile":
+                    response = client.get(base_url + "/profile", timeout=60)
+                else:
+                    response = client.post(base_url + "/chat", json={"message": message, "session_id": session_id},
+                                           timeout=60)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            ms = (time.perf_counter() - start) * 1000
+            if i >= warmup:
+                with lock:
+                    samples.append((kind, ms, ok))
+
+    threads = [threading.Thread(target=worker, args=(n, client)) for n, client in enumerate(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def run(args, results):
+    paths = corpus.ensure_corpus(args.rows, embeddings=args.embeddings, model_name=args.model)
+    queries = chat_queries(load_csv(paths["csv"]), max(args.requests // 5, 20))
+    tmp_dir = tempfile.mkdtemp(prefix="asha-load-")
+    supabase_server, supabase_url = mock_supabase.start_mock_server(latency_ms=args.supabase_latency_ms)
+    port = args.port or free_port()
+    base_url = "http://127.0.0.1:%d" % port
+    env = dict(os.environ, SUPABASE_URL=supabase_url, SUPABASE_KEY="benchmark", JOB_LISTINGS_CSV=paths["csv"],
+               JOB_LISTINGS_DB=os.path.join(tmp_dir, "no-listings.db"), EMBEDDING_CACHE_FILE=paths["cache"],
+               USER_DATA_DIR=os.path.join(tmp_dir, "user_data"),
+               CONVERSATION_DB=os.path.join(tmp_dir, "conversations.db"), STARTUP_MODE="warmup",
+               HF_HUB_OFFLINE=os.getenv("HF_HUB_OFFLINE", "1"),
+               PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.getenv("PYTHONPATH")])))
+    log_path = os.path.join(tmp_dir, "server.log")
+    params = {"rows": args.rows, "embeddings": args.embeddings, "server": args.server, "concurrency": args.concurrency,
+              "workers": args.workers if args.server == "gunicorn" else 1}
+    with open(log_path, "wb") as log:
+        # Run from the scratch directory so the server's log and data files stay out of the repository.
+        process = subprocess.Popen(server_command(args.server, port, args.workers), cwd=tmp_dir, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+    sampler = RSSSampler(process.pid)
+    sampler.start()
+    try:
+        startup = wait_ready(base_url, process, args.startup_timeout)
+        clients = [login(base_url, "bench%d@example.com" % (n % args.users)) for n in range(args.concurrency)]
+        samples, seconds = run_clients(base_url, clients, queries, args.requests, args.warmup)
+        peak_rss = sampler.stop()
+        for kind in sorted({kind for kind, _, _ in samples}):
+            latencies = [ms for k, ms, _ in samples if k == kind]
+            results.add("load.%s" % kind, params, **latency_stats(latencies),
+                        errors=sum(1 for k, _, ok in samples if k == kind and not ok))
+        results.add("load.total", dict(params, requests=len(samples)), **latency_stats([ms for _, ms, _ in samples]),
+                    requests_per_sec=round(len(samples) / seconds, 1),
+                    errors=sum(1 for _, _, ok in samples if not ok),
+                    server_peak_rss_mb=peak_rss, startup_seconds=round(startup, 2))
+    except Exception:
+        with open(log_path, "rb") as f:
+            sys.stderr.write(f.read()[-4000:].decode("utf-8", "replace"))
+        raise
+    finally:
+        if sampler.is_alive():
+            sampler.stop()
+        process.terminate()
+        try:
+            process.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        supabase_server.shutdown()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP load test of /chat and /profile.")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--embeddings", choices=("model", "random"), default="model",
+                        help="how the corpus embedding cache is made (the server always needs the model)")
+    parser.add_argument("--model", default=corpus.DEFAULT_MODEL)
+    parser.add_argument("--server", choices=("flask", "gunicorn"), default="flask")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=1000, help="timed requests")
+    parser.add_argument("--warmup", type=int, default=50, help="untimed requests first")
+    parser.add_argument("--supabase-latency-ms", type=float, default=0.0)
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/load-<time>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    results = Results("load", vars(args))
+    try:
+        run(args, results)
+    finally:
+        results.write(args.output)
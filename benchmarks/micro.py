@@ -0,0 +1,253 @@
+"""Microbenchmarks of the pieces /chat is built from, at several corpus sizes.
+
+For each synthetic corpus (see benchmarks/corpus.py) this measures:
+
+* loading: CSV and SQLite listing loads, and the warm embedding-cache load the app does at startup
+* index builds: BM25, filter indexes, IVF training
+* search, per query: exact and IVF vector search, BM25, filter extraction, hybrid with and without filters
+* model work: a cold embedding build of --embed-rows listings, single-query encoding
+* app level: Stanza parsing (analyze_message) and process_message end to end, with caches cleared
+
+Benchmarks whose model or Stanza resources cannot be loaded are recorded as
+skipped rather than failing the run.
+
+    python -m benchmarks.micro --rows 10000 100000 --queries 200
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import embedding_store
+import hybrid_search
+import job_filters
+import listing_db
+import vector_index
+from job_snapshot import JobSnapshot
+from job_store import load_csv
+from lexical_search import BM25Index
+
+from benchmarks import corpus
+from benchmarks.common import Results, latency_stats, peak_rss_mb, time_each, timed
+
+K = 3
+SIMILARITY_THRESHOLD = 0.3
+
+
+def chat_queries(store, count, seed=0):
+    """Search-style chat messages: free text, sampled titles/companies, and filtered variants."""
+    queries = hybrid_search.default_queries(store, per_field=max(count // 4, 1), seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    rows = rng.choice(len(store), size=min(max(count // 4, 1), len(store)), replace=False)
+    for row in rows.tolist():
+        title, location = store.get(row, "title", ""), store.get(row, "location", "")
+        queries.append("%s jobs in %s" % (title, location.split(",")[0]) if location else title)
+        queries.append("full time %s with salary above 5 lakh" % title)
+    queries = [query for query in queries if query.strip()]
+    return [queries[i % len(queries)] for i in range(count)]
+
+
+def query_vectors(queries, model, snapshot, seed=0):
+    """Query embeddings from the model, or (without one) noisy copies of random listing vectors."""
+    if model is not None:
+        return model.encode(queries, convert_to_numpy=True, normalize_embeddings=True,
+                            show_progress_bar=False).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.integers(0, len(snapshot), size=len(queries)))
+    vectors = np.asarray(snapshot.embeddings[rows], dtype=np.float32)
+    vectors = vectors + rng.normal(scale=0.05, size=vectors.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def current_cache(path, model_name, store):
+    """The corpus's embedding cache, mapped and checked against every row's hash and id
+    as a restart does; None if it is missing or out of date."""
+    if not os.path.exists(path):
+        return None
+    cache = embedding_store.load_cache(path)
+    hashes = embedding_store.row_hashes([embedding_store.job_text(job) for job in store])
+    if not cache.matches(model_name, embedding_store.text_recipe(), hashes, embedding_store.id_keys(store)):
+        return None
+    return cache
+
+
+def bench_loading(results, paths, params, tmp_dir, model, model_name):
+    store, seconds = timed(load_csv, paths["csv"])
+    results.add("load.csv", params, seconds=round(seconds, 3), rows_per_sec=round(len(store) / seconds),
+                store_mb=round(store.nbytes / 1e6, 1))
+
+    db_path = os.path.join(tmp_dir, "listings.db")
+    conn = listing_db.connect(db_path)
+    listing_db.import_csv(conn, paths["csv"])
+    listing_db.checkpoint(conn)
+    conn.close()
+    db_store, seconds = timed(listing_db.load_store, db_path)
+    results.add("load.sqlite", params, seconds=round(seconds, 3), rows_per_sec=round(len(db_store) / seconds))
+    del db_store
+
+    # What a restart costs when the cache is current.
+    cache, seconds = timed(current_cache, paths["cache"], model_name, store)
+    if cache is not None:
+        results.add("load.embedding_cache", params, seconds=round(seconds, 3),
+                    cache_mb=round(os.path.getsize(paths["cache"]) / 1e6, 1))
+        return store, cache
+    if model is None:
+        results.skip("load.embedding_cache", "cache is missing or out of date and no model is available to "
+                     "rebuild it (`python -m benchmarks.corpus --force` regenerates it)", params)
+        return store, None
+    results.skip("load.embedding_cache", "cache was missing or out of date; rebuilt with the model", params)
+    return store, embedding_store.load_or_build(model, model_name, store, paths["cache"])
+
+
+def build_snapshot(results, store, cache, params, tmp_dir):
+    lexical, seconds = timed(BM25Index.build, store)
+    results.add("build.bm25", params, seconds=round(seconds, 3), rows_per_sec=round(len(store) / seconds))
+
+    ivf, seconds = timed(vector_index.load_or_build_index, cache, os.path.join(tmp_dir, "cache.bin"), kind="ivf")
+    results.add("build.ivf", params, seconds=round(seconds, 3), nlist=ivf.nlist)
+
+    snapshot = JobSnapshot(0, store, cache.vectors, ivf, lexical, id_keys=cache.keys)
+    _, seconds = timed(snapshot.filter_index)
+    results.add("build.filter_index", params, seconds=round(seconds, 3))
+    return snapshot
+
+
+def bench_search(results, snapshot, queries, vectors, params):
+    exact = vector_index.ExactIndex(snapshot.embeddings)
+    ivf = snapshot.index
+    lexical = snapshot.lexical_index()
+    filter_index = snapshot.filter_index()
+    pairs = list(zip(queries, vectors))
+    search_params = dict(params, queries=len(queries))
+
+    def add(name, fn):
+        results.add(name, search_params, **latency_stats(time_each(fn, pairs)))
+
+    add("search.vector_exact", lambda p: exact.search(p[1], K, SIMILARITY_THRESHOLD))
+    add("search.vector_ivf", lambda p: ivf.search(p[1], K, SIMILARITY_THRESHOLD))
+    add("search.bm25", lambda p: lexical.search(p[0], K))
+    add("search.filters", lambda p: filter_index.rows(job_filters.extract_filters(p[0], [], filter_index)))
+    add("search.hybrid", lambda p: hybrid_search.hybrid_search(snapshot, p[0], p[1], K, SIMILARITY_THRESHOLD))
+
+    def filtered(p):
+        rows = filter_index.rows(job_filters.extract_filters(p[0], [], filter_index))
+        return hybrid_search.hybrid_search(snapshot, p[0], p[1], K, SIMILARITY_THRESHOLD, rows=rows)
+    add("search.hybrid_filtered", filtered)
+
+
+def bench_model(results, model, model_reason, store, queries, params, tmp_dir, embed_rows, model_name):
+    if model is None:
+        results.skip("build.embeddings", model_reason, params)
+        results.skip("encode.query", model_reason, params)
+        return
+    jobs = [store[row] for row in range(min(embed_rows, len(store)))]
+    path = os.path.join(tmp_dir, "sample.emb.bin")
+    _, seconds = timed(embedding_store.build_cache, model, model_name, jobs, path)
+    results.add("build.embeddings", dict(params, encoded_rows=len(jobs)), seconds=round(seconds, 3),
+                rows_per_sec=round(len(jobs) / seconds, 1))
+    results.add("encode.query", dict(params, queries=len(queries)),
+                **latency_stats(time_each(lambda q: model.encode(q, convert_to_numpy=True, normalize_embeddings=True,
+                                                                 show_progress_bar=False), queries)))
+
+
+def load_app(app_dir):
+    """The Flask app module, configured through its environment so that it loads and
+    watches nothing itself: every corpus size publishes its own snapshot (bench_app).
+    Its user data and listing paths live in `app_dir`, which outlives the sizes."""
+    os.environ.update(STARTUP_MODE="lazy", JOB_RELOAD_POLL_SECONDS="0", JOB_RELOAD_INTERVAL_SECONDS="0",
+                      JOB_LISTINGS_CSV=os.path.join(app_dir, "no-listings.csv"),
+                      JOB_LISTINGS_DB=os.path.join(app_dir, "no-listings.db"),
+                      EMBEDDING_CACHE_FILE=os.path.join(app_dir, "no-embeddings.bin"),
+                      USER_DATA_DIR=os.path.join(app_dir, "user_data"),
+                      RECOMMENDATIONS_DB=os.path.join(app_dir, "recommendations.db"),
+                      CONVERSATION_BACKEND="memory")
+    import app
+    return app
+
+
+def bench_app(results, app_module, snapshot, queries, params, model_reason):
+    # The benchmark snapshot stands in for the listing and embedding loaders; left
+    # unloaded, the first message would try to load listings from the app's
+    # (empty) paths over it and start an embedding build.
+    app_module.job_listings_component.provide(None)
+    app_module.job_embeddings_component.provide(None)
+    app_module.job_reloader.publish(snapshot)
+    try:
+        app_module.analyze_message("warm up")
+    except Exception as e:
+        reason = "%s: %s" % (type(e).__name__, e)
+        results.skip("app.analyze_message", reason, params)
+        results.skip("app.process_message", reason, params)
+        return
+    results.add("app.analyze_message", dict(params, queries=len(queries)),
+                **latency_stats(time_each(app_module.analyze_message, queries)))
+    if model_reason:
+        results.skip("app.process_message", model_reason, params)
+        return
+
+    def process(query):
+        # Every message misses the query and result caches, as a new query would.
+        app_module.query_embedding_cache.clear()
+        app_module.search_result_cache.clear()
+        return app_module.process_message(query, [], "benchmark")
+    with app_module.app.test_request_context():
+        results.add("app.process_message", dict(params, queries=len(queries)),
+                    **latency_stats(time_each(process, queries)))
+
+
+def run(sizes, queries_per_size, embeddings, model_name, embed_rows, skip_app, results):
+    if embeddings == "random":
+        model, model_reason = None, "--embeddings random"
+    else:
+        model, model_reason = corpus.load_model(model_name)
+    if model is None and embeddings == "model":
+        logging.warning("Model unavailable (%s); using random embeddings.", model_reason)
+        embeddings = "random"
+    app_module = None
+    app_dir = tempfile.mkdtemp(prefix="asha-bench-app-")
+    try:
+        for rows in sizes:
+            paths = corpus.ensure_corpus(rows, embeddings=embeddings, model_name=model_name)
+            params = {"rows": rows, "embeddings": embeddings}
+            tmp_dir = tempfile.mkdtemp(prefix="asha-bench-")
+            try:
+                store, cache = bench_loading(results, paths, params, tmp_dir, model, model_name)
+                if cache is None:
+                    continue
+                snapshot = build_snapshot(results, store, cache, params, tmp_dir)
+                queries = chat_queries(store, queries_per_size)
+                vectors = query_vectors(queries, model, snapshot)
+                bench_search(results, snapshot, queries, vectors, params)
+                bench_model(results, model, model_reason, store, queries, params, tmp_dir, embed_rows, model_name)
+                if not skip_app:
+                    app_module = app_module or load_app(app_dir)
+                    bench_app(results, app_module, snapshot, queries, params, model_reason)
+                results.add("memory", params, peak_rss_mb=peak_rss_mb(), store_mb=round(store.nbytes / 1e6, 1),
+                            vectors_mb=round(snapshot.embeddings.nbytes / 1e6, 1))
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(app_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks of loading, indexing and search.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200, help="queries per corpus size")
+    parser.add_argument("--embeddings", choices=("model", "random"), default="model",
+                        help="corpus vectors from the sentence transformer or random (falls back to random)")
+    parser.add_argument("--model", default=corpus.DEFAULT_MODEL)
+    parser.add_argument("--embed-rows", type=int, default=1000, help="listings encoded in the embedding build")
+    parser.add_argument("--skip-app", action="store_true", help="skip the Stanza and process_message benchmarks")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/micro-<time>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    results = Results("micro", vars(args))
+    try:
+        run(args.rows, args.queries, args.embeddings, args.model, args.embed_rows, args.skip_app, results)
+    finally:
+        results.write(args.output)
@@ -0,0 +1,239 @@
+"""Offline bulk job matching: precomputed "jobs for you" recommendations per user.
+
+A nightly run turns each user's recent searches (or any list of user queries)
+into one profile vector per user. It scores every profile against every cached
+listing embedding and keeps the top k per user in the recommendations store
+(recommendations.py). /profile and /chat then read a user's recommendations
+with one indexed lookup.
+
+    python bulk_match.py                       # users' past searches under USER_DATA_DIR
+    python bulk_match.py --queries q.jsonl     # {"user": email, "query": text} per line
+
+Pipeline:
+
+1. Query texts are deduplicated (normalize_query) and encoded in batches. Each
+   user's vector is the normalized mean of their last --recent queries. User
+   vectors go to a temporary memory-mapped .npy file.
+2. The listings' vectors come from the embedding cache (updated first if stale),
+   memory-mapped, so worker processes share one copy through the page cache.
+3. A process pool takes blocks of `user_block` users. Each worker walks the
+   listings in chunks of `job_chunk` rows: one (user_block x job_chunk) matrix
+   product, then a running per-user top-k merge. Per-worker memory is about
+   16 * user_block * job_chunk bytes (scores plus partition indices) regardless
+   of N and M: 128 MB at the defaults.
+4. Finished blocks are written to the store as they complete. Results are
+   listing id keys (embedding_store.id_keys), so they resolve against whatever
+   snapshot the app is serving.
+
+At N=100k and M=1M with 384 dimensions, a run is about 4e13 multiply-adds,
+a few minutes on a 16-core node. Each worker process runs single-threaded
+BLAS, so the pool does not oversubscribe the cores.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import embedding_store
+from query_cache import normalize_query
+from recommendations import DEFAULT_DB, RecommendationStore
+
+DEFAULT_TOP_K = 10
+DEFAULT_RECENT = 5          # most recent searches per user that make up their profile
+DEFAULT_USER_BLOCK = 1024   # users scored together by one worker task
+DEFAULT_JOB_CHUNK = 8192    # listings per matrix product
+ENCODE_BATCH_SIZE = 256
+
+_THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def user_queries_from_searches(users, recent=DEFAULT_RECENT):
+    """(email, [query, ...]) from user_data.iter_users records, newest `recent` searches each."""
+    for email, searches in users:
+        queries = [entry["query"] for entry in searches[-recent:] if entry.get("query", "").strip()]
+        if queries:
+            yield email, queries
+
+
+def user_queries_from_file(path, recent=DEFAULT_RECENT):
+    """(email, [query, ...]) from a JSON-lines file of {"user", "query"} records, in file order."""
+    grouped = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("query", "").strip():
+                    grouped.setdefault(record["user"], []).append(record["query"])
+    for email, queries in grouped.items():
+        yield email, queries[-recent:]
+
+
+def encode_users(model, user_queries, path, batch_size=ENCODE_BATCH_SIZE):
+    """Write one normalized profile vector per user to a .npy file at `path`.
+
+    Returns (emails, query counts). Each distinct query text is encoded once,
+    however many users searched for it; the query vectors are staged on disk
+    next to `path`, so memory does not grow with the number of queries.
+    """
+    emails, counts, query_ids, texts, text_ids = [], [], [], [], {}
+    for email, queries in user_queries:
+        ids = []
+        for query in queries:
+            key = normalize_query(query)
+            if key not in text_ids:
+                text_ids[key] = len(texts)
+                texts.append(key)
+            ids.append(text_ids[key])
+        emails.append(email)
+        counts.append(len(ids))
+        query_ids.append(ids)
+    if not emails:
+        return emails, counts
+    dim = model.get_sentence_embedding_dimension()
+    start = time.time()
+    query_vectors = np.lib.format.open_memmap(path + ".queries.npy", mode="w+", dtype=np.float32,
+                                              shape=(len(texts), dim))
+    for lo in range(0, len(texts), batch_size * 16):
+        query_vectors[lo:lo + batch_size * 16] = model.encode(
+            texts[lo:lo + batch_size * 16], batch_size=batch_size, convert_to_numpy=True,
+            normalize_embeddings=True, show_progress_bar=False)
+    logging.info("Encoded %d distinct queries of %d users in %.1fs.", len(texts), len(emails), time.time() - start)
+    users = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(emails), dim))
+    for i, ids in enumerate(query_ids):
+        vector = query_vectors[ids].mean(axis=0)
+        norm = np.linalg.norm(vector)
+        users[i] = vector / norm if norm else vector
+    users.flush()
+    del users, query_vectors
+    os.remove(path + ".queries.npy")
+    return emails, counts
+
+
+_worker = {}
+
+
+def _init_worker(cache_path, users_path):
+    _worker["vectors"] = embedding_store.load_cache(cache_path).vectors
+    _worker["users"] = np.load(users_path, mmap_mode="r")
+
+
+def top_k_block(users, vectors, k, job_chunk=DEFAULT_JOB_CHUNK):
+    """Exact top-k (rows, scores) of every listing for each user vector, best first."""
+    n = len(users)
+    k = min(k, len(vectors))
+    best_rows = np.full((n, k), -1, dtype=np.int64)
+    best_neg = np.full((n, k), np.inf, dtype=np.float32)   # negated scores: smaller is better
+    if k == 0:
+        return best_rows, -best_neg
+    for lo in range(0, len(vectors), job_chunk):
+        block = np.asarray(vectors[lo:lo + job_chunk], dtype=np.float32)
+        scores = users @ block.T
+        np.negative(scores, out=scores)
+        kk = min(k, scores.shape[1])
+        part = np.argpartition(scores, kk - 1, axis=1)[:, :kk]
+        merged_neg = np.concatenate([best_neg, np.take_along_axis(scores, part, axis=1)], axis=1)
+        merged_rows = np.concatenate([best_rows, part + lo], axis=1)
+        keep = np.argpartition(merged_neg, k - 1, axis=1)[:, :k]
+        best_neg = np.take_along_axis(merged_neg, keep, axis=1)
+        best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+    order = np.argsort(best_neg, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), -np.take_along_axis(best_neg, order, axis=1)
+
+
+def _score_block(lo, hi, k, job_chunk):
+    users = np.asarray(_worker["users"][lo:hi], dtype=np.float32)
+    rows, scores = top_k_block(users, _worker["vectors"], k, job_chunk)
+    return lo, hi, rows, scores
+
+
+def match(cache, cache_path, users_path, emails, counts, store, k=DEFAULT_TOP_K, workers=0,
+          user_block=DEFAULT_USER_BLOCK, job_chunk=DEFAULT_JOB_CHUNK):
+    """Score every user against every cached listing in a process pool; returns the number of users written."""
+    workers = workers or os.cpu_count() or 1
+    generated_at = time.time()
+    written = 0
+    start = time.time()
+    # Children read these before importing numpy: one BLAS thread per process.
+    saved = {name: os.environ.get(name) for name in _THREAD_ENV}
+    os.environ.update({name: "1" for name in _THREAD_ENV})
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(cache_path, users_path)) as pool:
+            futures = [pool.submit(_score_block, lo, min(lo + user_block, len(emails)), k, job_chunk)
+                       for lo in range(0, len(emails), user_block)]
+            for future in as_completed(futures):
+                lo, hi, rows, scores = future.result()
+                entries = []
+                for i in range(hi - lo):
+                    valid = rows[i] >= 0
+                    entries.append((emails[lo + i], cache.keys[rows[i][valid]], scores[i][valid], counts[lo + i]))
+                store.put_many(entries, generated_at)
+                written += len(entries)
+                logging.info("Matched %d/%d users (%.0f users/s).", written, len(emails),
+                             written / max(time.time() - start, 1e-9))
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return written
+
+
+def run(model, model_name, jobs, cache_path, user_queries, store, k=DEFAULT_TOP_K, workers=0,
+        user_block=DEFAULT_USER_BLOCK, job_chunk=DEFAULT_JOB_CHUNK, dtype="float32", description_chars=0):
+    """Encode the users' queries, make sure the listing cache is current, and match; returns a report."""
+    start = time.time()
+    cache = embedding_store.load_or_build(model, model_name, jobs, cache_path, dtype=dtype,
+                                          description_chars=description_chars)
+    with tempfile.TemporaryDirectory(prefix="bulk-match-") as tmp_dir:
+        users_path = os.path.join(tmp_dir, "users.npy")
+        emails, counts = encode_users(model, user_queries, users_path)
+        encoded = time.time()
+        written = match(cache, cache_path, users_path, emails, counts, store, k=k, workers=workers,
+                        user_block=user_block, job_chunk=job_chunk) if emails else 0
+    matched = time.time()
+    return {"users": written, "listings": len(cache), "k": k, "encode_seconds": round(encoded - start, 1),
+            "match_seconds": round(matched - encoded, 1),
+            "users_per_sec": round(written / max(matched - encoded, 1e-9), 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute top-k job recommendations for every user.")
+    parser.add_argument("--db", default=os.getenv("JOB_LISTINGS_DB", "job_listings.db"))
+    parser.add_argument("--csv", default=os.getenv("JOB_LISTINGS_CSV", "job_listing_data.csv"))
+    parser.add_argument("--cache", default=os.getenv("EMBEDDING_CACHE_FILE", "job_embeddings.bin"))
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2"))
+    parser.add_argument("--backend", default=os.getenv("ENCODER_BACKEND", "fp32"))
+    parser.add_argument("--user-data", default=os.getenv("USER_DATA_DIR", "user_data"))
+    parser.add_argument("--queries", help="JSON-lines file of {\"user\", \"query\"} records instead of --user-data")
+    parser.add_argument("--out", default=os.getenv("RECOMMENDATIONS_DB", DEFAULT_DB))
+    parser.add_argument("--k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--recent", type=int, default=DEFAULT_RECENT)
+    parser.add_argument("--workers", type=int, default=0, help="scoring processes (0: one per core)")
+    parser.add_argument("--user-block", type=int, default=DEFAULT_USER_BLOCK)
+    parser.add_argument("--job-chunk", type=int, default=DEFAULT_JOB_CHUNK)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    import encoder_backend
+    import listing_db
+    import user_data
+
+    if args.queries:
+        queries = user_queries_from_file(args.queries, args.recent)
+    else:
+        queries = user_queries_from_searches(user_data.iter_users(args.user_data), args.recent)
+    report = run(encoder_backend.load_model(args.model, args.backend, int(os.getenv("ENCODER_THREADS", "0"))),
+                 encoder_backend.model_id(args.model, args.backend),
+                 listing_db.load_listings(args.db, args.csv), args.cache, queries, RecommendationStore(args.out),
+                 k=args.k, workers=args.workers, user_block=args.user_block, job_chunk=args.job_chunk,
+                 dtype=os.getenv("EMBEDDING_CACHE_DTYPE", "float32"),
+                 description_chars=int(os.getenv("EMBEDDING_DESCRIPTION_CHARS", "0")))
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,136 @@
+"""Lazily loaded heavy dependencies with per-component readiness reporting.
+
+Startup modes (STARTUP_MODE):
+
+* "warmup" (default): the app imports immediately and a background thread loads
+  every component, so light pages are served while models load.
+* "lazy": each component loads the first time a request needs it (or, for a
+  slow one like the embedding build, starts loading in the background then).
+* "eager": everything loads synchronously at import. Use this with a preloaded
+  gunicorn master so forked workers share the loaded models copy-on-write.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+STARTUP_MODES = ("warmup", "lazy", "eager")
+
+
+class LazyComponent:
+    """A value built by `loader` on first `get()`, exactly once, from any thread."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._value = None
+        self._state = "not_loaded"
+        self._error = None
+        self._load_seconds = None
+        self._failed_at = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def failed(self):
+        return self._state == "failed"
+
+    def get(self):
+        if self._ready.is_set():
+            return self._value
+        with self._lock:
+            if not self._ready.is_set():
+                self._state = "loading"
+                start = time.time()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    self._state = "failed"
+                    self._error = str(e)
+                    self._failed_at = time.time()
+                    logging.error("Loading component %s failed: %s", self.name, e)
+                    raise
+                self._load_seconds = time.time() - start
+                self._state = "ready"
+                self._error = None
+                self._ready.set()
+                logging.info("Component %s ready in %.1fs.", self.name, self._load_seconds)
+        return self._value
+
+    def start_loading(self, retry_after=0.0):
+        """Run `get()` in a background thread unless the component is loaded, loading,
+        or failed less than `retry_after` seconds ago; returns whether it started."""
+        with self._start_lock:
+            if self.ready or self._state == "loading" or (self._thread is not None and self._thread.is_alive()):
+                return False
+            if self.failed and time.time() - self._failed_at < retry_after:
+                return False
+            self._thread = threading.Thread(target=self._load_quietly, name="load-%s" % self.name, daemon=True)
+            self._thread.start()
+            return True
+
+    def _load_quietly(self):
+        try:
+            self.get()
+        except Exception:
+            pass    # already logged and reported by status()
+
+    def provide(self, value):
+        """Mark the component loaded with `value` without running its loader (e.g. in benchmarks)."""
+        with self._lock:
+            self._value = value
+            self._state = "ready"
+            self._error = None
+            self._ready.set()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def status(self):
+        status = {"state": self._state}
+        if self._load_seconds is not None:
+            status["load_seconds"] = round(self._load_seconds, 3)
+        if self._error:
+            status["error"] = self._error
+        return status
+
+
+class ComponentRegistry:
+    def __init__(self):
+        self._components = OrderedDict()
+
+    def register(self, name, loader):
+        component = LazyComponent(name, loader)
+        self._components[name] = component
+        return component
+
+    def warm_up(self):
+        """Load every component in registration order; failures are logged, not raised."""
+        for component in self._components.values():
+            try:
+                component.get()
+            except Exception:
+                pass
+
+    def start_warm_up(self):
+        threading.Thread(target=self.warm_up, name="component-warm-up", daemon=True).start()
+
+    def start(self, mode):
+        if mode not in STARTUP_MODES:
+            raise ValueError("Unknown STARTUP_MODE: %s" % mode)
+        if mode == "eager":
+            self.warm_up()
+        elif mode == "warmup":
+            self.start_warm_up()
+
+    def all_ready(self):
+        return all(component.ready for component in self._components.values())
+
+    def status(self):
+        return {name: component.status() for name, component in self._components.items()}
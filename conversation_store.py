@@ -0,0 +1,236 @@
+"""Bounded per-session chat state: message history and pending job selections.
+
+Each session's state is a small JSON-serializable dict:
+
+    {"history": [{"sender", "message", "timestamp"}, ...],   # last `max_history` entries
+     "pending": {"keys": [job id keys], "detail_type": ...}}   # an open "enter the number" question
+
+Pending selections hold job id keys (embedding_store.id_keys), not job dicts or
+row numbers, so they are a few bytes per candidate and still resolve to the
+right listing after a reload or on another worker.
+
+Backends:
+
+* MemoryBackend: per-process LRU with TTL, capped at `max_sessions`.
+* SQLiteBackend: one table shared by every worker on the host, so a numeric
+  follow-up works whichever gunicorn worker receives it. Expired and
+  least-recently-used sessions are purged periodically.
+
+Both apply each change as one atomic read-modify-write via `update`.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from sqlite_connections import ThreadLocalConnections, off_hub
+
+BACKENDS = ("memory", "sqlite")
+
+
+class MemoryBackend:
+    def __init__(self, max_sessions=10000, ttl=3600.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._data = OrderedDict()   # session id -> (state, updated_at)
+        self._pending = 0            # sessions in _data with an open selection
+        self._lock = threading.Lock()
+
+    def update(self, session_id, change):
+        """Replace the session's state with `change(state)` (state is None if absent); returns it."""
+        with self._lock:
+            entry = self._data.get(session_id)
+            was_pending = _has_pending(entry[0]) if entry else False
+            state = entry[0] if entry and not self._expired(entry[1]) else None
+            state = change(state)
+            self._pending -= was_pending
+            if state is None:
+                self._data.pop(session_id, None)
+                return None
+            self._data[session_id] = (state, time.monotonic())
+            self._data.move_to_end(session_id)
+            self._pending += _has_pending(state)
+            while len(self._data) > self.max_sessions:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self._pending -= _has_pending(evicted)
+            return state
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None:
+                return None
+            if self._expired(entry[1]):
+                del self._data[session_id]
+                self._pending -= _has_pending(entry[0])
+                return None
+            return entry[0]
+
+    def _expired(self, updated_at):
+        return bool(self.ttl) and time.monotonic() - updated_at > self.ttl
+
+    def stats(self):
+        return {"backend": "memory", "sessions": len(self._data), "pending": self._pending,
+                "max_sessions": self.max_sessions, "ttl": self.ttl}
+
+
+class SQLiteBackend:
+    """Every call runs off the gevent hub (sqlite_connections.off_hub), and waits at
+    most `timeout` seconds for another worker's write lock before failing.
+
+    Session and pending-selection counts are kept in a one-row table, updated
+    in the same transaction as each write and recounted by every purge, so
+    stats() is a single-row read. They include expired sessions until the next purge.
+    """
+    PURGE_EVERY = 100   # writes between purges of expired / excess sessions
+
+    def __init__(self, path, max_sessions=10000, ttl=3600.0, timeout=2.0):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._connections = ThreadLocalConnections(path, timeout=timeout)
+        self._writes = 0
+        off_hub(self._create)
+
+    def _connect(self):
+        return self._connections.get()
+
+    def _create(self):
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS conversations ("
+                     "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS conversation_counts ("
+                     "id INTEGER PRIMARY KEY CHECK (id = 0), sessions INTEGER NOT NULL, pending INTEGER NOT NULL)")
+        with self._transaction(conn):
+            if conn.execute("SELECT 1 FROM conversation_counts").fetchone() is None:
+                conn.execute("INSERT INTO conversation_counts SELECT 0, COUNT(*), "
+                             "COUNT(json_extract(state, '$.pending')) FROM conversations")
+
+    @contextmanager
+    def _transaction(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _cutoff(self):
+        return time.time() - self.ttl if self.ttl else float("-inf")
+
+    def update(self, session_id, change):
+        return off_hub(self._update, session_id, change)
+
+    def _update(self, session_id, change):
+        conn = self._connect()
+        with self._transaction(conn):
+            row = conn.execute("SELECT state, updated_at FROM conversations WHERE session_id = ?",
+                               (session_id,)).fetchone()
+            old = json.loads(row[0]) if row else None
+            was_pending = _has_pending(old)
+            state = change(old if row and row[1] >= self._cutoff() else None)
+            if state is None:
+                conn.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+                sessions, pending = -bool(row), -was_pending
+            else:
+                conn.execute("INSERT INTO conversations (session_id, state, updated_at) VALUES (?, ?, ?) "
+                             "ON CONFLICT (session_id) DO UPDATE SET state = excluded.state, "
+                             "updated_at = excluded.updated_at",
+                             (session_id, json.dumps(state, separators=(",", ":")), time.time()))
+                sessions, pending = int(not row), _has_pending(state) - was_pending
+            if sessions or pending:
+                conn.execute("UPDATE conversation_counts SET sessions = sessions + ?, pending = pending + ? "
+                             "WHERE id = 0", (sessions, pending))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._purge()
+        return state
+
+    def get(self, session_id):
+        return off_hub(self._get, session_id)
+
+    def _get(self, session_id):
+        row = self._connect().execute("SELECT state FROM conversations WHERE session_id = ? AND updated_at >= ?",
+                                      (session_id, self._cutoff())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge(self):
+        """Delete expired sessions and all but the `max_sessions` most recently used."""
+        off_hub(self._purge)
+
+    def _purge(self):
+        conn = self._connect()
+        with self._transaction(conn):
+            conn.execute("DELETE FROM conversations WHERE updated_at < ?", (self._cutoff(),))
+            conn.execute("DELETE FROM conversations WHERE session_id IN (SELECT session_id FROM conversations "
+                         "ORDER BY updated_at DESC LIMIT -1 OFFSET ?)", (self.max_sessions,))
+            conn.execute("UPDATE conversation_counts SET (sessions, pending) = (SELECT COUNT(*), "
+                         "COUNT(json_extract(state, '$.pending')) FROM conversations) WHERE id = 0")
+
+    def stats(self):
+        sessions, pending = off_hub(lambda: self._connect().execute(
+            "SELECT sessions, pending FROM conversation_counts WHERE id = 0").fetchone())
+        return {"backend": "sqlite", "sessions": sessions, "pending": pending, "max_sessions": self.max_sessions,
+                "ttl": self.ttl}
+
+
+def _has_pending(state):
+    return bool(state and state.get("pending"))
+
+
+class ConversationStore:
+    def __init__(self, backend, max_history=50):
+        self.backend = backend
+        self.max_history = max_history
+
+    def append(self, session_id, *entries):
+        """Add history entries, keeping only the newest `max_history`; returns the history length."""
+        def change(state):
+            state = state or {}
+            history = (state.get("history") or []) + list(entries)
+            state["history"] = history[-self.max_history:] if self.max_history else history
+            return state
+        return len(self.backend.update(session_id, change)["history"])
+
+    def history(self, session_id):
+        state = self.backend.get(session_id)
+        return state.get("history", []) if state else []
+
+    def set_pending(self, session_id, keys, detail_type):
+        def change(state):
+            state = state or {}
+            state["pending"] = {"keys": [int(key) for key in keys], "detail_type": detail_type}
+            return state
+        self.backend.update(session_id, change)
+
+    def has_pending(self, session_id):
+        state = self.backend.get(session_id)
+        return bool(state and state.get("pending"))
+
+    def pop_pending(self, session_id):
+        """The open selection (and clear it), or None; atomic, so only one request can claim it."""
+        popped = []
+
+        def change(state):
+            if state and state.get("pending"):
+                popped.append(state.pop("pending"))
+            return state
+        self.backend.update(session_id, change)
+        return popped[0] if popped else None
+
+    def stats(self):
+        stats = self.backend.stats()
+        stats["max_history"] = self.max_history
+        return stats
+
+
+def create_store(backend="memory", path="conversations.db", max_sessions=10000, ttl=3600.0, max_history=50,
+                 timeout=2.0):
+    if backend not in BACKENDS:
+        raise ValueError("Unknown conversation backend: %s" % backend)
+    if backend == "sqlite":
+        return ConversationStore(SQLiteBackend(path, max_sessions, ttl, timeout), max_history)
+    return ConversationStore(MemoryBackend(max_sessions, ttl), max_history)
@@ -0,0 +1,310 @@
+"""Versioned, memory-mappable cache of job embeddings.
+
+File layout (all integers little-endian):
+
+    magic (8 bytes) | header length (uint32) | JSON header | pad
+    | row hashes (uint64 x rows) | pad | id keys (uint64 x rows) | pad
+    | vectors (dtype x rows x dim)
+
+The header records the model name, the text recipe and the dtype, and every row
+carries a hash of the exact text that was encoded, so a cache built from a
+different model, recipe, or a stale/reordered CSV is never reused as-is. Rows are
+also keyed by a hash of the Adzuna job id, which lets a refresh reuse the vectors
+of unchanged jobs and only encode the new or edited ones.
+"""
+import hashlib
+import json
+import logging
+import os
+import struct
+import time
+
+import numpy as np
+
+CACHE_MAGIC = b"ASHAEMB\x00"
+CACHE_VERSION = 2
+SUPPORTED_DTYPES = ("float32", "float16")
+
+# Fields concatenated (in this order) into the text that gets embedded for a job.
+TEXT_FIELDS = ["title", "company", "description", "category"]
+
+DEFAULT_BATCH_SIZE = 64     # rows per model forward pass
+DEFAULT_CHUNK_SIZE = 4096   # rows encoded before being flushed to disk
+SCORE_CHUNK_ROWS = 65536    # rows upcast at a time when scoring float16 caches
+
+_ALIGN = 64
+
+
+def text_recipe(description_chars=0):
+    recipe = {"fields": list(TEXT_FIELDS), "separator": " "}
+    if description_chars:
+        recipe["description_chars"] = description_chars
+    return recipe
+
+
+def job_text(job, description_chars=0):
+    # With description_chars set, long descriptions are cut at index time: the
+    # encoder's cost grows with sequence length, and the opening of a posting
+    # carries most of its meaning.
+    text = ""
+    for field in TEXT_FIELDS:
+        if field in job and job[field]:
+            value = job[field]
+            if field == "description" and description_chars:
+                value = value[:description_chars]
+            text += value + " "
+    return text
+
+
+def row_hash(text):
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def row_hashes(texts):
+    return np.fromiter((row_hash(t) for t in texts), dtype="<u8", count=len(texts))
+
+
+def id_keys(jobs):
+    # Jobs without an id fall back to their text, so they are only reused unchanged.
+    return np.fromiter((row_hash("id:" + job["id"]) if job.get("id") else row_hash("text:" + job_text(job))
+                        for job in jobs), dtype="<u8", count=len(jobs))
+
+
+class EmbeddingCache:
+    """A loaded cache file: header dict, per-row hashes, id keys and the vector matrix."""
+
+    def __init__(self, header, hashes, keys, vectors):
+        self.header = header
+        self.hashes = hashes
+        self.keys = keys
+        self.vectors = vectors
+
+    def __len__(self):
+        return self.header["rows"]
+
+    def fingerprint(self):
+        """Identifies this exact set of vectors, for indexes persisted alongside the cache."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps(self.header, sort_keys=True).encode("utf-8"))
+        digest.update(np.ascontiguousarray(self.hashes).tobytes())
+        digest.update(np.ascontiguousarray(self.keys).tobytes())
+        return digest.hexdigest()
+
+    def compatible(self, model_name, recipe):
+        return self.header.get("model") == model_name and self.header.get("recipe") == recipe
+
+    def matches(self, model_name, recipe, hashes, keys):
+        return (self.compatible(model_name, recipe)
+                and len(self.hashes) == len(hashes)
+                and np.array_equal(self.hashes, hashes)
+                and np.array_equal(self.keys, keys))
+
+    def lookup(self, keys, hashes):
+        """Row of this cache holding the same id and text for each entry, or -1."""
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if len(self.keys) == 0 or len(keys) == 0:
+            return rows
+        order = np.argsort(self.keys, kind="stable")
+        sorted_keys = np.asarray(self.keys)[order]
+        pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        found = sorted_keys[pos] == keys
+        candidate = order[pos]
+        reuse = found & (np.asarray(self.hashes)[candidate] == hashes)
+        rows[reuse] = candidate[reuse]
+        return rows
+
+
+def _aligned(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _layout(header):
+    header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+    hashes_offset = _aligned(len(CACHE_MAGIC) + 4 + len(header_bytes))
+    keys_offset = _aligned(hashes_offset + 8 * header["rows"])
+    vectors_offset = _aligned(keys_offset + 8 * header["rows"])
+    return header_bytes, hashes_offset, keys_offset, vectors_offset
+
+
+def _write_preamble(f, header, hashes, keys):
+    header_bytes, hashes_offset, keys_offset, vectors_offset = _layout(header)
+    f.write(CACHE_MAGIC)
+    f.write(struct.pack("<I", len(header_bytes)))
+    f.write(header_bytes)
+    f.write(b"\0" * (hashes_offset - f.tell()))
+    f.write(np.ascontiguousarray(hashes, dtype="<u8").tobytes())
+    f.write(b"\0" * (keys_offset - f.tell()))
+    f.write(np.ascontiguousarray(keys, dtype="<u8").tobytes())
+    f.write(b"\0" * (vectors_offset - f.tell()))
+    return vectors_offset
+
+
+def load_cache(path):
+    """Memory-map a cache file; raises ValueError if it is not a valid cache."""
+    with open(path, "rb") as f:
+        if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            raise ValueError("%s is not an embedding cache file" % path)
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    if header.get("version") != CACHE_VERSION:
+        raise ValueError("Unsupported embedding cache version: %s" % header.get("version"))
+    if header.get("dtype") not in SUPPORTED_DTYPES:
+        raise ValueError("Unsupported embedding cache dtype: %s" % header.get("dtype"))
+    rows, dim = header["rows"], header["dim"]
+    _, hashes_offset, keys_offset, vectors_offset = _layout(header)
+    if rows == 0:
+        empty = np.zeros(0, dtype="<u8")
+        return EmbeddingCache(header, empty, empty, np.zeros((0, dim), dtype=header["dtype"]))
+    hashes = np.memmap(path, dtype="<u8", mode="r", offset=hashes_offset, shape=(rows,))
+    keys = np.memmap(path, dtype="<u8", mode="r", offset=keys_offset, shape=(rows,))
+    vectors = np.memmap(path, dtype=header["dtype"], mode="r", offset=vectors_offset, shape=(rows, dim))
+    return EmbeddingCache(header, hashes, keys, vectors)
+
+
+def _write_file(path, model_name, recipe, dtype, dim, hashes, keys, blocks):
+    """Write a cache file from (n, dim) blocks of `dtype` vectors in row order, atomically.
+
+    The file is written under a temporary name and renamed over `path` once
+    complete, so readers see the old cache or the new one, never a partial file.
+    """
+    header = {
+        "version": CACHE_VERSION,
+        "model": model_name,
+        "recipe": recipe,
+        "dtype": dtype,
+        "dim": dim,
+        "rows": len(hashes),
+        "normalized": True,
+    }
+    tmp_path = "%s.tmp.%d" % (path, os.getpid())
+    try:
+        with open(tmp_path, "wb") as f:
+            vectors_offset = _write_preamble(f, header, hashes, keys)
+            for block in blocks:
+                f.write(np.ascontiguousarray(block, dtype=dtype).tobytes())
+            expected_size = vectors_offset + len(hashes) * dim * np.dtype(dtype).itemsize
+            if f.tell() != expected_size:
+                raise ValueError("Embedding cache size mismatch: wrote %d bytes, expected %d"
+                                 % (f.tell(), expected_size))
+        # Map our own file before publishing it, so a concurrent refresh by another
+        # worker can never hand us vectors built from a different listing set.
+        cache = load_cache(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return cache
+
+
+def build_cache(model, model_name, jobs, path, dtype="float32", previous=None,
+                batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE, description_chars=0):
+    """Write a cache for `jobs` at `path`, copying vectors of unchanged rows from `previous`.
+
+    Only rows whose id is new or whose text hash changed are encoded; rows that
+    no longer exist in `jobs` are dropped. Vectors are streamed to disk in chunks
+    so memory stays bounded by `chunk_size` regardless of corpus size.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError("Unsupported embedding cache dtype: %s" % dtype)
+    start = time.time()
+    recipe = text_recipe(description_chars)
+    texts = [job_text(job, description_chars) for job in jobs]
+    hashes = row_hashes(texts)
+    keys = id_keys(jobs)
+    dim = model.get_sentence_embedding_dimension()
+    if previous is not None and previous.compatible(model_name, recipe) and previous.header["dim"] == dim:
+        reuse_rows = previous.lookup(keys, hashes)
+    else:
+        reuse_rows = np.full(len(jobs), -1, dtype=np.int64)
+    encoded = 0
+
+    def blocks():
+        nonlocal encoded
+        for lo in range(0, len(jobs), chunk_size):
+            hi = min(lo + chunk_size, len(jobs))
+            block = np.empty((hi - lo, dim), dtype=dtype)
+            rows = reuse_rows[lo:hi]
+            reused = rows >= 0
+            if reused.any():
+                block[reused] = previous.vectors[rows[reused]]
+            missing = np.flatnonzero(~reused)
+            if len(missing):
+                block[missing] = model.encode([texts[lo + i] for i in missing], batch_size=batch_size,
+                                              convert_to_numpy=True, normalize_embeddings=True,
+                                              show_progress_bar=False)
+                encoded += len(missing)
+            yield block
+            logging.info("Wrote %d/%d job embeddings (%d encoded so far).", hi, len(jobs), encoded)
+
+    cache = _write_file(path, model_name, recipe, dtype, dim, hashes, keys, blocks())
+    reused_count = len(jobs) - encoded
+    dropped = len(previous) - len(np.unique(reuse_rows[reuse_rows >= 0])) if previous is not None else 0
+    logging.info("Built embedding cache %s (%d rows, %s) in %.1fs: %d reused, %d encoded, %d dropped.",
+                 path, len(jobs), dtype, time.time() - start, reused_count, encoded, dropped)
+    return cache
+
+
+def write_cache(path, model_name, jobs, blocks, dim, dtype="float32"):
+    """Write precomputed vectors for `jobs` as a cache, e.g. embeddings made elsewhere.
+
+    `blocks` yields (n, dim) arrays in row order; they are L2-normalized here.
+    """
+    def normalized():
+        for block in blocks:
+            block = np.asarray(block, dtype=np.float32)
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            yield block / norms
+
+    return _write_file(path, model_name, text_recipe(), dtype, dim, row_hashes([job_text(job) for job in jobs]),
+                       id_keys(jobs), normalized())
+
+
+def load_or_build(model, model_name, jobs, path, dtype="float32", batch_size=DEFAULT_BATCH_SIZE,
+                  description_chars=0):
+    """Return the cache for `jobs`, re-encoding only rows that are new or changed since `path`."""
+    previous = None
+    if os.path.exists(path):
+        try:
+            previous = load_cache(path)
+            if previous.matches(model_name, text_recipe(description_chars),
+                                row_hashes([job_text(job, description_chars) for job in jobs]),
+                                id_keys(jobs)) and previous.header["dtype"] == dtype:
+                logging.info("Loaded cached job embeddings from %s.", path)
+                return previous
+            logging.info("Embedding cache %s is out of date. Updating embeddings.", path)
+        except Exception as e:
+            logging.error("Error loading cached embeddings: %s", e)
+            previous = None
+    return build_cache(model, model_name, jobs, path, dtype=dtype, previous=previous,
+                       batch_size=batch_size, description_chars=description_chars)
+
+
+def similarity_scores(vectors, query_embedding):
+    """Dot products of a normalized query against every cached row, as float32."""
+    query_embedding = np.asarray(query_embedding, dtype=np.float32)
+    if vectors.dtype == np.float32:
+        return vectors @ query_embedding
+    scores = np.empty(len(vectors), dtype=np.float32)
+    for lo in range(0, len(vectors), SCORE_CHUNK_ROWS):
+        block = np.asarray(vectors[lo:lo + SCORE_CHUNK_ROWS], dtype=np.float32)
+        scores[lo:lo + SCORE_CHUNK_ROWS] = block @ query_embedding
+    return scores
+
+
+if __name__ == "__main__":
+    # Refresh the cache after a new Adzuna extract, e.g. `python Data_Extraction.py && python embedding_store.py`.
+    import encoder_backend
+    import listing_db
+
+    model_name = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+    backend = os.getenv("ENCODER_BACKEND", "fp32")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    listings = listing_db.load_listings(os.getenv("JOB_LISTINGS_DB", listing_db.DEFAULT_DB),
+                                        os.getenv("JOB_LISTINGS_CSV", "job_listing_data.csv"))
+    load_or_build(encoder_backend.load_model(model_name, backend, int(os.getenv("ENCODER_THREADS", "0"))),
+                  encoder_backend.model_id(model_name, backend), listings,
+                  os.getenv("EMBEDDING_CACHE_FILE", "job_embeddings.bin"),
+                  dtype=os.getenv("EMBEDDING_CACHE_DTYPE", "float32"),
+                  description_chars=int(os.getenv("EMBEDDING_DESCRIPTION_CHARS", "0")))
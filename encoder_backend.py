@@ -0,0 +1,142 @@
+"""CPU inference settings for the SentenceTransformer encoder.
+
+Backends (ENCODER_BACKEND):
+
+* "fp32" (default): the model as published.
+* "int8": PyTorch dynamic quantization of every Linear layer to int8 weights.
+  MiniLM spends most of its time in those layers, so encoding is typically
+  1.5-2x faster on CPU and the model takes about a quarter of the memory. The
+  vectors differ slightly from fp32, so the embedding cache is keyed by
+  `model_id()` and a backend switch re-encodes the listings.
+
+PyTorch uses every core by default. Several gunicorn workers on one box then
+oversubscribe the CPU. `set_threads` gives each worker an explicit intra-op
+budget (by default the cores divided by the number of workers).
+
+Run `python encoder_backend.py` to compare a backend (and a description
+truncation) against fp32 on the current listings. It reports top-k overlap and
+encode latency and exits 1 if overlap falls below --min-overlap.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+BACKENDS = ("fp32", "int8")
+
+
+def model_id(model_name, backend="fp32"):
+    """Name recorded in the embedding cache header; fp32 keeps the plain model name."""
+    if backend not in BACKENDS:
+        raise ValueError("Unknown encoder backend: %s" % backend)
+    return model_name if backend == "fp32" else "%s@%s" % (model_name, backend)
+
+
+def default_threads(workers=None):
+    workers = workers or int(os.getenv("WEB_CONCURRENCY", "1"))
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def set_threads(threads=0, workers=None):
+    """Limit PyTorch's intra-op pool to `threads` (0: cores / workers); returns the number set."""
+    import torch
+
+    threads = threads or default_threads(workers)
+    torch.set_num_threads(threads)
+    try:
+        # Only settable before the first parallel op in this process.
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    return threads
+
+
+def load_model(model_name, backend="fp32", threads=0):
+    """A CPU SentenceTransformer for `backend`, with its thread budget applied."""
+    if backend not in BACKENDS:
+        raise ValueError("Unknown encoder backend: %s" % backend)
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    threads = set_threads(threads)
+    start = time.time()
+    model = SentenceTransformer(model_name, device="cpu")
+    if backend == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    model.eval()
+    logging.info("Loaded encoder %s (%s, %d threads) in %.1fs.", model_name, backend, threads,
+                 time.time() - start)
+    return model
+
+
+def encode(model, texts, batch_size=64):
+    return np.asarray(model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True,
+                                   show_progress_bar=False), dtype=np.float32)
+
+
+def accuracy_check(baseline, candidate, store, queries, k=10, description_chars=0, batch_size=64):
+    """Top-k overlap and encode latency of `candidate` against the fp32 `baseline` model.
+
+    Both models encode the listings and the queries. The baseline always sees
+    the full text; the candidate sees descriptions cut to `description_chars`.
+    Overlap@k is the share of each query's exact top-k listings (by the
+    baseline) that the candidate also returns.
+    """
+    import embedding_store
+
+    full_texts = [embedding_store.job_text(job) for job in store]
+    texts = [embedding_store.job_text(job, description_chars) for job in store]
+    report = {"listings": len(store), "queries": len(queries), "k": k, "description_chars": description_chars}
+    results = {}
+    for name, model, job_texts in (("baseline", baseline, full_texts), ("candidate", candidate, texts)):
+        start = time.perf_counter()
+        vectors = encode(model, job_texts, batch_size)
+        index_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        query_vectors = np.stack([encode(model, [query])[0] for query in queries])
+        query_seconds = time.perf_counter() - start
+        scores = query_vectors @ vectors.T
+        top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        results[name] = top
+        report[name] = {"index_rows_per_sec": round(len(store) / index_seconds, 1),
+                        "ms_per_query": round(query_seconds * 1000 / max(len(queries), 1), 3)}
+    overlaps = [len(set(b.tolist()) & set(c.tolist())) / len(b)
+                for b, c in zip(results["baseline"], results["candidate"]) if len(b)]
+    report["overlap_at_k"] = round(float(np.mean(overlaps)), 4) if overlaps else 0.0
+    report["min_overlap_at_k"] = round(float(np.min(overlaps)), 4) if overlaps else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare an encoder backend against fp32 on the current listings.")
+    parser.add_argument("--db", default=os.getenv("JOB_LISTINGS_DB", "job_listings.db"))
+    parser.add_argument("--csv", default=os.getenv("JOB_LISTINGS_CSV", "job_listing_data.csv"))
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2"))
+    parser.add_argument("--backend", choices=BACKENDS, default=os.getenv("ENCODER_BACKEND", "int8"))
+    parser.add_argument("--description-chars", type=int, default=int(os.getenv("EMBEDDING_DESCRIPTION_CHARS", "0")))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("ENCODER_THREADS", "0")))
+    parser.add_argument("--rows", type=int, default=5000, help="listings sampled from the corpus (0: all)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-overlap", type=float, default=0.9)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    import hybrid_search
+    import listing_db
+    from job_store import JobStore
+
+    store = listing_db.load_listings(args.db, args.csv)
+    if args.rows and len(store) > args.rows:
+        rows = np.sort(np.random.default_rng(0).choice(len(store), size=args.rows, replace=False))
+        store = JobStore.from_rows([store[int(row)] for row in rows])
+    baseline = load_model(args.model, "fp32", args.threads)
+    candidate = load_model(args.model, args.backend, args.threads)
+    report = accuracy_check(baseline, candidate, store, hybrid_search.default_queries(store), k=args.k,
+                            description_chars=args.description_chars)
+    report.update({"backend": args.backend, "threads": set_threads(args.threads),
+                   "passed": report["overlap_at_k"] >= args.min_overlap})
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["passed"] else 1)
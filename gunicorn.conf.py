@@ -0,0 +1,33 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app`.
+#
+# GUNICORN_PRELOAD=1 imports the app once in the master with STARTUP_MODE=eager,
+# so Stanza, the SentenceTransformer and the memory-mapped embeddings are loaded
+# before forking and shared copy-on-write by every worker instead of being
+# loaded once per worker.
+import gc
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+if preload_app:
+    os.environ.setdefault("STARTUP_MODE", "eager")
+
+# Each worker is its own process, so chat state lives in a shared SQLite file:
+# the "enter the number" follow-up may land on a different worker.
+os.environ.setdefault("CONVERSATION_BACKEND", "sqlite")
+
+
+def pre_fork(server, worker):
+    # Move everything the master loaded into the permanent GC generation, so
+    # collections in the workers don't touch (and thereby copy) shared pages.
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Give each worker its share of the cores. The worker count is exported
+    # for encoder_backend.default_threads, which a worker loading the app itself
+    # consults when it loads the model; a model loaded in a preloaded master kept
+    # the master's budget and is limited here.
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+    import encoder_backend
+    encoder_backend.set_threads(int(os.getenv("ENCODER_THREADS", "0")), workers=server.cfg.workers)
@@ -0,0 +1,140 @@
+"""Hybrid retrieval: BM25 candidate generation, semantic re-ranking, score fusion.
+
+The inverted index proposes the `candidates` best keyword matches. Those rows
+alone are scored against the query embedding. The final score is
+`alpha * cosine + (1 - alpha) * bm25 / max(bm25)`. Exact keyword hits (a company
+name, "golang") are ranked by meaning as well as by term overlap, and the
+similarity threshold still applies to the cosine part. If the query shares
+terms with fewer than k listings, the vector index adds its own nearest rows to
+the pool, so paraphrased queries do not lose recall.
+
+Run `python hybrid_search.py` to compare latency and result quality against
+pure semantic search on the current listings and embedding cache.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from lexical_search import tokenize
+from vector_index import top_k
+
+DEFAULT_CANDIDATES = 200
+DEFAULT_ALPHA = 0.7
+
+
+def hybrid_search(snapshot, query, query_embedding, k, similarity_threshold=-1.0, rows=None,
+                  candidates=DEFAULT_CANDIDATES, alpha=DEFAULT_ALPHA):
+    """Top-k (rows, fused scores) for `query` over `snapshot`, optionally restricted to `rows`."""
+    lexical_rows, lexical_scores = snapshot.lexical_index().search(query, max(candidates, k), rows=rows)
+    pool = lexical_rows
+    if len(lexical_rows) < k:
+        semantic_rows, _ = snapshot.index.search(query_embedding, max(candidates, k), similarity_threshold,
+                                                 rows=rows)
+        pool = np.union1d(lexical_rows, semantic_rows)
+    pool = np.sort(pool)  # sequential reads from the memory-mapped cache
+    if len(pool) == 0:
+        return top_k(np.zeros(0, dtype=np.float32), k)
+    bm25 = np.zeros(len(pool), dtype=np.float32)
+    bm25[np.searchsorted(pool, lexical_rows)] = lexical_scores
+    if len(lexical_scores):
+        bm25 /= lexical_scores.max()
+    cosine = np.asarray(snapshot.embeddings[pool], dtype=np.float32) @ np.asarray(query_embedding,
+                                                                                 dtype=np.float32)
+    keep = cosine >= similarity_threshold
+    pool, fused = pool[keep], alpha * cosine[keep] + (1.0 - alpha) * bm25[keep]
+    positions, scores = top_k(fused, k)
+    return pool[positions], scores
+
+
+def default_queries(store, per_field=10, seed=0):
+    """Free-text queries plus exact-term queries built from sampled titles and companies."""
+    queries = ["software developer", "data analyst with python", "remote marketing manager",
+               "teaching jobs for women", "accounts and finance", "hr recruiter", "nurse",
+               "sales executive in mumbai", "machine learning engineer", "customer support"]
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(store), size=min(per_field, len(store)), replace=False)
+    queries += [store.get(int(row), "title", "") for row in rows]
+    queries += ["jobs at %s" % store.get(int(row), "company", "") for row in rows]
+    return [query for query in queries if query.strip()]
+
+
+def _term_match(store, row, query):
+    terms = set(tokenize(query))
+    text = set(tokenize(" ".join(store.get(row, field, "") for field in ("title", "company", "location"))))
+    return bool(terms) and terms <= text
+
+
+def compare(snapshot, encode, queries, k=3, similarity_threshold=0.3, candidates=DEFAULT_CANDIDATES,
+            alpha=DEFAULT_ALPHA):
+    """Per-query latency and result quality of hybrid search against pure semantic search.
+
+    Quality is reported as overlap@k with the semantic results and as the share
+    of results whose title, company and location contain every query term.
+    """
+    snapshot.lexical_index()
+    report = {"listings": len(snapshot), "k": k, "candidates": candidates, "alpha": alpha,
+              "queries": len(queries)}
+    embeddings = [encode(query) for query in queries]
+    results = {}
+    for name in ("semantic", "hybrid"):
+        start = time.perf_counter()
+        if name == "semantic":
+            found = [snapshot.index.search(q, k, similarity_threshold)[0] for q in embeddings]
+        else:
+            found = [hybrid_search(snapshot, query, q, k, similarity_threshold, candidates=candidates,
+                                   alpha=alpha)[0] for query, q in zip(queries, embeddings)]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+        results[name] = found
+        hits = [_term_match(snapshot.store, int(row), query) for query, rows in zip(queries, found) for row in rows]
+        report[name] = {"ms_per_query": round(elapsed_ms, 3),
+                        "term_match_rate": round(float(np.mean(hits)), 4) if hits else 0.0}
+    overlaps = [len(set(h.tolist()) & set(s.tolist())) / len(s)
+                for h, s in zip(results["hybrid"], results["semantic"]) if len(s)]
+    report["overlap_at_k"] = round(float(np.mean(overlaps)), 4) if overlaps else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare hybrid and pure semantic job search.")
+    parser.add_argument("--db", default=os.getenv("JOB_LISTINGS_DB", "job_listings.db"))
+    parser.add_argument("--csv", default=os.getenv("JOB_LISTINGS_CSV", "job_listing_data.csv"))
+    parser.add_argument("--cache", default=os.getenv("EMBEDDING_CACHE_FILE", "job_embeddings.bin"))
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2"))
+    parser.add_argument("--backend", default=os.getenv("ENCODER_BACKEND", "fp32"))
+    parser.add_argument("--queries", help="file with one query per line (default: built-in and sampled)")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.3)
+    parser.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES)
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    import embedding_store
+    import encoder_backend
+    import listing_db
+    from job_snapshot import JobSnapshot
+    from vector_index import ExactIndex
+
+    store = listing_db.load_listings(args.db, args.csv)
+    # Same cache key as app.py, so the app's embedding cache is reused, not overwritten.
+    model = encoder_backend.load_model(args.model, args.backend, int(os.getenv("ENCODER_THREADS", "0")))
+    cache = embedding_store.load_or_build(model, encoder_backend.model_id(args.model, args.backend), store, args.cache,
+                                          dtype=os.getenv("EMBEDDING_CACHE_DTYPE", "float32"),
+                                          description_chars=int(os.getenv("EMBEDDING_DESCRIPTION_CHARS", "0")))
+    snapshot = JobSnapshot(0, store, cache.vectors, ExactIndex(cache.vectors))
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = default_queries(store)
+
+    def encode(query):
+        return model.encode(query, convert_to_numpy=True, normalize_embeddings=True,
+                            show_progress_bar=False).astype(np.float32)
+
+    print(json.dumps(compare(snapshot, encode, queries, k=args.k, similarity_threshold=args.threshold,
+                             candidates=args.candidates, alpha=args.alpha), indent=2))
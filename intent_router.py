@@ -0,0 +1,57 @@
+"""Cheap keyword routing of chat messages, done before any NLP runs.
+
+Only intents that search the job listings use Stanza output (its named
+entities feed job_filters.extract_filters); every other intent is answered
+without it.
+"""
+from collections import namedtuple
+
+Intent = namedtuple("Intent", ["name", "detail_type"])
+
+# Checked in order; the first keyword found in the message wins.
+DETAIL_KEYWORDS = [
+    ("link", "link"),
+    ("salary", "salary"),
+    ("skill", "skills"),
+    ("experience", "experience"),
+    ("contract time", "contract time"),
+]
+BIASED_TERMS = ["only man", "not for women", "typical male", "stereotype"]
+# Asks for the user's precomputed recommendations (bulk_match.py) rather than a search.
+# Only an explicit ask: "python jobs for me" is still a search.
+RECOMMENDATION_KEYWORDS = ["recommend"]
+
+# Intents whose handling uses the entities extracted by the NLP pipeline.
+NLP_INTENTS = {"detail", "job_search"}
+
+
+def detect_bias(message):
+    message_lower = message.lower()
+    return any(term in message_lower for term in BIASED_TERMS)
+
+
+def route_intent(message, has_pending_selection=False):
+    stripped = message.strip()
+    if stripped.isdigit() and has_pending_selection:
+        return Intent("selection", None)
+    if detect_bias(message):
+        return Intent("bias", None)
+    message_lower = message.lower()
+    for keyword, detail_type in DETAIL_KEYWORDS:
+        if keyword in message_lower:
+            return Intent("detail", detail_type)
+    if any(keyword in message_lower for keyword in RECOMMENDATION_KEYWORDS):
+        return Intent("recommendations", None)
+    if "job" in message_lower or "career" in message_lower:
+        return Intent("job_search", None)
+    if "session" in message_lower or "event" in message_lower:
+        return Intent("sessions", None)
+    if "help" in message_lower:
+        return Intent("help", None)
+    if "faq" in message_lower:
+        return Intent("faq", None)
+    return Intent("unknown", None)
+
+
+def needs_nlp(intent):
+    return intent.name in NLP_INTENTS
@@ -0,0 +1,328 @@
+"""Structured search filters, extracted from chat messages and applied before scoring.
+
+Filters are plain dicts:
+
+* "location", "company", "category", "contract_type", "contract_time": lists of
+  lowercased values; a listing matches a field if it matches any of its values;
+* "salary_min" / "salary_max": the wanted pay range, in rupees;
+* "remote": True to keep only remote / work-from-home listings.
+
+A listing must match every field present. `extract_filters` reads them from the
+message text: contract terms, salary ranges like "over 10 lakh", "<category>
+jobs", "remote" and known place names after a place preposition ("in pune",
+"near navi mumbai or thane"). It also uses the Stanza entities: places become
+location filters and organisations become company filters. Locations are
+compared in canonical form, so "Bengaluru" and "Bangalore" match each other.
+
+`FilterIndex` precomputes, once per snapshot, what it needs to answer a filter
+without touching every row: packed bitmaps per value of low-cardinality
+columns, row lists per value for the others, and salary bounds sorted for
+range lookups.
+"""
+import logging
+import re
+
+import numpy as np
+
+from job_store import CategoricalColumn, StringColumn
+
+CATEGORICAL_FILTER_FIELDS = ("location", "company", "category", "contract_type", "contract_time")
+BITMAP_MAX_VALUES = 64      # columns with at most this many distinct values get a bitmap per value
+REMOTE_FIELDS = ("title", "location", "description")
+
+# Entity types that narrow a search, and the listing field they filter on.
+ENTITY_FILTER_FIELDS = {"GPE": "location", "LOC": "location", "FAC": "location", "ORG": "company"}
+# Every listing is in India, so a country-level mention should not filter anything.
+IGNORED_FILTER_VALUES = {"india"}
+LOCATION_ALIASES = {
+    "bengaluru": "bangalore",
+    "bombay": "mumbai",
+    "madras": "chennai",
+    "gurugram": "gurgaon",
+    "calcutta": "kolkata",
+}
+# A bare place name only filters after one of these ("jobs in salem", not "salary of anand").
+PLACE_PREPOSITIONS = {"in", "at", "near", "around", "from", "within", "across"}
+PLACE_CONJUNCTIONS = {"or", "and"}
+# Categories that mean the same as a contract filter: asking for either matches both.
+CATEGORY_CONTRACT_FILTERS = {"part time jobs": ("contract_time", "part_time")}
+
+CONTRACT_TIME_PATTERNS = [
+    (re.compile(r"\bfull[\s_-]?time\b"), "full_time"),
+    (re.compile(r"\bpart[\s_-]?time\b"), "part_time"),
+]
+CONTRACT_TYPE_PATTERNS = [
+    (re.compile(r"\bpermanent\b"), "permanent"),
+    # "contract time" / "contract type" ask for a detail, they are not a filter.
+    (re.compile(r"\bcontract(?:ual)?\b(?!\s+(?:time|type))"), "contract"),
+]
+REMOTE_PATTERN = re.compile(r"\b(?:remote|work from home|wfh)\b")
+REMOTE_BYTES_PATTERN = re.compile(rb"(?i)remote|work from home|wfh")
+
+SALARY_UNITS = {"k": 1e3, "thousand": 1e3, "l": 1e5, "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5,
+                "lpa": 1e5, "cr": 1e7, "crore": 1e7, "crores": 1e7}
+_AMOUNT = r"(?:rs\.?\s*|inr\s*|₹\s*)?(\d+(?:\.\d+)?)\s*(k|thousand|lakhs?|lacs?|lpa|l|crores?|cr)?\b"
+SALARY_BETWEEN = re.compile(r"\bbetween\s+" + _AMOUNT + r"\s*(?:and|to|-)\s*" + _AMOUNT)
+SALARY_AT_LEAST = re.compile(r"\b(?:over|above|more than|at least|minimum|min)\s+" + _AMOUNT)
+SALARY_AT_MOST = re.compile(r"\b(?:under|below|less than|up to|upto|at most|maximum|max)\s+" + _AMOUNT)
+SALARY_CONTEXT = re.compile(r"\b(?:salary|pay|package|ctc|stipend|lpa)\b")
+CATEGORY_SUFFIX = re.compile(r"\s+jobs?$")
+
+
+def _salary_amount(number, unit, message):
+    """Rupees for a matched amount, or None if it does not look like a salary (e.g. "over 5 years")."""
+    value = float(number)
+    if unit:
+        return value * SALARY_UNITS[unit]
+    if value >= 1000 or SALARY_CONTEXT.search(message):
+        return value
+    return None
+
+
+def extract_salary_range(message):
+    """(salary_min, salary_max) mentioned in a lowercased message; either may be None."""
+    match = SALARY_BETWEEN.search(message)
+    if match:
+        low_number, low_unit, high_number, high_unit = match.groups()
+        # "between 5 and 10 lakh": the unit is only written once.
+        low = _salary_amount(low_number, low_unit or high_unit, message)
+        high = _salary_amount(high_number, high_unit, message)
+        if low is not None and high is not None:
+            return min(low, high), max(low, high)
+    low = high = None
+    match = SALARY_AT_LEAST.search(message)
+    if match:
+        low = _salary_amount(match.group(1), match.group(2), message)
+    match = SALARY_AT_MOST.search(message)
+    if match:
+        high = _salary_amount(match.group(1), match.group(2), message)
+    return low, high
+
+
+def canonical_location(text):
+    """`text` lowercased, with every aliased place name replaced by its canonical spelling."""
+    return re.sub(r"[a-z]+", lambda match: LOCATION_ALIASES.get(match.group(0), match.group(0)), text.lower())
+
+
+def _add(filters, field, value):
+    if value not in filters.setdefault(field, []):
+        filters[field].append(value)
+
+
+def extract_filters(message, entities=(), filter_index=None):
+    """Filters requested by `message`; `entities` are (text, type) pairs from the NLP pipeline."""
+    text = " ".join(message.lower().split())
+    filters = {}
+    for pattern, value in CONTRACT_TIME_PATTERNS:
+        if pattern.search(text):
+            _add(filters, "contract_time", value)
+    for pattern, value in CONTRACT_TYPE_PATTERNS:
+        if pattern.search(text):
+            _add(filters, "contract_type", value)
+    if REMOTE_PATTERN.search(text):
+        filters["remote"] = True
+    salary_min, salary_max = extract_salary_range(text)
+    if salary_min is not None:
+        filters["salary_min"] = salary_min
+    if salary_max is not None:
+        filters["salary_max"] = salary_max
+    for entity_text, entity_type in entities:
+        field = ENTITY_FILTER_FIELDS.get(entity_type)
+        value = entity_text.strip().lower()
+        if not field or not value or value in IGNORED_FILTER_VALUES:
+            continue
+        if field == "location":
+            value = canonical_location(value)
+        _add(filters, field, value)
+    if filter_index is not None:
+        # Catch lowercase place names the NER model misses, and "<category> jobs".
+        for place in filter_index.places_in(text):
+            _add(filters, "location", canonical_location(place))
+        for category in filter_index.categories_in(text):
+            if category in CATEGORY_CONTRACT_FILTERS:
+                _add(filters, *CATEGORY_CONTRACT_FILTERS[category])
+            else:
+                _add(filters, "category", category)
+    return filters
+
+
+def filter_key(filters):
+    """A hashable form of `filters`, for cache keys."""
+    return tuple(sorted((field, tuple(value) if isinstance(value, list) else value)
+                        for field, value in (filters or {}).items()))
+
+
+def _rows_with_word(column, pattern):
+    """Rows of a StringColumn where `pattern` matches as a whole word.
+
+    The packed buffer is searched once and match offsets are mapped back to
+    rows. Rows are not separated in the buffer, so word boundaries are checked
+    against each row's own start and end.
+    """
+    buffer, offsets = column.buffer, column.offsets
+    rows = []
+    for match in pattern.finditer(buffer):
+        start, end = match.span()
+        row = int(np.searchsorted(offsets, start, side="right")) - 1
+        if end > offsets[row + 1]:
+            continue
+        if start > offsets[row] and buffer[start - 1:start].isalnum():
+            continue
+        if end < offsets[row + 1] and buffer[end:end + 1].isalnum():
+            continue
+        rows.append(row)
+    return np.unique(np.array(rows, dtype=np.int64))
+
+
+def _bitmap(rows, num_rows):
+    mask = np.zeros(num_rows, dtype=bool)
+    mask[rows] = True
+    return np.packbits(mask)
+
+
+class FilterIndex:
+    def __init__(self, store):
+        self.num_rows = len(store)
+        self._columns = {}
+        self._value_texts = {}  # field -> lowercased values, locations in canonical form
+        self._postings = {}    # field -> (rows grouped by code, offsets per code)
+        self._bitmaps = {}     # field -> one packed bitmap per code
+        for field in CATEGORICAL_FILTER_FIELDS:
+            column = store.columns.get(field)
+            if not isinstance(column, CategoricalColumn):
+                continue
+            self._columns[field] = column
+            self._value_texts[field] = [canonical_location(value) if field == "location" else value.lower()
+                                        for value in column.values]
+            order = np.argsort(column.codes, kind="stable").astype(np.int64)
+            offsets = np.zeros(len(column.values) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(column.codes, minlength=len(column.values)), out=offsets[1:])
+            self._postings[field] = (order, offsets)
+            if len(column.values) <= BITMAP_MAX_VALUES:
+                self._bitmaps[field] = [_bitmap(order[offsets[c]:offsets[c + 1]], self.num_rows)
+                                        for c in range(len(column.values))]
+        self._salary_low, self._salary_high = self._salary_bounds(store)
+        self._remote = _bitmap(self._remote_rows(store), self.num_rows)
+        self._places = self._place_names()
+        self._categories = self._category_names()
+
+    def _salary_bounds(self, store):
+        """(sorted values, rows) of each listing's lowest and highest advertised salary."""
+        columns = [store.columns.get(field) for field in ("salary_min", "salary_max")]
+        data = [column.data for column in columns if column is not None]
+        if not data:
+            empty = (np.zeros(0), np.zeros(0, dtype=np.int64))
+            return empty, empty
+        with np.errstate(invalid="ignore"):
+            low, high = np.fmin.reduce(data), np.fmax.reduce(data)
+        bounds = []
+        for values in (low, high):
+            rows = np.flatnonzero(~np.isnan(values))
+            order = np.argsort(values[rows], kind="stable")
+            bounds.append((values[rows][order], rows[order]))
+        return bounds
+
+    def _remote_rows(self, store):
+        rows = []
+        for field in REMOTE_FIELDS:
+            column = store.columns.get(field)
+            if isinstance(column, StringColumn):
+                rows.append(_rows_with_word(column, REMOTE_BYTES_PATTERN))
+            elif isinstance(column, CategoricalColumn):
+                codes = [c for c, value in enumerate(column.values) if REMOTE_PATTERN.search(value.lower())]
+                rows.append(column.rows_with_codes(codes))
+        return np.unique(np.concatenate(rows)) if rows else np.zeros(0, dtype=np.int64)
+
+    def _place_names(self):
+        places = set(LOCATION_ALIASES)
+        for value in self._value_texts.get("location", ()):
+            places.update(part.strip() for part in value.split(",")[:2])
+        return {place for place in places if len(place) >= 4 and place not in IGNORED_FILTER_VALUES}
+
+    def _category_names(self):
+        column = self._columns.get("category")
+        names = {}
+        for value in column.values if column is not None else ():
+            name = CATEGORY_SUFFIX.sub("", value.strip().lower())
+            if name:
+                names[name] = value.lower()
+        return names
+
+    def places_in(self, text):
+        """Known place names that follow a place preposition, or continue a list after one."""
+        words = re.findall(r"[a-z]+", text)
+        found = []
+        i, after_preposition = 0, False
+        while i < len(words):
+            size = 0
+            if after_preposition:
+                size = next((size for size in (3, 2, 1)
+                             if i + size <= len(words) and " ".join(words[i:i + size]) in self._places), 0)
+            if size:
+                found.append(" ".join(words[i:i + size]))
+                i += size
+                # "in pune or chennai": the places of a list share the preposition.
+                after_preposition = i < len(words) and words[i] in PLACE_CONJUNCTIONS
+                i += after_preposition
+                continue
+            after_preposition = words[i] in PLACE_PREPOSITIONS
+            i += 1
+        return found
+
+    def categories_in(self, text):
+        return [value for name, value in self._categories.items()
+                if re.search(r"\b%s\s+(?:jobs?|roles?|positions?|openings?)\b" % re.escape(name), text)]
+
+    def _field_bitmap(self, field, values):
+        if field not in self._columns:
+            bitmap = np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+        else:
+            codes = [c for c, value in enumerate(self._value_texts[field])
+                     if any(wanted in value for wanted in values)]
+            if field in self._bitmaps:
+                bitmap = np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+                for code in codes:
+                    bitmap |= self._bitmaps[field][code]
+            else:
+                order, offsets = self._postings[field]
+                rows = [order[offsets[c]:offsets[c + 1]] for c in codes]
+                bitmap = _bitmap(np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64), self.num_rows)
+        # A contract filter also matches its equivalent category ("Part time Jobs").
+        categories = [category for category, (contract_field, value) in CATEGORY_CONTRACT_FILTERS.items()
+                      if contract_field == field and value in values]
+        if categories:
+            bitmap = bitmap | self._field_bitmap("category", categories)
+        return bitmap
+
+    def _salary_bitmap(self, salary_min, salary_max):
+        rows = None
+        if salary_min is not None:
+            # The listing's range must reach the wanted minimum...
+            values, value_rows = self._salary_high
+            rows = value_rows[np.searchsorted(values, salary_min, side="left"):]
+        if salary_max is not None:
+            # ...and start no higher than the wanted maximum.
+            values, value_rows = self._salary_low
+            below = value_rows[:np.searchsorted(values, salary_max, side="right")]
+            rows = below if rows is None else np.intersect1d(rows, below)
+        return _bitmap(rows, self.num_rows)
+
+    def rows(self, filters):
+        """Sorted rows matching every filter, or None if `filters` is empty."""
+        bitmap = None
+        for field, values in (filters or {}).items():
+            if field in CATEGORICAL_FILTER_FIELDS:
+                field_bitmap = self._field_bitmap(field, values)
+            elif field == "remote":
+                field_bitmap = self._remote
+            else:
+                continue
+            bitmap = field_bitmap if bitmap is None else bitmap & field_bitmap
+        if filters and ("salary_min" in filters or "salary_max" in filters):
+            salary = self._salary_bitmap(filters.get("salary_min"), filters.get("salary_max"))
+            bitmap = salary if bitmap is None else bitmap & salary
+        if bitmap is None:
+            return None
+        rows = np.flatnonzero(np.unpackbits(bitmap, count=self.num_rows)).astype(np.int64)
+        logging.debug("Filters %s leave %d of %d listings.", filters, len(rows), self.num_rows)
+        return rows
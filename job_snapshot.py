@@ -0,0 +1,199 @@
+"""Immutable job-listing snapshots and a background reloader that swaps them in.
+
+A request reads `reloader.current` once and uses that snapshot for everything it
+does, so a reload that lands mid-request never mixes listings from one CSV with
+embeddings from another. Old snapshots stay alive for as long as something (an
+in-flight request) still references them. Ambiguous selections are kept as
+listing id keys and resolved against whichever snapshot is current.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+import embedding_store
+from job_filters import FilterIndex
+from lexical_search import BM25Index
+
+
+class JobSnapshot:
+    """A JobStore plus the embedding matrix (and its vector index) whose row i belongs to store row i."""
+
+    def __init__(self, version, store, embeddings=None, index=None, lexical_index=None, id_keys=None):
+        self.version = version
+        self.store = store
+        self.embeddings = embeddings
+        self.index = index
+        self.created_at = time.time()
+        self._lexical_index = lexical_index
+        self._lexical_lock = threading.Lock()
+        self._filter_index = None
+        self._id_keys = id_keys
+        self._key_order = None
+
+    def __len__(self):
+        return len(self.store)
+
+    def lexical_index(self):
+        """BM25 index over these listings, built on first use unless one was passed in."""
+        if self._lexical_index is None:
+            with self._lexical_lock:
+                if self._lexical_index is None:
+                    self._lexical_index = BM25Index.build(self.store)
+        return self._lexical_index
+
+    def built_lexical_index(self):
+        """The BM25 index if it has been built already, else None."""
+        return self._lexical_index
+
+    def filter_index(self):
+        """Per-column filter indexes over these listings, built on first use."""
+        if self._filter_index is None:
+            with self._lexical_lock:
+                if self._filter_index is None:
+                    self._filter_index = FilterIndex(self.store)
+        return self._filter_index
+
+    def id_keys(self):
+        """Stable per-listing keys (embedding_store.id_keys), row-aligned with the store."""
+        if self._id_keys is None:
+            with self._lexical_lock:
+                if self._id_keys is None:
+                    self._id_keys = embedding_store.id_keys(self.store)
+        return self._id_keys
+
+    def rows_for_keys(self, keys):
+        """Current row of each id key, or None for listings no longer in this snapshot."""
+        if self._key_order is None:
+            ids = self.id_keys()
+            order = np.argsort(ids, kind="stable")
+            self._key_order = (order, ids[order])
+        order, sorted_keys = self._key_order
+        rows = []
+        for key in keys:
+            position = int(np.searchsorted(sorted_keys, np.uint64(key)))
+            found = position < len(sorted_keys) and sorted_keys[position] == np.uint64(key)
+            rows.append(int(order[position]) if found else None)
+        return rows
+
+
+class JobMatches(list):
+    """Row ids of matching jobs, plus the snapshot those row ids refer to."""
+
+    def __init__(self, rows, snapshot, mode):
+        super().__init__(rows)
+        self.snapshot = snapshot
+        self.mode = mode
+
+    def jobs(self):
+        return [self.snapshot.store[row] for row in self]
+
+
+class SnapshotReloader:
+    """Builds new snapshots off the request path and publishes them atomically.
+
+    Reloads are triggered by a change in the mtime of any watched file (polled
+    every `poll_interval` seconds), by a fixed timer (`reload_interval`), or by
+    calling `request_reload()`, e.g. from an admin endpoint.
+    """
+
+    def __init__(self, build_snapshot, watch_paths=(), poll_interval=0, reload_interval=0):
+        self._build_snapshot = build_snapshot
+        self._watch_paths = list(watch_paths)
+        self._poll_interval = poll_interval
+        self._reload_interval = reload_interval
+        self._current = None
+        self._build_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._mtimes = self._read_mtimes()
+        self._last_reload = time.time()
+        self._thread = None
+        self._thread_pid = None
+        self._start_lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def current(self):
+        return self._current
+
+    def add_listener(self, callback):
+        """Call `callback(snapshot)` after every publish, e.g. to drop caches tied to the old one."""
+        self._listeners.append(callback)
+
+    def publish(self, snapshot):
+        self._current = snapshot
+        self._last_reload = time.time()
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logging.error("Job snapshot listener failed: %s", e)
+
+    def reload(self, reason="manual"):
+        """Build and publish a new snapshot; the previous one is kept on failure."""
+        with self._build_lock:
+            previous = self._current
+            next_version = previous.version + 1 if previous is not None else 1
+            mtimes = self._read_mtimes()
+            start = time.time()
+            try:
+                snapshot = self._build_snapshot(next_version, previous)
+            except Exception as e:
+                logging.error("Job snapshot reload (%s) failed, keeping version %s: %s",
+                              reason, previous.version if previous else None, e)
+                return previous
+            self._mtimes = mtimes
+            self.publish(snapshot)
+            logging.info("Published job snapshot v%d (%d listings, reason: %s) in %.1fs.",
+                         snapshot.version, len(snapshot), reason, time.time() - start)
+            return snapshot
+
+    def request_reload(self):
+        """Ask the background thread to reload as soon as possible."""
+        self._wakeup.set()
+        if not self._watching():
+            threading.Thread(target=self.reload, args=("request",), daemon=True).start()
+
+    def start(self):
+        """Start the watcher thread; safe to call repeatedly and again after a fork."""
+        if not (self._poll_interval or self._reload_interval) or self._watching():
+            return
+        with self._start_lock:
+            if self._watching():
+                return
+            self._thread = threading.Thread(target=self._run, name="job-snapshot-reloader", daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _watching(self):
+        return self._thread is not None and self._thread_pid == os.getpid()
+
+    def _read_mtimes(self):
+        mtimes = {}
+        for path in self._watch_paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def _run(self):
+        wait = min(i for i in (self._poll_interval, self._reload_interval) if i)
+        pending = None
+        while True:
+            requested = self._wakeup.wait(wait)
+            self._wakeup.clear()
+            if requested:
+                self.reload("request")
+                continue
+            mtimes = self._read_mtimes()
+            if mtimes != self._mtimes:
+                # Only reload once the file has stopped changing for a full poll, so a
+                # CSV that is still being appended to is not picked up half-written.
+                if mtimes == pending:
+                    self.reload("file change")
+                pending = mtimes
+            elif self._reload_interval and time.time() - self._last_reload >= self._reload_interval:
+                self.reload("timer")
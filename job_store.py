@@ -0,0 +1,238 @@
+"""Compact, column-oriented in-memory store of job listings.
+
+Instead of one dict per listing, every CSV column is held once for all rows:
+
+* free text (id, title, redirect_url, description) is packed into a single UTF-8
+  buffer per column and addressed by an offsets array;
+* low-cardinality columns (company, location, category, contract_type,
+  contract_time) are interned: one copy of each distinct value plus an int32
+  code per row;
+* salaries are float64 arrays, NaN where missing.
+
+Rows are addressed by integer row id. `store[row]` returns a lightweight
+read-only mapping view, so code written against `job.get(field)` keeps working.
+"""
+import csv
+import logging
+import sys
+import time
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+CATEGORICAL_COLUMNS = ("company", "location", "category", "contract_type", "contract_time")
+NUMERIC_COLUMNS = ("salary_min", "salary_max")
+
+
+class StringColumn:
+    """Strings packed into one UTF-8 buffer, addressed by offsets."""
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_values(cls, values):
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(b"".join(encoded), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.buffer[self.offsets[row]:self.offsets[row + 1]].decode("utf-8")
+
+    def has_prefix(self, other):
+        n = len(other)
+        return (len(self) >= n and np.array_equal(self.offsets[:n + 1], other.offsets)
+                and self.buffer[:len(other.buffer)] == other.buffer)
+
+    @property
+    def nbytes(self):
+        return len(self.buffer) + self.offsets.nbytes
+
+
+class CategoricalColumn:
+    """Each distinct value stored once; rows hold int32 codes into `values`."""
+
+    def __init__(self, values, codes):
+        self.values = values
+        self.codes = codes
+
+    @classmethod
+    def from_values(cls, values):
+        code_of = {}
+        distinct = []
+        codes = np.empty(len(values), dtype=np.int32)
+        for row, value in enumerate(values):
+            code = code_of.get(value)
+            if code is None:
+                code = code_of[value] = len(distinct)
+                distinct.append(sys.intern(value))
+            codes[row] = code
+        return cls(distinct, codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def has_prefix(self, other):
+        # Codes are assigned in order of first appearance, so an appended column
+        # keeps the old codes and extends the old distinct values.
+        n = len(other)
+        return (len(self) >= n and self.values[:len(other.values)] == other.values
+                and np.array_equal(self.codes[:n], other.codes))
+
+    def rows_with_codes(self, codes):
+        return np.flatnonzero(np.isin(self.codes, codes))
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(sys.getsizeof(value) for value in self.values)
+
+
+class NumericColumn:
+    """float64 values, NaN where the CSV field was empty or not a number."""
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def from_values(cls, values):
+        data = np.full(len(values), np.nan, dtype=np.float64)
+        for row, value in enumerate(values):
+            if value is not None and value != "":
+                try:
+                    data[row] = float(value)
+                except ValueError:
+                    pass
+        return cls(data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, row):
+        value = self.data[row]
+        return "" if np.isnan(value) else str(float(value))
+
+    def has_prefix(self, other):
+        return len(self) >= len(other) and np.array_equal(self.data[:len(other)], other.data, equal_nan=True)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+
+class JobRow(Mapping):
+    """Read-only dict-like view of one row of a JobStore."""
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, field):
+        column = self.store.columns.get(field)
+        if column is None:
+            raise KeyError(field)
+        return column[self.row]
+
+    def __iter__(self):
+        return iter(self.store.fields)
+
+    def __len__(self):
+        return len(self.store.fields)
+
+
+class JobStore(Sequence):
+    def __init__(self, fields, columns, num_rows):
+        self.fields = list(fields)
+        self.columns = columns
+        self.num_rows = num_rows
+
+    @classmethod
+    def from_columns(cls, fields, values_by_field):
+        columns = {}
+        num_rows = len(values_by_field[fields[0]]) if fields else 0
+        for field in fields:
+            values = values_by_field[field]
+            if field in CATEGORICAL_COLUMNS:
+                columns[field] = CategoricalColumn.from_values(values)
+            elif field in NUMERIC_COLUMNS:
+                columns[field] = NumericColumn.from_values(values)
+            else:
+                columns[field] = StringColumn.from_values(values)
+        return cls(fields, columns, num_rows)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a store from an iterable of dicts (fields are the union of their keys)."""
+        rows = list(rows)
+        fields = []
+        for row in rows:
+            fields.extend(field for field in row if field not in fields)
+        return cls.from_columns(fields, {field: [str(row.get(field) or "") for row in rows]
+                                         for field in fields})
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            fields = next(reader, [])
+            values = [[] for _ in fields]
+            for record in reader:
+                for i in range(len(fields)):
+                    values[i].append(record[i] if i < len(record) else "")
+        return cls.from_columns(fields, dict(zip(fields, values)))
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [JobRow(self, i) for i in range(*row.indices(self.num_rows))]
+        if row < 0:
+            row += self.num_rows
+        if not 0 <= row < self.num_rows:
+            raise IndexError(row)
+        return JobRow(self, row)
+
+    def get(self, row, field, default=None):
+        column = self.columns.get(field)
+        if column is None:
+            return default
+        return column[row]
+
+    def has_prefix(self, other):
+        """True if this store holds `other`'s rows unchanged, followed by zero or more new rows."""
+        if self.fields != other.fields or self.num_rows < other.num_rows:
+            return False
+        return all(self.columns[field].has_prefix(other.columns[field]) for field in self.fields)
+
+    def rows_containing(self, field, text):
+        """Sorted rows whose `field` contains `text` (case-insensitive)."""
+        column = self.columns.get(field)
+        text = text.lower()
+        if column is None:
+            return np.zeros(0, dtype=np.int64)
+        if isinstance(column, CategoricalColumn):
+            codes = [code for code, value in enumerate(column.values) if text in value.lower()]
+            return column.rows_with_codes(codes)
+        return np.array([row for row in range(self.num_rows) if text in column[row].lower()], dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+
+def load_csv(path):
+    start = time.time()
+    store = JobStore.from_csv(path)
+    logging.info("Loaded %d job listings from %s in %.2fs (%.1f MB in memory).",
+                 len(store), path, time.time() - start, store.nbytes / 1e6)
+    return store
@@ -0,0 +1,152 @@
+"""BM25 keyword search over job listings, backed by an inverted index.
+
+The index maps each token to a posting list: the sorted row ids containing it
+and the token's weighted term frequency in each. Each field's term frequencies
+are scaled by a field weight (a simplified BM25F), so a term in the title counts
+for more than the same term in the description.
+
+It serves lexical candidate generation for hybrid search, and is the degraded
+search path while job embeddings are still being built. When a reload only
+appends listings, `extend` indexes just the new rows and shares every other
+posting list with the previous index.
+"""
+import logging
+import math
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+from job_store import CategoricalColumn
+from vector_index import top_k
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "at", "for", "find", "from", "give", "i", "in", "is", "job", "jobs",
+    "list", "looking", "me", "of", "on", "or", "please", "role", "roles", "show", "some", "the", "to",
+    "want", "what", "with", "career", "careers", "opening", "openings", "vacancy", "vacancies",
+}
+DEFAULT_FIELD_WEIGHTS = {"title": 3.0, "company": 2.0, "location": 1.5, "category": 1.0, "description": 1.0}
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall((text or "").lower()) if token not in STOPWORDS]
+
+
+def _field_postings(column, start, stop, weight):
+    """{token: (rows, weighted tf)} and per-row token counts for rows [start, stop) of one column."""
+    lengths = np.zeros(stop - start, dtype=np.float32)
+    by_token = {}
+    if isinstance(column, CategoricalColumn):
+        # Tokenize each distinct value once, then fan out to the rows holding it.
+        codes = column.codes[start:stop]
+        order = np.argsort(codes, kind="stable")
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(column.values)))))
+        for code in np.flatnonzero(np.diff(bounds)):
+            counts = Counter(tokenize(column.values[code]))
+            rows = order[bounds[code]:bounds[code + 1]]
+            lengths[rows] = sum(counts.values()) * weight
+            for token, count in counts.items():
+                by_token.setdefault(token, []).append((rows + start, np.full(len(rows), count * weight,
+                                                                            dtype=np.float32)))
+        return {token: _sorted_postings(parts) for token, parts in by_token.items()}, lengths
+    for row in range(start, stop):
+        counts = Counter(tokenize(column[row]))
+        lengths[row - start] = sum(counts.values()) * weight
+        for token, count in counts.items():
+            entry = by_token.setdefault(token, ([], []))
+            entry[0].append(row)
+            entry[1].append(count * weight)
+    return {token: (np.array(rows, dtype=np.int64), np.array(tfs, dtype=np.float32))
+            for token, (rows, tfs) in by_token.items()}, lengths
+
+
+def _sorted_postings(parts):
+    """Merge (rows, tf) parts into one posting list sorted by row, summing duplicate rows."""
+    rows = np.concatenate([p[0] for p in parts])
+    tfs = np.concatenate([p[1] for p in parts])
+    order = np.argsort(rows, kind="stable")
+    rows, tfs = rows[order], tfs[order]
+    if len(rows) > 1 and (np.diff(rows) == 0).any():
+        unique_rows, starts = np.unique(rows, return_index=True)
+        return unique_rows, np.add.reduceat(tfs, starts).astype(np.float32)
+    return rows, tfs
+
+
+class BM25Index:
+    def __init__(self, field_weights=None, k1=1.2, b=0.75):
+        self.field_weights = dict(field_weights or DEFAULT_FIELD_WEIGHTS)
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # token -> (sorted rows int64 array, weighted tf float32 array)
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.avg_doc_length = 0.0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, store, field_weights=None):
+        return cls(field_weights).extend(store)
+
+    def extend(self, store):
+        """A new index covering every row of `store`, given this index covers its first len(self) rows.
+
+        Only the appended rows are tokenized; posting lists of tokens that do not
+        occur in them are shared with this index, which is left unchanged.
+        """
+        start_time = time.time()
+        start, stop = len(self), len(store)
+        parts = {}
+        doc_lengths = np.zeros(stop - start, dtype=np.float32)
+        for field, weight in self.field_weights.items():
+            column = store.columns.get(field)
+            if column is None:
+                continue
+            field_postings, field_lengths = _field_postings(column, start, stop, weight)
+            doc_lengths += field_lengths
+            for token, posting in field_postings.items():
+                parts.setdefault(token, []).append(posting)
+        index = BM25Index(self.field_weights, self.k1, self.b)
+        index.postings = dict(self.postings)
+        for token, token_parts in parts.items():
+            previous = self.postings.get(token)
+            index.postings[token] = _sorted_postings(([previous] if previous is not None else []) + token_parts)
+        index.doc_lengths = np.concatenate([self.doc_lengths, doc_lengths])
+        index.avg_doc_length = float(index.doc_lengths.mean()) if len(index.doc_lengths) else 0.0
+        logging.info("Indexed %d listings for BM25 (%d total, %d terms) in %.1fs.",
+                     stop - start, stop, len(index.postings), time.time() - start_time)
+        return index
+
+    def scores(self, query):
+        """BM25 score of every listing for `query` (0 for listings sharing no term)."""
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        n = len(self.doc_lengths)
+        if n == 0 or self.avg_doc_length == 0:
+            return scores
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            rows, tf = posting
+            idf = math.log(1.0 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[rows] / self.avg_doc_length)
+            scores[rows] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query, k, rows=None):
+        """Top-k listings with a positive score, optionally restricted to `rows`."""
+        scores = self.scores(query)
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            positions, top_scores = top_k(scores[rows], k, similarity_threshold=1e-9)
+            return rows[positions], top_scores
+        return top_k(scores, k, similarity_threshold=1e-9)
+
+
+def build_or_extend(store, previous_store=None, previous_index=None):
+    """Index `store`, reusing `previous_index` when `store` only appends rows to `previous_store`."""
+    if previous_index is not None and previous_store is not None and store.has_prefix(previous_store):
+        return previous_index.extend(store)
+    return BM25Index.build(store)
@@ -0,0 +1,201 @@
+"""SQLite store of job listings keyed by Adzuna id.
+
+Replaces appending every extract to the CSVs. Listings are upserted by id: a
+listing seen again is updated in place and keeps its position, and new ones
+are added at the end. Listings older than a maximum age are deleted, so the
+table (and everything the app builds from it) stays bounded.
+
+The app loads the table in rowid order, column by column, into a JobStore.
+Because re-seen listings keep their rowid, a refresh that only adds listings
+looks like an append to the app, and only the new rows are indexed.
+
+    python listing_db.py import job_listing_data.csv   # one-off migration of an existing CSV
+    python listing_db.py expire --max-days-old 30
+    python listing_db.py stats
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from job_store import JobStore, load_csv
+
+COLUMNS = ['id', 'title', 'redirect_url', 'company', 'location', 'description',
+           'category', 'salary_max', 'contract_type', 'salary_min', 'contract_time']
+NUMERIC_COLUMNS = ('salary_max', 'salary_min')
+DEFAULT_DB = "job_listings.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL DEFAULT '',
+    redirect_url TEXT NOT NULL DEFAULT '',
+    company TEXT NOT NULL DEFAULT '',
+    location TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    category TEXT NOT NULL DEFAULT '',
+    salary_max REAL,
+    contract_type TEXT NOT NULL DEFAULT '',
+    salary_min REAL,
+    contract_time TEXT NOT NULL DEFAULT '',
+    created REAL,              -- posting time reported by Adzuna (epoch seconds), if known
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_age ON listings (COALESCE(created, first_seen));
+"""
+
+_UPSERT = """
+INSERT INTO listings ({columns}, created, first_seen, last_seen)
+VALUES ({placeholders}, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET {updates}, created = COALESCE(excluded.created, listings.created),
+    last_seen = excluded.last_seen
+""".format(columns=", ".join(COLUMNS), placeholders=", ".join("?" for _ in COLUMNS),
+           updates=", ".join("%s = excluded.%s" % (c, c) for c in COLUMNS if c != 'id'))
+
+
+def connect(path=DEFAULT_DB, seed_csv=None):
+    """Open (creating if needed) the listing database.
+
+    A database created here is first filled with the listings of `seed_csv`, if
+    that file exists. The app reads only the database once it exists, so
+    without the seed a first ingest would replace the CSV corpus with one
+    day's extract.
+    """
+    created = not os.path.exists(path)
+    conn = sqlite3.connect(path, timeout=30)
+    # WAL makes the per-page commits of an ingestion run cheap and lets the app
+    # read while a run is writing.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    if created and seed_csv and os.path.exists(seed_csv):
+        inserted, _ = import_csv(conn, seed_csv)
+        logging.info("Seeded new listing database %s with %d listings from %s.", path, inserted, seed_csv)
+    return conn
+
+
+def checkpoint(conn):
+    """Fold the write-ahead log into the database file, which also updates the mtime the app polls."""
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def parse_created(value):
+    """Epoch seconds of an Adzuna `created` timestamp (e.g. 2025-03-29T13:36:00Z), or None."""
+    if not value:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _number(value):
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def upsert(conn, rows, now=None):
+    """Insert or update listings (dicts with the CSV columns, optionally `created`).
+
+    Returns (inserted, updated) counts. Runs in one transaction.
+    """
+    now = time.time() if now is None else now
+    rows = [row for row in rows if row.get('id')]
+    if not rows:
+        return 0, 0
+    ids = [str(row['id']) for row in rows]
+    existing = set()
+    for lo in range(0, len(ids), 500):
+        chunk = ids[lo:lo + 500]
+        existing.update(r[0] for r in conn.execute(
+            "SELECT id FROM listings WHERE id IN (%s)" % ", ".join("?" for _ in chunk), chunk))
+    params = []
+    for row in rows:
+        values = [_number(row.get(c)) if c in NUMERIC_COLUMNS else str(row.get(c) or '') for c in COLUMNS]
+        params.append(values + [parse_created(row.get('created')), now, now])
+    with conn:
+        conn.executemany(_UPSERT, params)
+    updated = len(existing)
+    return len(set(ids)) - updated, updated
+
+
+def expire(conn, max_days_old, now=None):
+    """Delete listings posted (or first seen) more than `max_days_old` days ago; returns the count."""
+    now = time.time() if now is None else now
+    with conn:
+        cursor = conn.execute("DELETE FROM listings WHERE COALESCE(created, first_seen) < ?",
+                              (now - max_days_old * 86400.0,))
+    return cursor.rowcount
+
+
+def count(conn):
+    return conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+
+def load_store(path=DEFAULT_DB):
+    """All listings as a JobStore, in rowid order."""
+    start = time.time()
+    conn = sqlite3.connect("file:%s?mode=ro" % path, uri=True, timeout=30)
+    try:
+        rows = conn.execute("SELECT %s FROM listings ORDER BY rowid" % ", ".join(COLUMNS)).fetchall()
+    finally:
+        conn.close()
+    values = {}
+    for i, column in enumerate(COLUMNS):
+        if column in NUMERIC_COLUMNS:
+            values[column] = [row[i] for row in rows]
+        else:
+            values[column] = [row[i] or '' for row in rows]
+    store = JobStore.from_columns(COLUMNS, values)
+    logging.info("Loaded %d job listings from %s in %.2fs (%.1f MB in memory).",
+                 len(store), path, time.time() - start, store.nbytes / 1e6)
+    return store
+
+
+def load_listings(db_path=DEFAULT_DB, csv_path=None):
+    """Listings from the database if it exists, otherwise from the CSV."""
+    if db_path and os.path.exists(db_path):
+        return load_store(db_path)
+    return load_csv(csv_path)
+
+
+def import_csv(conn, csv_path):
+    """Upsert every row of a listings CSV; later duplicates of an id win."""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    return upsert(conn, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the SQLite job listing store.")
+    parser.add_argument("--db", default=os.getenv("JOB_LISTINGS_DB", DEFAULT_DB))
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="upsert the listings of a CSV")
+    import_parser.add_argument("csv", nargs="?", default=os.getenv("JOB_LISTINGS_CSV", "job_listing_data.csv"))
+    expire_parser = commands.add_parser("expire", help="delete listings older than --max-days-old")
+    expire_parser.add_argument("--max-days-old", type=float, required=True)
+    commands.add_parser("stats", help="print the listing count")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    conn = connect(args.db)
+    if args.command == "import":
+        inserted, updated = import_csv(conn, args.csv)
+        print(json.dumps({"inserted": inserted, "updated": updated, "listings": count(conn)}))
+    elif args.command == "expire":
+        print(json.dumps({"expired": expire(conn, args.max_days_old), "listings": count(conn)}))
+    else:
+        print(json.dumps({"listings": count(conn)}))
+    checkpoint(conn)
+    conn.close()
@@ -0,0 +1,145 @@
+"""Non-blocking application logging: records are queued and written by a background thread.
+
+Request threads only put the record on a bounded queue; formatting, JSON
+encoding and file I/O happen in the writer thread. If the writer falls behind
+and the queue fills up, new records are dropped and counted rather than
+blocking a request.
+
+Records are written as one JSON object per line:
+
+    {"ts": "...", "level": "INFO", "logger": "root", "thread": "...", "msg": "...", ...extra fields}
+
+The file rotates by size (`max_bytes`, keeping `backup_count` old files) or,
+with `when` set ("midnight", "h", ...), by time. Under gunicorn each worker
+runs its own writer; put "{pid}" in the path to give each worker its own file,
+since several processes rotating one file lose records. A path of "-" writes
+to stderr.
+
+Log arguments are formatted in the writer thread, so they must not be mutated
+after the logging call.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+# LogRecord attributes that are not user-supplied `extra` fields.
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + ".%03d" % record.msecs,
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records for a writer thread it (re)starts in every process that logs."""
+
+    def __init__(self, make_target, maxsize=10000):
+        super().__init__(None)
+        self.make_target = make_target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._start_lock = threading.Lock()
+        self._listener = None
+        self._pid = None
+
+    def prepare(self, record):
+        # The queue stays in-process, so the record is passed as is (no eager
+        # msg % args); only a traceback is rendered now, while it is still live.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self):
+        # Started lazily and restarted after a fork: the writer thread does not
+        # survive into gunicorn workers forked from a preloaded master.
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self.queue = queue.Queue(self.maxsize)
+                    self._listener = logging.handlers.QueueListener(self.queue, self.make_target(),
+                                                                    respect_handler_level=True)
+                    self._listener.start()
+                    self._pid = os.getpid()
+
+    def flush(self):
+        """Write out everything queued so far and stop the writer (it restarts on the next record)."""
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+                for handler in self._listener.handlers:
+                    handler.close()
+            self._listener = None
+            self._pid = None
+
+    def stats(self):
+        return {"queued": self.queue.qsize() if self.queue is not None else 0, "maxsize": self.maxsize,
+                "dropped": self.dropped}
+
+
+def _file_handler(path, max_bytes, backup_count, when):
+    if path == "-":
+        return logging.StreamHandler(sys.stderr)
+    path = path.replace("{pid}", str(os.getpid()))
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backup_count,
+                                                         encoding="utf-8")
+    return logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                encoding="utf-8")
+
+
+def configure(path="chatbot.log", level=logging.INFO, max_bytes=10 * 1024 * 1024, backup_count=5, when=None,
+              queue_size=10000):
+    """Route the root logger through a queue to a rotating JSON log file; returns the queue handler."""
+    def make_target():
+        handler = _file_handler(path, max_bytes, backup_count, when)
+        handler.setFormatter(JSONFormatter())
+        return handler
+
+    handler = AsyncQueueHandler(make_target, maxsize=queue_size)
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    atexit.register(handler.flush)
+    return handler
+
+
+class Sampler:
+    """True for roughly `rate` of calls (always for rate >= 1, never for rate <= 0)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+
+    def __call__(self):
+        return self.rate >= 1 or (self.rate > 0 and random.random() < self.rate)
@@ -0,0 +1,236 @@
+"""In-process counters, gauges and latency histograms with Prometheus text output.
+
+Request-path code wraps each stage in `span("stage")`; the elapsed time goes
+into the `stage_seconds{stage=...}` histogram. Spans nest (the "score" stage
+includes "top_k"), so stage totals are not meant to add up. Inside
+`collect_spans()` the spans of the current request are also returned one by
+one, for a per-request breakdown.
+
+`SamplingProfiler` samples the stack of one thread at a fixed interval and
+reports collapsed stacks ("a;b;c count", the input format of flamegraph.pl and
+speedscope). Under gevent the sampler only runs when the profiled greenlet
+yields, so profile with sync or threaded workers.
+
+Every gunicorn worker keeps its own registry; a scrape of /metrics sees the
+worker that served it.
+"""
+import bisect
+import contextvars
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('%s="%s"' % (name, _escape(value)) for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labels, values), value) for values, value in items]
+
+
+class Gauge:
+    """A value read from `fn` at scrape time. `fn` returns a number, or a dict of
+    label-value tuples to numbers for a labelled gauge."""
+    type = "gauge"
+
+    def __init__(self, name, help, fn, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.fn = fn
+
+    def samples(self):
+        value = self.fn()
+        if not self.labels:
+            return [(self.name, "", value)]
+        return [(self.name, _format_labels(self.labels, values), v) for values, v in sorted(value.items())]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[position] += 1
+            series[-1] += value
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((values, list(series)) for values, series in self._series.items())
+        samples = []
+        for values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = (("le", _format_value(bound)),)
+                samples.append((self.name + "_bucket", _format_labels(self.labels, values, le), cumulative))
+            samples.append((self.name + "_sum", _format_labels(self.labels, values), series[-1]))
+            samples.append((self.name + "_count", _format_labels(self.labels, values), cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._metrics = []
+
+    def _add(self, metric):
+        metric.name = self.prefix + metric.name
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name, help, fn, labels=()):
+        return self._add(Gauge(name, help, fn, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # A failing gauge callback must not take the whole scrape down.
+                lines.append("# %s unavailable: %s" % (metric.name, _escape(e)))
+                continue
+            lines.append("# HELP %s %s" % (metric.name, metric.help))
+            lines.append("# TYPE %s %s" % (metric.name, metric.type))
+            lines.extend("%s%s %s" % (name, labels, _format_value(value)) for name, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry(prefix="asha_")
+STAGE_SECONDS = REGISTRY.histogram("stage_seconds", "Time spent in each request-path stage.", ("stage",))
+
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block into `stage_seconds{stage=...}`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+@contextmanager
+def collect_spans():
+    """Yields a list that receives (stage, seconds) for every span closed inside the block."""
+    spans = []
+    token = _request_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _request_spans.reset(token)
+
+
+class SamplingProfiler:
+    """Samples the stack of the thread that starts it every `interval` seconds until stopped."""
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append("%s (%s:%d)" % (code.co_name, code.co_filename.rsplit("/", 1)[-1],
+                                             code.co_firstlineno))
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self, limit=None):
+        """Collapsed stacks, most frequent first."""
+        return ["%s %d" % (stack, count) for stack, count in self._stacks.most_common(limit)]
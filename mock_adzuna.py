@@ -0,0 +1,125 @@
+"""Local stand-in for the Adzuna search API, for exercising Data_Extraction offline.
+
+Serves `/v1/api/jobs/in/search/<page>` with deterministic synthetic listings in
+Adzuna's shape (nested company/location/category dicts). It can add latency,
+fail a fraction of requests with 503, and repeat listings across pages to
+exercise retries and de-duplication:
+
+    python mock_adzuna.py --jobs 5000 --fail-rate 0.1 --latency-ms 50 &
+    ADZUNA_BASE_URL=http://127.0.0.1:8765/v1/api/jobs/in/search/{} \\
+        python Data_Extraction.py --db /tmp/listings.db
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PAGE_PATH = re.compile(r"^/v1/api/jobs/in/search/(\d+)$")
+TITLES = ["Software Engineer", "Data Analyst", "Sales Executive", "HR Recruiter", "Teacher", "Accountant",
+          "Golang Developer", "Product Manager", "Customer Support Associate", "Content Writer"]
+CITIES = ["Bangalore, Karnataka", "Mumbai, Maharashtra", "Pune, Maharashtra", "Hyderabad, Telangana",
+          "Chennai, Tamil Nadu", "India"]
+CATEGORIES = ["IT Jobs", "Sales Jobs", "HR & Recruitment Jobs", "Teaching Jobs", "Accounting & Finance Jobs"]
+
+
+def make_job(i):
+    rng = random.Random(i)
+    job = {
+        "id": str(9000000000 + i),
+        "title": rng.choice(TITLES),
+        "redirect_url": "https://www.adzuna.in/details/%d" % (9000000000 + i),
+        "company": {"display_name": "Company %d" % rng.randrange(500)},
+        "location": {"display_name": rng.choice(CITIES)},
+        "description": "Synthetic listing %d for ingestion tests." % i,
+        "category": {"label": rng.choice(CATEGORIES), "tag": "jobs"},
+        "contract_time": rng.choice(["full_time", "part_time", ""]),
+        "contract_type": rng.choice(["permanent", "contract", ""]),
+        # Posted 0-59 days ago, so age-based expiry has something to do.
+        "created": (datetime.now(timezone.utc) - timedelta(days=i % 60)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    if rng.random() < 0.3:
+        job["salary_min"] = float(rng.randrange(2, 20) * 100000)
+        job["salary_max"] = job["salary_min"] + 200000.0
+    return job
+
+
+def make_handler(total_jobs, fail_rate, latency_ms, duplicate_rate, seed):
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            match = PAGE_PATH.match(url.path)
+            if not match:
+                return self._send(404, {"error": "not found"})
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            with rng_lock:
+                fail = rng.random() < fail_rate
+            if fail:
+                return self._send(503, {"error": "temporarily unavailable"})
+            per_page = int(parse_qs(url.query).get("results_per_page", ["100"])[0])
+            page = int(match.group(1))
+            first = (page - 1) * per_page
+            jobs = [make_job(i) for i in range(first, min(first + per_page, total_jobs))]
+            # Listings shifting between pages while paging shows up as repeats of the previous page.
+            repeats = int(len(jobs) * duplicate_rate) if page > 1 else 0
+            jobs[:repeats] = [make_job(i) for i in range(first - repeats, first)]
+            self._send(200, {"count": total_jobs, "results": jobs})
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128    # the default backlog of 5 resets connections under concurrent load
+
+    def handle_error(self, request, client_address):
+        # A client that timed out and hung up is expected here (tests exercise timeouts).
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_mock_server(port=0, total_jobs=1000, fail_rate=0.0, latency_ms=0, duplicate_rate=0.0, seed=0):
+    """Serve in a background thread; returns (server, page URL template)."""
+    server = MockServer(("127.0.0.1", port),
+                                 make_handler(total_jobs, fail_rate, latency_ms, duplicate_rate, seed))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:%d/v1/api/jobs/in/search/{}" % server.server_address[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Adzuna search API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05,
+                        help="fraction of each page repeated from the previous page")
+    args = parser.parse_args()
+
+    server, url = start_mock_server(args.port, args.jobs, args.fail_rate, args.latency_ms, args.duplicate_rate)
+    print("Mock Adzuna API serving %d jobs at %s" % (args.jobs, url))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,161 @@
+"""Local stand-in for the Supabase Auth REST endpoints the app uses.
+
+Implements sign-up (`POST /auth/v1/signup`), password sign-in
+(`POST /auth/v1/token?grant_type=password`), session refresh
+(`POST /auth/v1/token?grant_type=refresh_token`) and token validation
+(`GET /auth/v1/user`) against an in-memory user table. Access tokens expire
+after --token-ttl seconds, like Supabase's JWTs; refresh tokens are single-use.
+It can add latency and fail a fraction of requests with 503 to exercise
+timeouts and the circuit breaker:
+
+    python mock_supabase.py --latency-ms 200 --fail-rate 0.2 --token-ttl 60 &
+    SUPABASE_URL=http://127.0.0.1:8766 SUPABASE_KEY=test python app.py
+"""
+import argparse
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_handler(latency_ms, fail_rate, confirm_email, seed, token_ttl=3600):
+    users = {}      # email -> {"id", "email", "password", "confirmed"}
+    tokens = {}     # access token -> (email, expiry time)
+    refresh_tokens = {}     # refresh token -> email
+    lock = threading.Lock()
+    rng = random.Random(seed)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, like the real service
+
+        def _fault(self):
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            with lock:
+                fail = rng.random() < fail_rate
+            if fail:
+                self._send(503, {"msg": "Service temporarily unavailable"})
+            return fail
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                return json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return {}
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = self._body()
+            if self._fault():
+                return
+            email, password = body.get("email"), body.get("password")
+            if url.path == "/auth/v1/signup":
+                if not email or not password or len(password) < 6:
+                    return self._send(422, {"msg": "Password should be at least 6 characters"})
+                with lock:
+                    if email in users:
+                        return self._send(422, {"msg": "User already registered"})
+                    user = users[email] = {"id": str(uuid.uuid4()), "email": email, "password": password,
+                                           "confirmed": not confirm_email}
+                if confirm_email:
+                    return self._send(200, self._public(user))
+                return self._send(200, self._session(user))
+            if url.path == "/auth/v1/token" and parse_qs(url.query).get("grant_type") == ["password"]:
+                with lock:
+                    user = users.get(email)
+                if user is None or user["password"] != password:
+                    return self._send(400, {"error": "invalid_grant", "error_description": "Invalid login credentials"})
+                if not user["confirmed"]:
+                    return self._send(400, {"error": "invalid_grant", "error_description": "Email not confirmed"})
+                return self._send(200, self._session(user))
+            if url.path == "/auth/v1/token" and parse_qs(url.query).get("grant_type") == ["refresh_token"]:
+                with lock:
+                    user = users.get(refresh_tokens.pop(body.get("refresh_token"), None))
+                if user is None:
+                    return self._send(400, {"error": "invalid_grant",
+                                            "error_description": "Invalid Refresh Token: Refresh Token Not Found"})
+                return self._send(200, self._session(user))
+            self._send(404, {"msg": "not found"})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if self._fault():
+                return
+            if url.path != "/auth/v1/user":
+                return self._send(404, {"msg": "not found"})
+            token = (self.headers.get("Authorization") or "").replace("Bearer ", "", 1)
+            with lock:
+                email, expires_at = tokens.get(token, (None, 0))
+                user = users.get(email)
+            if user is None:
+                return self._send(401, {"msg": "invalid JWT"})
+            if time.time() >= expires_at:
+                return self._send(401, {"msg": "invalid JWT: token is expired"})
+            self._send(200, self._public(user))
+
+        def _public(self, user):
+            return {"id": user["id"], "email": user["email"], "aud": "authenticated"}
+
+        def _session(self, user):
+            token, refresh_token = secrets.token_urlsafe(24), secrets.token_urlsafe(24)
+            with lock:
+                tokens[token] = (user["email"], time.time() + token_ttl)
+                refresh_tokens[refresh_token] = user["email"]
+            return {"access_token": token, "token_type": "bearer", "expires_in": token_ttl,
+                    "refresh_token": refresh_token, "user": self._public(user)}
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128    # the default backlog of 5 resets connections under concurrent load
+
+    def handle_error(self, request, client_address):
+        # A client that timed out and hung up is expected here (tests exercise timeouts).
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_mock_server(port=0, latency_ms=0, fail_rate=0.0, confirm_email=False, seed=0, token_ttl=3600):
+    """Serve in a background thread; returns (server, base URL)."""
+    server = MockServer(("127.0.0.1", port), make_handler(latency_ms, fail_rate, confirm_email, seed, token_ttl))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:%d" % server.server_address[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Supabase Auth API.")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--confirm-email", action="store_true",
+                        help="require email confirmation (sign-in then fails with 'Email not confirmed')")
+    parser.add_argument("--token-ttl", type=float, default=3600, help="access token lifetime in seconds")
+    args = parser.parse_args()
+
+    server, url = start_mock_server(args.port, args.latency_ms, args.fail_rate, args.confirm_email,
+                                    token_ttl=args.token_ttl)
+    print("Mock Supabase Auth serving at %s" % url)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,68 @@
+"""Precomputed "jobs for you" recommendations per user, read by /profile and /chat.
+
+`python bulk_match.py` writes each user's top-k listings here in a nightly
+run. Entries hold listing id keys (embedding_store.id_keys) and scores, so
+they resolve against whichever job snapshot the app is serving, and users are
+keyed by user_data.user_key. The SQLite file is shared by the batch run and
+every app worker.
+"""
+import json
+import time
+
+from sqlite_connections import ThreadLocalConnections, off_hub
+from user_data import user_key
+
+DEFAULT_DB = "recommendations.db"
+
+
+class RecommendationStore:
+    """Every call runs off the gevent hub (sqlite_connections.off_hub). The table
+    is created on first use, so constructing a store touches no file."""
+
+    def __init__(self, path=DEFAULT_DB, timeout=30.0):
+        self.path = path
+        self._connections = ThreadLocalConnections(path, timeout=timeout)
+        self._created = False
+
+    def _connect(self):
+        conn = self._connections.get()
+        if not self._created:
+            conn.execute("CREATE TABLE IF NOT EXISTS recommendations ("
+                         "user_key TEXT PRIMARY KEY, keys TEXT NOT NULL, scores TEXT NOT NULL, "
+                         "queries INTEGER NOT NULL, generated_at REAL NOT NULL)")
+            self._created = True
+        return conn
+
+    def put_many(self, entries, generated_at=None):
+        """Store (email, keys, scores, query count) entries in one transaction."""
+        rows = [(user_key(email), json.dumps([int(k) for k in keys]),
+                 json.dumps([round(float(s), 4) for s in scores]), queries, generated_at or time.time())
+                for email, keys, scores, queries in entries]
+        off_hub(self._put_many, rows)
+
+    def _put_many(self, rows):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO recommendations VALUES (?, ?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, email):
+        """{"keys", "scores", "queries", "generated_at"} for the user, or None."""
+        return off_hub(self._get, user_key(email))
+
+    def _get(self, key):
+        row = self._connect().execute("SELECT keys, scores, queries, generated_at FROM recommendations "
+                                      "WHERE user_key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return {"keys": json.loads(row[0]), "scores": json.loads(row[1]), "queries": row[2],
+                "generated_at": row[3]}
+
+    def stats(self):
+        count, newest = off_hub(lambda: self._connect().execute(
+            "SELECT COUNT(*), MAX(generated_at) FROM recommendations").fetchone())
+        return {"users": count, "generated_at": newest}
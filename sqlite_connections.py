@@ -0,0 +1,47 @@
+"""Per-thread, per-process SQLite connections for stores shared between workers."""
+import os
+import sqlite3
+import threading
+
+
+class ThreadLocalConnections:
+    """Hands each thread its own autocommit connection to `path`, in WAL mode.
+
+    sqlite3 connections must not be shared between threads, nor carried into a
+    forked gunicorn worker, so one is opened per thread and again after a fork.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+
+def _gevent_patched():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("threading")
+
+
+def off_hub(fn, *args):
+    """Call `fn(*args)`; under gevent, in its native thread pool.
+
+    sqlite3 calls block the OS thread, e.g. while waiting on another worker's
+    write lock. On a gevent hub that would stall every request of the worker,
+    not just the one waiting.
+    """
+    if _gevent_patched():
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from auth_client import AuthUnavailable, CircuitBreaker, SupabaseAuth
+from mock_supabase import start_mock_server
+
+
+@pytest.fixture
+def mock_supabase(request):
+    servers = []
+
+    def start(**kwargs):
+        server, url = start_mock_server(**kwargs)
+        servers.append(server)
+        return url
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_sign_up_sign_in_and_validate(mock_supabase):
+    auth = SupabaseAuth(mock_supabase(), "test")
+    signed_up = auth.sign_up("a@example.com", "secret1")
+    assert signed_up.status == 200 and signed_up.data["refresh_token"]
+    signed_in = auth.sign_in("a@example.com", "secret1")
+    assert signed_in.status == 200
+    assert auth.get_user(signed_in.data["access_token"])["email"] == "a@example.com"
+    assert auth.sign_in("a@example.com", "wrong-password").status == 400
+    assert auth.get_user("not-a-token") is None
+
+
+def test_expired_token_is_refreshed(mock_supabase):
+    auth = SupabaseAuth(mock_supabase(token_ttl=0.2), "test", token_cache_size=0)
+    session = auth.sign_up("a@example.com", "secret1").data
+    assert auth.get_user(session["access_token"]) is not None
+    time.sleep(0.3)
+    assert auth.get_user(session["access_token"]) is None
+
+    refreshed = auth.refresh(session["refresh_token"])
+    assert refreshed.status == 200
+    assert auth.get_user(refreshed.data["access_token"])["email"] == "a@example.com"
+    # Refresh tokens are single-use.
+    assert auth.refresh(session["refresh_token"]).status == 400
+
+
+def test_validations_are_cached(mock_supabase):
+    auth = SupabaseAuth(mock_supabase(token_ttl=0.2), "test", token_cache_ttl=60)
+    token = auth.sign_up("a@example.com", "secret1").data["access_token"]
+    assert auth.get_user(token) is not None
+    time.sleep(0.3)
+    assert auth.get_user(token) is not None
+    auth.forget_token(token)
+    assert auth.get_user(token) is None
+
+
+def test_breaker_opens_after_failures_and_fails_fast(mock_supabase):
+    auth = SupabaseAuth(mock_supabase(fail_rate=1.0), "test", failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(AuthUnavailable, match="HTTP 503"):
+            auth.sign_in("a@example.com", "secret1")
+    assert auth.breaker.state == "open"
+    with pytest.raises(AuthUnavailable, match="circuit is open"):
+        auth.sign_in("a@example.com", "secret1")
+
+
+def test_breaker_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.15)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    # A failed trial opens the circuit again; a successful one closes it.
+    breaker.record_failure()
+    assert breaker.state == "open"
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_slow_responses_time_out(mock_supabase):
+    auth = SupabaseAuth(mock_supabase(latency_ms=500), "test", read_timeout=0.1, failure_threshold=5)
+    start = time.monotonic()
+    with pytest.raises(AuthUnavailable):
+        auth.sign_in("a@example.com", "secret1")
+    assert time.monotonic() - start < 0.4
+    assert auth.breaker.state == "closed"
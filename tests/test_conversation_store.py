@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+import conversation_store
+from conversation_store import ConversationStore, MemoryBackend, SQLiteBackend, create_store
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(conversation_store, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "sqlite":
+            return SQLiteBackend(str(tmp_path / "conversations.db"), **kwargs)
+        return MemoryBackend(**kwargs)
+    return make
+
+
+def entry(n):
+    return {"sender": "user", "message": "message %d" % n, "timestamp": "t%d" % n}
+
+
+def test_history_is_capped(make_backend):
+    store = ConversationStore(make_backend(), max_history=3)
+    for n in range(5):
+        length = store.append("s1", entry(n))
+    assert length == 3
+    assert [e["message"] for e in store.history("s1")] == ["message 2", "message 3", "message 4"]
+    assert store.history("other") == []
+
+
+def test_pending_selection_is_claimed_once(make_backend):
+    store = ConversationStore(make_backend())
+    store.append("s1", entry(0))
+    store.set_pending("s1", [11, 22, 33], "salary")
+    assert store.has_pending("s1") and store.stats()["pending"] == 1
+    assert store.pop_pending("s1") == {"keys": [11, 22, 33], "detail_type": "salary"}
+    assert store.pop_pending("s1") is None and not store.has_pending("s1")
+    assert store.stats()["pending"] == 0 and store.stats()["sessions"] == 1
+    assert len(store.history("s1")) == 1
+
+
+def test_concurrent_pops_claim_a_selection_once(make_backend):
+    store = ConversationStore(make_backend())
+    store.set_pending("s1", [1, 2], "details")
+    claimed = []
+
+    def pop():
+        claimed.append(store.pop_pending("s1"))
+    threads = [threading.Thread(target=pop) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [c for c in claimed if c is not None] == [{"keys": [1, 2], "detail_type": "details"}]
+
+
+def test_sessions_expire(make_backend, clock):
+    store = ConversationStore(make_backend(ttl=60))
+    store.append("s1", entry(0))
+    clock.now += 61
+    assert store.history("s1") == []
+    store.append("s1", entry(1))
+    assert [e["message"] for e in store.history("s1")] == ["message 1"]
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_sessions=2)
+    store = ConversationStore(backend)
+    store.append("a", entry(0))
+    store.set_pending("b", [1], "details")
+    store.append("a", entry(1))
+    store.append("c", entry(2))
+    assert store.history("b") == [] and len(store.history("a")) == 2
+    assert backend.stats()["sessions"] == 2 and backend.stats()["pending"] == 0
+
+
+def test_sqlite_purge_keeps_the_newest_sessions(tmp_path, clock):
+    backend = SQLiteBackend(str(tmp_path / "conversations.db"), max_sessions=2, ttl=60)
+    store = ConversationStore(backend)
+    for n, session in enumerate(["a", "b", "c", "d"]):
+        clock.now += 1
+        store.append(session, entry(n))
+    store.set_pending("d", [1], "details")
+    assert backend.stats()["sessions"] == 4
+    backend.purge()
+    assert backend.stats()["sessions"] == 2 and backend.stats()["pending"] == 1
+    assert store.history("a") == [] and len(store.history("c")) == 1
+    clock.now += 120
+    backend.purge()
+    assert backend.stats()["sessions"] == 0 and backend.stats()["pending"] == 0
+
+
+def test_sqlite_sessions_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    first, second = ConversationStore(SQLiteBackend(path)), ConversationStore(SQLiteBackend(path))
+    first.set_pending("s1", [7], "details")
+    assert second.pop_pending("s1") == {"keys": [7], "detail_type": "details"}
+    assert not first.has_pending("s1")
+
+
+def test_create_store(tmp_path):
+    assert isinstance(create_store("memory").backend, MemoryBackend)
+    assert isinstance(create_store("sqlite", str(tmp_path / "c.db")).backend, SQLiteBackend)
+    with pytest.raises(ValueError):
+        create_store("redis")
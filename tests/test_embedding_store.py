@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+import pytest
+
+import embedding_store
+from job_store import JobStore
+
+
+class HashingModel:
+    """Deterministic stand-in for a SentenceTransformer that records what it encodes."""
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.encoded = []
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True,
+               show_progress_bar=False):
+        self.encoded.extend(texts)
+        vectors = np.stack([np.random.default_rng(embedding_store.row_hash(text)).normal(size=self.dim)
+                            for text in texts]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def jobs(*titles, ids=None):
+    ids = ids or [str(i) for i in range(len(titles))]
+    return JobStore.from_rows([{"id": id, "title": title, "company": "Acme", "description": "Build things."}
+                               for id, title in zip(ids, titles)])
+
+
+def test_build_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    model = HashingModel()
+    store = jobs("Engineer", "Analyst", "Teacher")
+    built = embedding_store.build_cache(model, "hashing", store, path, chunk_size=2)
+    cache = embedding_store.load_cache(path)
+    assert len(cache) == 3 and cache.header["model"] == "hashing" and cache.header["dim"] == 8
+    np.testing.assert_array_equal(cache.vectors, built.vectors)
+    np.testing.assert_allclose(np.linalg.norm(cache.vectors, axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_array_equal(cache.keys, embedding_store.id_keys(store))
+    assert [name for name in os.listdir(tmp_path)] == ["cache.bin"]
+
+
+def test_load_or_build_reuses_a_current_cache(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    store = jobs("Engineer", "Analyst")
+    embedding_store.load_or_build(HashingModel(), "hashing", store, path)
+    model = HashingModel()
+    embedding_store.load_or_build(model, "hashing", store, path)
+    assert model.encoded == []
+
+
+def test_only_new_or_changed_rows_are_encoded(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    first = embedding_store.load_or_build(HashingModel(), "hashing", jobs("Engineer", "Analyst", "Teacher"), path)
+    old_vectors = np.array(first.vectors)
+    model = HashingModel()
+    # Row "1" changed, "2" was dropped, "3" is new, "0" is unchanged but moved.
+    updated = jobs("Nurse", "Data Analyst", "Engineer", ids=["3", "1", "0"])
+    cache = embedding_store.load_or_build(model, "hashing", updated, path)
+    assert len(model.encoded) == 2
+    np.testing.assert_array_equal(cache.vectors[2], old_vectors[0])
+    assert len(cache) == 3
+
+
+def test_model_or_recipe_change_rebuilds(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    store = jobs("Engineer", "Analyst")
+    embedding_store.load_or_build(HashingModel(), "hashing", store, path)
+    model = HashingModel()
+    embedding_store.load_or_build(model, "hashing@int8", store, path)
+    assert len(model.encoded) == 2
+    model = HashingModel()
+    cache = embedding_store.load_or_build(model, "hashing@int8", store, path, description_chars=5)
+    assert len(model.encoded) == 2
+    assert cache.header["recipe"]["description_chars"] == 5
+
+
+def test_float16_cache(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    cache = embedding_store.build_cache(HashingModel(), "hashing", jobs("Engineer"), path, dtype="float16")
+    assert cache.vectors.dtype == np.float16
+    scores = embedding_store.similarity_scores(cache.vectors, np.asarray(cache.vectors[0], dtype=np.float32))
+    assert scores.dtype == np.float32 and scores[0] == pytest.approx(1.0, abs=1e-2)
+    with pytest.raises(ValueError):
+        embedding_store.build_cache(HashingModel(), "hashing", jobs("Engineer"), path, dtype="int8")
+
+
+def test_write_cache_normalizes_blocks(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    store = jobs("Engineer", "Analyst", "Teacher")
+    blocks = [np.array([[3.0, 4.0], [0.0, 0.0]]), np.array([[0.0, 2.0]])]
+    cache = embedding_store.write_cache(path, "external", store, iter(blocks), dim=2)
+    np.testing.assert_allclose(cache.vectors, [[0.6, 0.8], [0.0, 0.0], [0.0, 1.0]])
+    assert cache.matches("external", embedding_store.text_recipe(),
+                         embedding_store.row_hashes([embedding_store.job_text(job) for job in store]),
+                         embedding_store.id_keys(store))
+
+
+def test_short_write_leaves_no_cache(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    with pytest.raises(ValueError, match="size mismatch"):
+        embedding_store.write_cache(path, "external", jobs("Engineer", "Analyst"), iter([np.ones((1, 2))]), dim=2)
+    assert os.listdir(tmp_path) == []
+
+
+def test_invalid_files_are_rejected(tmp_path):
+    path = tmp_path / "cache.bin"
+    path.write_bytes(b"not a cache")
+    with pytest.raises(ValueError):
+        embedding_store.load_cache(str(path))
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+import Data_Extraction
+import listing_db
+from mock_adzuna import start_mock_server
+
+PARAMS = {"results_per_page": 100}
+
+
+@pytest.fixture
+def mock_adzuna():
+    servers = []
+
+    def start(**kwargs):
+        server, url = start_mock_server(**kwargs)
+        servers.append(server)
+        return url
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def ingest(url, db_path, **kwargs):
+    kwargs.setdefault("max_age_days", 0)
+    return Data_Extraction.ingest(base_url=url, params=PARAMS, db_path=db_path, backoff=0, seed_csv=None, **kwargs)
+
+
+def listing_count(db_path):
+    conn = listing_db.connect(db_path)
+    try:
+        return listing_db.count(conn)
+    finally:
+        conn.close()
+
+
+def test_ingest_dedups_repeated_listings(mock_adzuna, tmp_path):
+    url = mock_adzuna(total_jobs=450, duplicate_rate=0.1)
+    db_path = str(tmp_path / "listings.db")
+    stats = ingest(url, db_path)
+    assert stats["pages"] == 5 and stats["failed_pages"] == 0
+    assert stats["duplicates"] > 0
+    assert stats["inserted"] == stats["rows_fetched"] - stats["duplicates"] == listing_count(db_path)
+
+    # A second run updates the same listings in place.
+    again = ingest(url, db_path)
+    assert again["inserted"] == 0 and again["updated"] == stats["inserted"]
+    assert listing_count(db_path) == stats["inserted"]
+
+
+def test_ingest_expires_old_listings(mock_adzuna, tmp_path):
+    db_path = str(tmp_path / "listings.db")
+    stats = ingest(mock_adzuna(total_jobs=300), db_path, max_age_days=30)
+    assert stats["expired"] > 0
+    assert listing_count(db_path) == 300 - stats["expired"]
+
+
+def test_failed_page_skips_expiry(mock_adzuna, tmp_path):
+    db_path = str(tmp_path / "listings.db")
+    conn = listing_db.connect(db_path)
+    listing_db.upsert(conn, [{"id": "old", "title": "Old listing", "created": time.time() - 100 * 86400}])
+    conn.close()
+    # With this seed and one request at a time, page 1 succeeds and page 3 fails.
+    url = mock_adzuna(total_jobs=500, fail_rate=0.5, seed=0)
+    stats = ingest(url, db_path, concurrency=1, max_retries=0, max_age_days=30)
+    assert stats["failed_pages"] > 0 and stats["pages"] > 0
+    assert stats["expired"] == 0
+    conn = listing_db.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM listings WHERE id = 'old'").fetchone() == (1,)
+    conn.close()
+
+
+def test_transient_failures_are_retried(mock_adzuna, tmp_path):
+    db_path = str(tmp_path / "listings.db")
+    stats = ingest(mock_adzuna(total_jobs=500, fail_rate=0.5, seed=0), db_path, concurrency=1, max_retries=10)
+    assert stats["failed_pages"] == 0 and stats["pages"] == 5
+    assert stats["retries"] > 0
+    assert listing_count(db_path) == 500
+
+
+def test_retries_are_capped(mock_adzuna):
+    url = mock_adzuna(fail_rate=1.0)
+    stats = {"retries": 0}
+    with pytest.raises(Data_Extraction.PageFetchError, match="giving up after 2 retries"):
+        Data_Extraction.fetch_page(Data_Extraction.make_session(1), 1, url, PARAMS, max_retries=2, backoff=0,
+                                   stats=stats)
+    assert stats["retries"] == 2
+
+
+def test_slow_pages_time_out(mock_adzuna, monkeypatch):
+    monkeypatch.setattr(Data_Extraction, "REQUEST_TIMEOUT", 0.1)
+    url = mock_adzuna(latency_ms=500)
+    start = time.monotonic()
+    with pytest.raises(Data_Extraction.PageFetchError):
+        Data_Extraction.fetch_page(Data_Extraction.make_session(1), 1, url, PARAMS, max_retries=1, backoff=0)
+    assert time.monotonic() - start < 1.0
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from job_filters import FilterIndex, extract_filters, extract_salary_range, filter_key
+from job_store import JobStore
+
+LISTINGS = [
+    {"id": "0", "title": "Python Developer", "company": "Acme", "location": "Bengaluru, Karnataka",
+     "category": "IT Jobs", "contract_time": "full_time", "salary_min": "600000", "salary_max": "900000"},
+    {"id": "1", "title": "Data Analyst", "company": "Globex", "location": "Bangalore, Karnataka",
+     "category": "IT Jobs", "contract_time": "full_time", "salary_min": "300000", "salary_max": "400000"},
+    {"id": "2", "title": "Tutor (Remote)", "company": "Acme", "location": "Salem, Tamil Nadu",
+     "category": "Part time Jobs", "contract_time": "", "salary_min": "", "salary_max": ""},
+    {"id": "3", "title": "Store Assistant", "company": "Anand Stores", "location": "Navi Mumbai, Maharashtra",
+     "category": "Retail Jobs", "contract_time": "part_time", "salary_min": "150000", "salary_max": "150000"},
+    {"id": "4", "title": "Nurse", "company": "City Hospital", "location": "Thane, Maharashtra",
+     "category": "Healthcare & Nursing Jobs", "contract_time": "full_time", "salary_min": "250000",
+     "salary_max": "350000"},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return FilterIndex(JobStore.from_rows(LISTINGS))
+
+
+def test_salary_ranges():
+    assert extract_salary_range("jobs with salary above 5 lakh") == (5e5, None)
+    assert extract_salary_range("between 3 and 6 lpa") == (3e5, 6e5)
+    assert extract_salary_range("under 20k") == (None, 2e4)
+    assert extract_salary_range("over 5 years of experience") == (None, None)
+
+
+def test_contract_remote_and_entity_filters():
+    filters = extract_filters("Remote full time contract roles at Acme", [("Acme", "ORG"), ("India", "GPE")])
+    assert filters == {"contract_time": ["full_time"], "contract_type": ["contract"], "remote": True,
+                       "company": ["acme"]}
+    assert extract_filters("what is the contract type?") == {}
+
+
+def test_places_need_a_preposition(index):
+    assert extract_filters("jobs in salem", filter_index=index) == {"location": ["salem"]}
+    assert extract_filters("salem jobs", filter_index=index) == {}
+    assert extract_filters("what is the salary of thane", filter_index=index) == {}
+    assert extract_filters("nurse jobs near navi mumbai or thane", filter_index=index)["location"] == \
+        ["navi mumbai", "thane"]
+
+
+def test_location_aliases_match_both_ways(index):
+    for place in ("bengaluru", "bangalore"):
+        filters = extract_filters("developer jobs in %s" % place, filter_index=index)
+        assert filters == {"location": ["bangalore"]}
+        assert index.rows(filters).tolist() == [0, 1]
+    assert index.rows(extract_filters("jobs", [("Bengaluru", "GPE")])).tolist() == [0, 1]
+
+
+def test_part_time_category_and_contract_filter_are_equivalent(index):
+    by_category = extract_filters("part time jobs", filter_index=index)
+    assert by_category == {"contract_time": ["part_time"]}
+    assert index.rows(by_category).tolist() == [2, 3]
+    assert index.rows(extract_filters("part-time work")).tolist() == [2, 3]
+    assert index.rows(extract_filters("it jobs", filter_index=index)).tolist() == [0, 1]
+
+
+def test_filters_combine(index):
+    assert index.rows({}) is None
+    assert index.rows({"remote": True}).tolist() == [2]
+    assert index.rows({"salary_min": 5e5}).tolist() == [0]
+    assert index.rows({"salary_min": 2e5, "salary_max": 3e5}).tolist() == [1, 4]
+    assert index.rows({"location": ["karnataka"], "salary_max": 5e5}).tolist() == [1]
+    assert index.rows({"company": ["acme", "globex"], "contract_time": ["full_time"]}).tolist() == [0, 1]
+    assert len(index.rows({"company": ["initech"]})) == 0
+    assert isinstance(index.rows({"remote": True}), np.ndarray)
+
+
+def test_filter_key_is_order_independent():
+    assert filter_key({"location": ["pune"], "remote": True}) == filter_key({"remote": True, "location": ["pune"]})
+    assert filter_key(None) == ()
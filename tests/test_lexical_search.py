@@ -0,0 +1,70 @@
+import numpy as np
+
+from job_store import JobStore
+from lexical_search import BM25Index, build_or_extend, tokenize
+
+LISTINGS = [
+    {"id": "1", "title": "Python Developer", "company": "Acme", "location": "Pune, Maharashtra",
+     "description": "Build web services."},
+    {"id": "2", "title": "Data Analyst", "company": "Globex", "location": "Mumbai, Maharashtra",
+     "description": "SQL and Python reporting."},
+    {"id": "3", "title": "School Teacher", "company": "Acme", "location": "Delhi",
+     "description": "Teach mathematics to grade 8."},
+    {"id": "4", "title": "C++ Engineer", "company": "Initech", "location": "Pune, Maharashtra",
+     "description": "Low latency systems."},
+]
+MORE = [
+    {"id": "5", "title": "Python Data Engineer", "company": "Globex", "location": "Delhi",
+     "description": "Pipelines."},
+    {"id": "6", "title": "Nurse", "company": "City Hospital", "location": "Mumbai, Maharashtra",
+     "description": "Ward duty."},
+]
+
+
+def test_tokenize_keeps_tech_terms_and_drops_stopwords():
+    assert tokenize("Show me C++ and C# jobs in Node.js, please!") == ["c++", "c#", "node.js"]
+    assert tokenize(None) == []
+
+
+def test_title_matches_outrank_description_matches():
+    index = BM25Index.build(JobStore.from_rows(LISTINGS))
+    rows, scores = index.search("python", 5)
+    assert rows.tolist() == [0, 1]
+    assert scores[0] > scores[1] > 0
+
+
+def test_only_matching_rows_are_returned():
+    index = BM25Index.build(JobStore.from_rows(LISTINGS))
+    assert sorted(index.search("acme", 5)[0].tolist()) == [0, 2]
+    assert len(index.search("welder", 5)[0]) == 0
+    assert len(index.search("jobs for me", 5)[0]) == 0
+
+
+def test_search_within_rows():
+    index = BM25Index.build(JobStore.from_rows(LISTINGS))
+    assert index.search("pune", 5, rows=[1, 3])[0].tolist() == [3]
+    assert len(index.search("pune", 5, rows=[])[0]) == 0
+
+
+def test_extend_matches_a_full_build_and_shares_postings():
+    base = BM25Index.build(JobStore.from_rows(LISTINGS))
+    store = JobStore.from_rows(LISTINGS + MORE)
+    extended = base.extend(store)
+    full = BM25Index.build(store)
+    assert len(extended) == len(full) == 6 and len(base) == 4
+    assert extended.postings.keys() == full.postings.keys()
+    for query in ("python", "maharashtra delhi", "globex data", "nurse"):
+        np.testing.assert_allclose(extended.scores(query), full.scores(query), rtol=1e-6)
+    assert extended.postings["initech"] is base.postings["initech"]
+    assert extended.postings["python"] is not base.postings["python"]
+
+
+def test_build_or_extend_rebuilds_unless_rows_were_only_appended():
+    old_store = JobStore.from_rows(LISTINGS)
+    old_index = BM25Index.build(old_store)
+    appended = build_or_extend(JobStore.from_rows(LISTINGS + MORE), old_store, old_index)
+    assert appended.postings["initech"] is old_index.postings["initech"]
+    changed = JobStore.from_rows([dict(LISTINGS[0], title="Java Developer")] + LISTINGS[1:] + MORE)
+    rebuilt = build_or_extend(changed, old_store, old_index)
+    assert "java" in rebuilt.postings and rebuilt.postings["initech"] is not old_index.postings["initech"]
+    assert len(build_or_extend(old_store)) == 4
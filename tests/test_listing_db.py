@@ -0,0 +1,80 @@
+import csv
+import time
+
+import listing_db
+
+
+def listing(id, **fields):
+    row = {column: "" for column in listing_db.COLUMNS}
+    row.update({"id": id, "title": "Job %s" % id}, **fields)
+    return row
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=listing_db.COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_upsert_inserts_then_updates_by_id(tmp_path):
+    conn = listing_db.connect(str(tmp_path / "listings.db"))
+    assert listing_db.upsert(conn, [listing("1"), listing("2"), listing("")]) == (2, 0)
+    assert listing_db.upsert(conn, [listing("2", title="Renamed"), listing("3")]) == (1, 1)
+    assert listing_db.count(conn) == 3
+    assert conn.execute("SELECT title FROM listings WHERE id = '2'").fetchone() == ("Renamed",)
+
+
+def test_upsert_parses_salaries_and_keeps_known_posting_time(tmp_path):
+    conn = listing_db.connect(str(tmp_path / "listings.db"))
+    listing_db.upsert(conn, [listing("1", salary_min="500000", salary_max="bad", created="2025-03-29T13:36:00Z")])
+    assert conn.execute("SELECT salary_min, salary_max FROM listings").fetchone() == (500000.0, None)
+    # A re-fetch without a posting time keeps the one already stored.
+    listing_db.upsert(conn, [listing("1")])
+    assert conn.execute("SELECT created FROM listings").fetchone() == (
+        listing_db.parse_created("2025-03-29T13:36:00Z"),)
+
+
+def test_expire_uses_posting_time_or_first_seen(tmp_path):
+    conn = listing_db.connect(str(tmp_path / "listings.db"))
+    now = time.time()
+    listing_db.upsert(conn, [listing("old", created=now - 40 * 86400), listing("new", created=now - 86400)], now=now)
+    listing_db.upsert(conn, [listing("unknown")], now=now - 40 * 86400)
+    assert listing_db.expire(conn, 30, now=now) == 2
+    assert [row[0] for row in conn.execute("SELECT id FROM listings")] == ["new"]
+
+
+def test_new_database_is_seeded_from_csv(tmp_path):
+    seed = tmp_path / "seed.csv"
+    write_csv(seed, [listing("1"), listing("2")])
+    db_path = str(tmp_path / "listings.db")
+    conn = listing_db.connect(db_path, seed_csv=str(seed))
+    assert listing_db.count(conn) == 2
+    listing_db.upsert(conn, [listing("3")])
+    conn.close()
+    # An existing database is not seeded again.
+    write_csv(seed, [listing("4")])
+    assert listing_db.count(listing_db.connect(db_path, seed_csv=str(seed))) == 3
+
+
+def test_import_csv_later_duplicates_win(tmp_path):
+    path = tmp_path / "listings.csv"
+    write_csv(path, [listing("1", title="First"), listing("1", title="Second")])
+    conn = listing_db.connect(str(tmp_path / "listings.db"))
+    assert listing_db.import_csv(conn, str(path)) == (1, 0)
+    assert conn.execute("SELECT title FROM listings").fetchone() == ("Second",)
+
+
+def test_load_listings_prefers_the_database(tmp_path):
+    csv_path = tmp_path / "listings.csv"
+    write_csv(csv_path, [listing("csv", location="Pune, Maharashtra")])
+    db_path = str(tmp_path / "listings.db")
+    assert listing_db.load_listings(db_path, str(csv_path)).get(0, "id") == "csv"
+
+    conn = listing_db.connect(db_path)
+    listing_db.upsert(conn, [listing("a", salary_min="100"), listing("b", location="Chennai")])
+    listing_db.checkpoint(conn)
+    conn.close()
+    store = listing_db.load_listings(db_path, str(csv_path))
+    assert [store.get(row, "id") for row in range(len(store))] == ["a", "b"]
+    assert store.get(1, "location") == "Chennai"
@@ -0,0 +1,75 @@
+import pytest
+
+import query_cache
+from query_cache import LRUCache, normalize_query
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache, "time", clock)
+    return clock
+
+
+def test_normalize_query():
+    assert normalize_query("  Data   Analyst\tIN Pune \n") == "data analyst in pune"
+
+
+def test_hits_misses_and_lru_eviction():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1          # "a" is now the most recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.get("missing", "default") == "default"
+    assert cache.stats() == {"size": 2, "maxsize": 2, "ttl": None, "hits": 3, "misses": 2, "hit_rate": 0.6,
+                             "evictions": 1, "expirations": 0}
+
+
+def test_put_replaces_and_refreshes():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 10)
+    cache.put("c", 3)
+    assert cache.get("a") == 10 and cache.get("b") is None and len(cache) == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUCache(10, ttl=60)
+    cache.put("a", 1)
+    clock.now += 60
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1 and len(cache) == 0
+    cache.put("a", 2)                   # a new put restarts the entry's clock
+    clock.now += 30
+    assert cache.get("a") == 2
+
+
+def test_zero_size_disables_caching():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_delete_and_clear():
+    cache = LRUCache(10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.delete("a")
+    cache.delete("missing")
+    assert cache.get("a") is None and cache.get("b") == 2
+    cache.clear()
+    assert len(cache) == 0
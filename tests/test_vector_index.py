@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pytest
+
+import embedding_store
+import vector_index
+from job_store import JobStore
+
+
+def unit_vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def cache_of(vectors, path, title="Job %d"):
+    store = JobStore.from_rows([{"id": str(i), "title": title % i} for i in range(len(vectors))])
+    return embedding_store.write_cache(path, "random", store, iter([vectors]), dim=vectors.shape[1])
+
+
+def test_top_k_orders_and_thresholds():
+    scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+    rows, top = vector_index.top_k(scores, 3)
+    assert rows.tolist() == [1, 3, 2]
+    np.testing.assert_allclose(top, [0.9, 0.7, 0.5])
+    assert vector_index.top_k(scores, 3, similarity_threshold=0.6)[0].tolist() == [1, 3]
+    assert vector_index.top_k(scores, 10)[0].tolist() == [1, 3, 2, 0]
+    assert len(vector_index.top_k(np.zeros(0, dtype=np.float32), 3)[0]) == 0
+
+
+def test_exact_search_matches_brute_force():
+    vectors = unit_vectors(200)
+    index = vector_index.ExactIndex(vectors)
+    query = vectors[17]
+    rows, scores = index.search(query, 5)
+    assert rows[0] == 17 and scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert rows.tolist() == np.argsort(-(vectors @ query))[:5].tolist()
+
+
+def test_exact_search_within_rows():
+    vectors = unit_vectors(200)
+    index = vector_index.ExactIndex(vectors)
+    allowed = [150, 3, 42, 99]
+    rows, _ = index.search(vectors[17], 2, rows=allowed)
+    assert set(rows.tolist()) <= set(allowed) and len(rows) == 2
+    assert len(index.search(vectors[17], 2, rows=[])[0]) == 0
+
+
+def test_ivf_lists_partition_the_rows():
+    vectors = unit_vectors(500)
+    index = vector_index.IVFIndex.train(vectors, nlist=10, seed=0)
+    assert index.nlist == 10 and len(index) == 500
+    assert sorted(index.list_rows.tolist()) == list(range(500))
+    assert index.list_offsets[0] == 0 and index.list_offsets[-1] == 500
+
+
+def test_ivf_finds_exact_rows_and_probing_every_list_is_exact():
+    vectors = unit_vectors(500)
+    exact = vector_index.ExactIndex(vectors)
+    index = vector_index.IVFIndex.train(vectors, nlist=10, nprobe=2, seed=0)
+    for row in (0, 123, 499):
+        assert index.search(vectors[row], 1)[0].tolist() == [row]
+    query = unit_vectors(1, seed=7)[0]
+    assert index.search(query, 10, nprobe=10)[0].tolist() == exact.search(query, 10)[0].tolist()
+    assert index.search(query, 10, rows=[5, 6, 7])[0].tolist() == exact.search(query, 10, rows=[5, 6, 7])[0].tolist()
+
+
+def test_load_or_build_index_persists_and_reuses(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    cache = cache_of(unit_vectors(300), path)
+    assert isinstance(vector_index.load_or_build_index(cache, path, kind="exact"), vector_index.ExactIndex)
+    assert isinstance(vector_index.load_or_build_index(cache, path, kind="auto"), vector_index.ExactIndex)
+    built = vector_index.load_or_build_index(cache, path, kind="ivf", nlist=8)
+    assert os.path.exists(vector_index.index_path(path))
+    loaded = vector_index.load_or_build_index(cache, path, kind="ivf")
+    assert loaded.nlist == 8
+    np.testing.assert_array_equal(loaded.list_rows, built.list_rows)
+    with pytest.raises(ValueError):
+        vector_index.load_or_build_index(cache, path, kind="hnsw")
+
+
+def test_index_for_other_listings_is_rebuilt(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    vector_index.load_or_build_index(cache_of(unit_vectors(300), path), path, kind="ivf", nlist=8)
+    other = cache_of(unit_vectors(300, seed=1), path, title="Role %d")
+    assert vector_index.IVFIndex.load(vector_index.index_path(path), other.vectors, other.fingerprint()) is None
+    index = vector_index.load_or_build_index(other, path, kind="ivf", nlist=8)
+    assert index.search(other.vectors[10], 1)[0].tolist() == [10]
@@ -0,0 +1,225 @@
+"""Per-user data (past searches), served from memory and written behind in batches.
+
+Each user's record is one small JSON file under `directory`, named by a hash of
+the email:
+
+    {"email": "...", "past_searches": [{"query", "timestamp", "search_mode"}, ...]}
+
+`record_search` only queues the entry in memory. A background thread writes
+every user with queued entries each `flush_interval` seconds (sooner once
+`max_pending` entries are queued), one file per user, each atomically: a temp
+file in the same directory is fsynced (unless `fsync=False`) and renamed over
+the old one, so a crash never leaves a torn file.
+
+Several gunicorn workers can record searches for the same user. A flush holds
+an exclusive lock on the directory, re-reads each file and appends only this
+process's queued entries. Reads use the cached record while the file's mtime
+is unchanged, so another worker's write is picked up on the next read.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows: a single process is assumed
+    fcntl = None
+
+
+def user_key(email):
+    """Stable, case-insensitive key for a user; also names their file."""
+    return hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()[:32]
+
+
+def iter_users(directory):
+    """(email, past searches) of every user with a file in `directory`, e.g. for batch jobs."""
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.endswith(".json") and not name.startswith("."):
+            data = _read(os.path.join(directory, name))
+            if data.get("email"):
+                yield data["email"], data.get("past_searches", [])
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        logging.error("Ignoring unreadable user data file %s: %s", path, e)
+        return {}
+
+
+def write_atomic(path, data, fsync=True):
+    """Replace `path` with `data` as JSON; readers see the old or the new file, never a mix.
+
+    Without `fsync` the rename is still atomic for other processes, but an OS
+    crash can lose the new contents.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class UserDataStore:
+    def __init__(self, directory, flush_interval=2.0, max_searches=50, max_pending=1000,
+                 max_cached_users=10000, fsync=True):
+        self.directory = directory
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.max_searches = max_searches
+        self.max_pending = max_pending
+        self.max_cached_users = max_cached_users
+        os.makedirs(directory, exist_ok=True)
+        self._records = OrderedDict()   # email -> (past searches as of the file, file mtime)
+        self._pending = {}              # email -> entries not yet handed to a flush
+        self._flushing = {}             # email -> entries being written right now
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stats = {"recorded": 0, "flushes": 0, "files_written": 0, "write_errors": 0,
+                       "reads": 0, "file_reads": 0}
+        atexit.register(self.flush)
+
+    def _path(self, email):
+        return os.path.join(self.directory, user_key(email) + ".json")
+
+    @contextmanager
+    def _directory_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _cache(self, email, searches, mtime):
+        self._records[email] = (searches, mtime)
+        self._records.move_to_end(email)
+        while len(self._records) > self.max_cached_users:
+            self._records.popitem(last=False)
+
+    def past_searches(self, email):
+        """The user's most recent searches, oldest first, including ones not yet written."""
+        path = self._path(email)
+        with self._lock:
+            self._stats["reads"] += 1
+            mtime = _mtime(path)
+            cached = self._records.get(email)
+            if cached is not None and cached[1] == mtime:
+                self._records.move_to_end(email)
+                searches = cached[0]
+            else:
+                self._stats["file_reads"] += 1
+                searches = _read(path).get("past_searches", []) if mtime is not None else []
+                self._cache(email, searches, mtime)
+            searches = searches + self._flushing.get(email, []) + self._pending.get(email, [])
+        return searches[-self.max_searches:]
+
+    def record_search(self, email, query, timestamp=None, **fields):
+        entry = dict(query=query, timestamp=timestamp or time.strftime("%Y-%m-%dT%H:%M:%S"), **fields)
+        with self._lock:
+            self._pending.setdefault(email, []).append(entry)
+            self._pending_count += 1
+            self._stats["recorded"] += 1
+            backlog = self._pending_count
+        self._ensure_flusher()
+        if backlog >= self.max_pending:
+            self._wake.set()
+
+    def _ensure_flusher(self):
+        # Started on first use, and again in a forked worker (threads don't survive fork).
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="user-data-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error("Error flushing user data: %s", e)
+
+    def flush(self):
+        """Write every user with queued searches; returns the number of files written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                self._pending_count = 0
+            written = 0
+            start = time.time()
+            with self._directory_lock():
+                for email, entries in list(self._flushing.items()):
+                    path = self._path(email)
+                    data = _read(path)
+                    searches = (data.get("past_searches", []) + entries)[-self.max_searches:]
+                    try:
+                        write_atomic(path, {"email": email, "past_searches": searches}, self.fsync)
+                    except OSError as e:
+                        logging.error("Error writing user data for %s: %s", path, e)
+                        with self._lock:
+                            self._stats["write_errors"] += 1
+                            self._pending[email] = self._flushing.pop(email) + self._pending.get(email, [])
+                            self._pending_count += len(entries)
+                        continue
+                    with self._lock:
+                        self._cache(email, searches, _mtime(path))
+                        del self._flushing[email]
+                    written += 1
+            with self._lock:
+                self._stats["flushes"] += 1
+                self._stats["files_written"] += written
+            logging.info("Flushed past searches of %d users in %.3fs.", written, time.time() - start)
+            return written
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(pending=self._pending_count, cached_users=len(self._records),
+                         flush_interval=self.flush_interval)
+        return stats
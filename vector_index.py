@@ -0,0 +1,241 @@
+"""Vector index backends for job search over a memory-mapped embedding cache.
+
+* ExactIndex scores every row (one matrix-vector product) and is the reference.
+* IVFIndex clusters rows with spherical k-means into `nlist` inverted lists and,
+  per query, only scores the rows in the `nprobe` lists whose centroids are
+  closest. Raising `nprobe` trades latency for recall.
+
+IVF indexes are persisted next to the embedding cache and tagged with the
+cache fingerprint, so an index built for other vectors is rebuilt, not reused.
+
+Run `python vector_index.py` to print recall@k and latency of IVF settings
+against the exact backend on the current cache.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+import embedding_store
+from metrics import span
+
+INDEX_KINDS = ("exact", "ivf", "auto")
+AUTO_IVF_MIN_ROWS = 100000     # "auto" switches from exact to IVF at this catalogue size
+DEFAULT_NPROBE = 8
+KMEANS_ITERATIONS = 20
+KMEANS_SAMPLE_SIZE = 100000    # rows used to train centroids
+ASSIGN_CHUNK_ROWS = 65536      # rows assigned to lists per matrix product
+
+
+def top_k(scores, k, similarity_threshold=-1.0):
+    """Positions and scores of the k best entries at or above the threshold, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    # Partial selection of the k best rows, then a sort of only those k.
+    with span("top_k"):
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+    top = top[scores[top] >= similarity_threshold]
+    return top.astype(np.int64), scores[top]
+
+
+def search_rows(vectors, rows, query_embedding, k, similarity_threshold=-1.0):
+    """Exact top-k restricted to the given row ids."""
+    rows = np.sort(np.asarray(rows, dtype=np.int64))  # sequential reads from the memory-mapped cache
+    if len(rows) == 0:
+        return top_k(np.zeros(0, dtype=np.float32), k)
+    scores = np.asarray(vectors[rows], dtype=np.float32) @ np.asarray(query_embedding, dtype=np.float32)
+    positions, top_scores = top_k(scores, k, similarity_threshold)
+    return rows[positions], top_scores
+
+
+class ExactIndex:
+    kind = "exact"
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, query_embedding, k, similarity_threshold=-1.0, rows=None):
+        if rows is not None:
+            return search_rows(self.vectors, rows, query_embedding, k, similarity_threshold)
+        scores = embedding_store.similarity_scores(self.vectors, query_embedding)
+        return top_k(scores, k, similarity_threshold)
+
+
+class IVFIndex:
+    kind = "ivf"
+
+    def __init__(self, vectors, centroids, list_offsets, list_rows, nprobe=DEFAULT_NPROBE):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, vectors, nlist=0, nprobe=DEFAULT_NPROBE, iterations=KMEANS_ITERATIONS,
+              sample_size=KMEANS_SAMPLE_SIZE, seed=0):
+        start = time.time()
+        n = len(vectors)
+        if not nlist:
+            nlist = default_nlist(n)
+        nlist = max(1, min(nlist, n, sample_size))
+        centroids = _spherical_kmeans(vectors, nlist, iterations, sample_size, seed)
+        assignment = _assign(vectors, centroids)
+        list_rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=list_offsets[1:])
+        logging.info("Trained IVF index (%d rows, %d lists) in %.1fs.", n, nlist, time.time() - start)
+        return cls(vectors, centroids, list_offsets, list_rows, nprobe=nprobe)
+
+    def search(self, query_embedding, k, similarity_threshold=-1.0, rows=None, nprobe=None):
+        if rows is not None:
+            # A pre-filtered candidate set is scored exactly; probing lists would only lose recall.
+            return search_rows(self.vectors, rows, query_embedding, k, similarity_threshold)
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probe, _ = top_k(self.centroids @ query_embedding, nprobe)
+        candidates = np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]]
+                                     for c in probe])
+        return search_rows(self.vectors, candidates, query_embedding, k, similarity_threshold)
+
+    def save(self, path, fingerprint):
+        tmp_path = "%s.tmp.%d" % (path, os.getpid())
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, centroids=self.centroids, list_offsets=self.list_offsets,
+                         list_rows=self.list_rows, fingerprint=np.array(fingerprint))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path, vectors, fingerprint, nprobe=DEFAULT_NPROBE):
+        """Load a persisted index, or return None if it was built for other vectors."""
+        with np.load(path) as data:
+            if str(data["fingerprint"]) != fingerprint:
+                return None
+            return cls(vectors, data["centroids"], data["list_offsets"], data["list_rows"], nprobe=nprobe)
+
+
+def default_nlist(rows):
+    return max(1, int(4 * math.sqrt(rows)))
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _assign(vectors, centroids):
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for lo in range(0, len(vectors), ASSIGN_CHUNK_ROWS):
+        block = np.asarray(vectors[lo:lo + ASSIGN_CHUNK_ROWS], dtype=np.float32)
+        assignment[lo:lo + ASSIGN_CHUNK_ROWS] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+def _spherical_kmeans(vectors, nlist, iterations, sample_size, seed):
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(len(vectors), size=min(len(vectors), sample_size), replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(sample, centroids)
+        counts = np.bincount(assignment, minlength=nlist)
+        order = np.argsort(assignment, kind="stable")
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)))[filled]
+        centroids[filled] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), size=len(empty), replace=False)]
+        centroids = _normalize(centroids).astype(np.float32)
+    return centroids
+
+
+def index_path(cache_path):
+    return cache_path + ".ivf.npz"
+
+
+def load_or_build_index(cache, cache_path, kind="auto", nlist=0, nprobe=DEFAULT_NPROBE):
+    """Index `cache.vectors` with the chosen backend, reusing a persisted IVF index if it matches."""
+    if kind not in INDEX_KINDS:
+        raise ValueError("Unknown vector index kind: %s" % kind)
+    if kind == "auto":
+        kind = "ivf" if len(cache) >= AUTO_IVF_MIN_ROWS else "exact"
+    if kind == "exact" or len(cache) == 0:
+        return ExactIndex(cache.vectors)
+    path = index_path(cache_path)
+    fingerprint = cache.fingerprint()
+    if os.path.exists(path):
+        try:
+            index = IVFIndex.load(path, cache.vectors, fingerprint, nprobe=nprobe)
+            if index is not None and (not nlist or index.nlist == nlist):
+                logging.info("Loaded IVF index from %s (%d lists).", path, index.nlist)
+                return index
+        except Exception as e:
+            logging.error("Error loading IVF index: %s", e)
+    index = IVFIndex.train(cache.vectors, nlist=nlist, nprobe=nprobe)
+    try:
+        index.save(path, fingerprint)
+    except Exception as e:
+        logging.error("Error saving IVF index: %s", e)
+    return index
+
+
+def recall_report(cache, cache_path, k=10, nprobes=(1, 2, 4, 8, 16, 32), nlist=0, queries=200, seed=0):
+    """Recall@k and mean latency of IVF at each nprobe, measured against ExactIndex."""
+    exact = ExactIndex(cache.vectors)
+    ivf = load_or_build_index(cache, cache_path, kind="ivf", nlist=nlist)
+    rng = np.random.default_rng(seed)
+    # Held-out style queries: sampled job vectors with a little noise so they are not exact rows.
+    query_rows = rng.choice(len(cache), size=min(queries, len(cache)), replace=False)
+    query_vectors = np.asarray(cache.vectors[np.sort(query_rows)], dtype=np.float32)
+    query_vectors = _normalize(query_vectors + rng.normal(scale=0.05, size=query_vectors.shape)).astype(np.float32)
+
+    start = time.perf_counter()
+    truth = [set(exact.search(q, k)[0].tolist()) for q in query_vectors]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(query_vectors)
+    report = {"rows": len(cache), "k": k, "nlist": ivf.nlist, "queries": len(query_vectors),
+              "exact_ms_per_query": round(exact_ms, 3), "ivf": []}
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found = [set(ivf.search(q, k, nprobe=nprobe)[0].tolist()) for q in query_vectors]
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(query_vectors)
+        recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth) if t])
+        report["ivf"].append({"nprobe": nprobe, "recall_at_k": round(float(recall), 4),
+                              "ms_per_query": round(ivf_ms, 3)})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k of the IVF index against exact search.")
+    parser.add_argument("--cache", default=os.getenv("EMBEDDING_CACHE_FILE", "job_embeddings.bin"))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=int(os.getenv("IVF_NLIST", "0")))
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32", help="comma-separated nprobe values")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    report = recall_report(embedding_store.load_cache(args.cache), args.cache, k=args.k, nlist=args.nlist,
+                           nprobes=[int(n) for n in args.nprobe.split(",")], queries=args.queries)
+    print(json.dumps(report, indent=2))